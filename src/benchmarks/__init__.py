@@ -0,0 +1 @@
+"""Бенчмарки Health Compass. Запуск из папки src: python -m benchmarks.<name>"""
@@ -0,0 +1,164 @@
+"""
+Память воркеров: каталог клиник в словарях Python против общего mmap-каталога.
+
+Поднимается N процессов-воркеров; каждый загружает каталог, выполняет
+запросы поиска клиник и сообщает RSS, PSS (RSS с долей общих страниц,
+поделенной между процессами) и приватную память. Замер делается, пока
+живы все воркеры, иначе общие страницы не видны в PSS. Требуется Linux
+(/proc/self/smaps_rollup).
+
+    cd src
+    python -m benchmarks.catalog_memory --clinics 100000 --workers 4 --output bench.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.clinic_search import CITIES, generate_clinics
+from benchmarks.common import percentile, save_results
+
+MODES = ("objects", "mmap")
+
+
+def read_memory_kb() -> Dict[str, int]:
+    memory = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                memory[parts[0].rstrip(":").lower()] = int(parts[1])
+    memory["private"] = memory.pop("private_clean", 0) + memory.pop("private_dirty", 0)
+    return memory
+
+
+def worker(queries: int):
+    """Тело процесса-воркера: путь к каталогу приходит через переменные окружения"""
+    baseline = read_memory_kb()
+
+    from services.clinic_service import get_clinic_service
+
+    started = time.perf_counter()
+    service = get_clinic_service()
+    load_s = time.perf_counter() - started
+
+    rng = random.Random(os.getpid())
+    latencies = []
+    for _ in range(queries):
+        lat, lon, spread, _ = rng.choice(CITIES)
+        query_started = time.perf_counter()
+        service.find_nearest(lat + rng.gauss(0, spread), lon + rng.gauss(0, spread), 5,
+                             specialists=["Невролог"], examinations=["МРТ"])
+        latencies.append(time.perf_counter() - query_started)
+
+    memory = read_memory_kb()
+    print(json.dumps({
+        "clinics": len(service.index) if service.index else 0,
+        "load_s": round(load_s, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "rss_mb": round(memory["rss"] / 1024, 1),
+        "pss_mb": round(memory["pss"] / 1024, 1),
+        "private_mb": round(memory["private"] / 1024, 1),
+        "catalog_private_mb": round((memory["private"] - baseline["private"]) / 1024, 1)
+    }), flush=True)
+    # Ждем, пока родитель снимет замеры со всех воркеров
+    sys.stdin.readline()
+
+
+def write_catalogues(directory: str, clinics_count: int) -> Dict[str, str]:
+    from services.catalog import build_reference_catalog
+
+    csv_path = os.path.join(directory, "clinics.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "kind", "address", "lat", "lon", "specialists", "examinations", "phone"])
+        for clinic in generate_clinics(clinics_count):
+            writer.writerow([clinic.id, clinic.name, clinic.kind, clinic.address, clinic.lat, clinic.lon,
+                             "|".join(clinic.specialists), "|".join(clinic.examinations), clinic.phone or ""])
+
+    catalog_path = os.path.join(directory, "reference.catalog")
+    build_reference_catalog(catalog_path, csv_path)
+    return {"objects": csv_path, "mmap": catalog_path}
+
+
+def run_mode(mode: str, path: str, workers: int, queries: int) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.pop("CLINIC_CATALOG_PATH", None)
+    env.pop("REFERENCE_CATALOG_PATH", None)
+    env["CLINIC_CATALOG_PATH" if mode == "objects" else "REFERENCE_CATALOG_PATH"] = path
+    env["LOG_LEVEL"] = "WARNING"
+
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.catalog_memory", "--worker", "--queries", str(queries)],
+                         cwd=cwd, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.DEVNULL, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        reports: List[Dict[str, Any]] = [json.loads(process.stdout.readline()) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+    def mean(key: str) -> float:
+        return round(sum(report[key] for report in reports) / len(reports), 2)
+
+    return {
+        "workers": workers,
+        "clinics": reports[0]["clinics"],
+        "load_s": mean("load_s"),
+        "query_p50_ms": mean("p50_ms"),
+        "rss_mb": mean("rss_mb"),
+        "pss_mb": mean("pss_mb"),
+        "private_mb": mean("private_mb"),
+        "catalog_private_mb": mean("catalog_private_mb"),
+        "total_pss_mb": round(sum(report["pss_mb"] for report in reports), 1)
+    }
+
+
+def run(clinics_count: int, workers: int, queries: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_catalogues(directory, clinics_count)
+        results["file_size_mb"] = {
+            mode: round(os.path.getsize(path) / 2 ** 20, 1) for mode, path in paths.items()
+        }
+        for mode in MODES:
+            results[mode] = run_mode(mode, paths[mode], workers, queries)
+
+    print(f"{'mode':<8} {'load':>8} {'p50':>9} {'rss':>9} {'pss':>9} {'private':>9} {'total pss':>10}")
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:<8} {r['load_s']:>7.2f}s {r['query_p50_ms']:>7.3f}ms {r['rss_mb']:>7.1f}MB "
+              f"{r['pss_mb']:>7.1f}MB {r['private_mb']:>7.1f}MB {r['total_pss_mb']:>8.1f}MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory of the clinic catalogue")
+    parser.add_argument("--clinics", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.queries)
+        return
+
+    results = run(args.clinics, args.workers, args.queries)
+    if args.output:
+        save_results(args.output, "catalog_memory", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Бенчмарк поиска клиник: построение индекса и запросы "ближайшие N с МРТ и неврологом".
+
+    cd src
+    python -m benchmarks.clinic_search --clinics 100000 --queries 2000 --output bench.json
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import latency_summary, save_results
+
+from models.health_models import Clinic
+from services.clinic_service import ClinicIndex
+
+SPECIALISTS = ["Терапевт", "Невролог", "Кардиолог", "Офтальмолог", "Ортопед", "Эндокринолог",
+               "Дерматолог", "Гастроэнтеролог", "Хирург", "Уролог", "Гинеколог", "ЛОР"]
+EXAMINATIONS = ["Общий анализ крови", "МРТ", "КТ", "УЗИ", "Рентген", "ЭКГ", "Маммография",
+                "Колоноскопия", "Анализ на холестерин", "Анализ ПСА"]
+KINDS = ["polyclinic", "hospital", "lab", "diagnostic"]
+
+# Города: (широта, долгота, разброс в градусах, доля клиник)
+CITIES = [(55.75, 37.62, 0.4, 0.35), (59.94, 30.31, 0.3, 0.2), (55.03, 82.92, 0.2, 0.1),
+          (56.84, 60.61, 0.2, 0.1), (55.79, 49.12, 0.2, 0.1), (54.99, 73.37, 0.2, 0.15)]
+
+
+def generate_clinics(count: int, seed: int = 1) -> List[Clinic]:
+    rng = random.Random(seed)
+    weights = [city[3] for city in CITIES]
+    clinics = []
+    for i in range(count):
+        lat, lon, spread, _ = rng.choices(CITIES, weights)[0]
+        clinics.append(Clinic(
+            id=f"clinic-{i}",
+            name=f"Клиника №{i}",
+            kind=rng.choice(KINDS),
+            address=f"ул. Синтетическая, {i}",
+            lat=lat + rng.gauss(0, spread),
+            lon=lon + rng.gauss(0, spread),
+            specialists=rng.sample(SPECIALISTS, rng.randint(1, 6)),
+            examinations=rng.sample(EXAMINATIONS, rng.randint(0, 5))
+        ))
+    return clinics
+
+
+def run(clinics_count: int, queries: int, limit: int = 5, seed: int = 1) -> Dict[str, Any]:
+    clinics = generate_clinics(clinics_count, seed)
+
+    started = time.perf_counter()
+    index = ClinicIndex(clinics)
+    build_s = time.perf_counter() - started
+
+    rng = random.Random(seed + 1)
+    points = []
+    for _ in range(queries):
+        lat, lon, spread, _ = rng.choice(CITIES)
+        points.append((lat + rng.gauss(0, spread), lon + rng.gauss(0, spread)))
+
+    cases = {
+        "nearest": {},
+        "nearest_mri_neurologist": {"specialists": ["Невролог"], "examinations": ["МРТ"]},
+        "nearest_cardiologist_ecg_hospital": {
+            "specialists": ["Кардиолог"], "examinations": ["ЭКГ"], "kind": "hospital"
+        }
+    }
+
+    results: Dict[str, Any] = {"build": {"clinics": clinics_count, "build_s": round(build_s, 3)}}
+    for name, filters in cases.items():
+        latencies = []
+        started = time.perf_counter()
+        for lat, lon in points:
+            query_started = time.perf_counter()
+            index.nearest(lat, lon, limit, **filters)
+            latencies.append(time.perf_counter() - query_started)
+        results[name] = latency_summary(latencies, time.perf_counter() - started)
+
+    print(f"build: {clinics_count} clinics in {build_s:.2f}s")
+    for name in cases:
+        summary = results[name]
+        print(f"{name:<36} p50={summary['p50_ms']:.3f}ms p95={summary['p95_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clinic spatial index benchmark")
+    parser.add_argument("--clinics", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.clinics, args.queries, args.limit)
+    if args.output:
+        save_results(args.output, "clinic_search", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Общие утилиты бенчмарков: замеры, перцентили, сохранение и сравнение результатов"""
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(round(pct / 100 * len(ordered), 9)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies_s: List[float], elapsed_s: float) -> Dict[str, Any]:
+    """Сводка по латентностям (в мс) и пропускной способности"""
+    return {
+        "count": len(latencies_s),
+        "elapsed_s": round(elapsed_s, 4),
+        "throughput_rps": round(len(latencies_s) / elapsed_s, 1) if elapsed_s else 0.0,
+        "mean_ms": round(sum(latencies_s) / len(latencies_s) * 1000, 4) if latencies_s else 0.0,
+        "p50_ms": round(percentile(latencies_s, 50) * 1000, 4),
+        "p95_ms": round(percentile(latencies_s, 95) * 1000, 4),
+        "p99_ms": round(percentile(latencies_s, 99) * 1000, 4),
+        "max_ms": round(max(latencies_s) * 1000, 4) if latencies_s else 0.0
+    }
+
+
+def measure(fn: Callable[[], Any], number: int = 1000, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Микробенчмарк синхронной функции.
+
+    Args:
+        fn: Функция без аргументов
+        number: Вызовов в одном прогоне
+        repeat: Количество прогонов
+
+    Returns:
+        Dict[str, Any]: лучшее и медианное время одного вызова в микросекундах
+    """
+    fn()  # прогрев
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "best_us": round(min(runs) * 1e6, 3),
+        "median_us": round(percentile(runs, 50) * 1e6, 3)
+    }
+
+
+def run_metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def save_results(path: str, suite: str, results: Dict[str, Any]):
+    """Сохраняет результаты набора в JSON; другие наборы в том же файле сохраняются"""
+    data: Dict[str, Any] = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    data[suite] = {"meta": run_metadata(), "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1,
+                    keys=("best_us", "p50_ms", "p95_ms", "p99_ms")) -> List[str]:
+    """
+    Сравнение двух файлов результатов.
+
+    Returns:
+        List[str]: описания регрессий, где метрика выросла больше чем на threshold
+    """
+    regressions = []
+    for suite, suite_data in current.items():
+        base_suite = baseline.get(suite, {}).get("results", {})
+        for case, values in suite_data.get("results", {}).items():
+            base_values = base_suite.get(case)
+            if not isinstance(values, dict) or not isinstance(base_values, dict):
+                continue
+            for key in keys:
+                old, new = base_values.get(key), values.get(key)
+                if old and new and new > old * (1 + threshold):
+                    regressions.append(f"{suite}/{case} {key}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """uvicorn-сервер в фоновом потоке для локальных прогонов"""
+
+    def __init__(self, app, port: Optional[int] = None):
+        import uvicorn
+
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+        return False
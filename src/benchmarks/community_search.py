@@ -0,0 +1,111 @@
+"""
+Бенчмарк полнотекстового поиска сообществ: построение индекса, инкрементальное
+добавление и задержка запросов на синтетическом каталоге.
+
+    cd src
+    python -m benchmarks.community_search --communities 5000 --queries 2000 --output bench.json
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import latency_summary, save_results
+
+from services.community_service import CommunityService
+
+CONDITIONS = ["диабет", "гипертония", "мигрень", "витилиго", "астма", "артрит", "псориаз", "гастрит",
+              "остеохондроз", "аллергия", "анемия", "бессонница", "депрессия", "тревожность", "сколиоз",
+              "эпилепсия", "панкреатит", "холецистит", "аритмия", "ожирение", "подагра", "экзема"]
+TOPICS = ["лечение", "питание", "поддержка", "реабилитация", "профилактика", "лекарства", "спорт",
+          "беременность", "дети", "пожилые", "диагностика", "обследования", "психология", "истории"]
+WORDS = ["обсуждаем", "делимся", "опытом", "врачами", "помогаем", "новичкам", "контролировать",
+         "симптомы", "жизнь", "ограничений", "советы", "специалистов", "вопросы", "ответы", "встречи",
+         "онлайн", "городе", "клиники", "анализы", "результаты", "дневник", "самочувствие"]
+NAMES = ["Мария", "Алексей", "Ольга", "Дмитрий", "Сергей", "Анна", "Игорь", "Елена"]
+
+QUERIES = ["сахар", "давление", "диабет питание", "мигрени лечение", "гиперт", "астма дети спорт",
+           "поддержка психология", "бессонница", "анализы результаты", "реабил"]
+
+
+def generate_communities(count: int, seed: int = 1) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(seed)
+    communities = {}
+    for i in range(count):
+        condition = rng.choice(CONDITIONS)
+        topic = rng.choice(TOPICS)
+        communities[f"community_{i}"] = {
+            "name": f"{condition.capitalize()}: {topic} #{i}",
+            "description": " ".join(rng.sample(WORDS, 8)) + f" {condition} {topic}",
+            "max_chat_link": f"https://max.ru/community_{i}",
+            "synonyms": [condition],
+            "success_stories": [
+                f"{rng.choice(NAMES)}: " + " ".join(rng.sample(WORDS, 6)) for _ in range(rng.randint(0, 3))
+            ]
+        }
+    return communities
+
+
+def run(communities_count: int, queries: int, seed: int = 1) -> Dict[str, Any]:
+    communities = generate_communities(communities_count, seed)
+    service = CommunityService()
+    service._condition_communities = communities
+
+    started = time.perf_counter()
+    index = service.search_index
+    build_s = time.perf_counter() - started
+
+    extra = generate_communities(200, seed + 1)
+    started = time.perf_counter()
+    for community_id, community in extra.items():
+        service.add_community(f"extra_{community_id}", community)
+    add_ms = (time.perf_counter() - started) / len(extra) * 1000
+
+    results: Dict[str, Any] = {
+        "build": {
+            "communities": communities_count,
+            "terms": len(index.vocabulary),
+            "build_s": round(build_s, 3),
+            "add_ms": round(add_ms, 3)
+        }
+    }
+
+    rng = random.Random(seed + 2)
+    latencies: List[float] = []
+    per_query: Dict[str, List[float]] = {query: [] for query in QUERIES}
+    started = time.perf_counter()
+    for _ in range(queries):
+        query = rng.choice(QUERIES)
+        query_started = time.perf_counter()
+        service.search(query, limit=5)
+        elapsed = time.perf_counter() - query_started
+        latencies.append(elapsed)
+        per_query[query].append(elapsed)
+    results["search"] = latency_summary(latencies, time.perf_counter() - started)
+    results["per_query_p50_ms"] = {
+        query: round(sorted(values)[len(values) // 2] * 1000, 3) for query, values in per_query.items() if values
+    }
+
+    print(f"build: {communities_count} communities, {len(index.vocabulary)} terms in {build_s:.2f}s; "
+          f"add: {add_ms:.3f}ms")
+    summary = results["search"]
+    print(f"search p50={summary['p50_ms']:.3f}ms p95={summary['p95_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms")
+    for query, p50 in results["per_query_p50_ms"].items():
+        print(f"  {query:<24} p50={p50:.3f}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Community full-text search benchmark")
+    parser.add_argument("--communities", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.communities, args.queries)
+    if args.output:
+        save_results(args.output, "community_search", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Сравнение результатов бенчмарков с базовой линией.
+
+    cd src
+    python -m benchmarks.compare baseline.json bench.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import compare_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Допустимый рост метрики (доля)")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = compare_results(baseline, current, args.threshold)
+    if regressions:
+        print("❌ Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Бенчмарк журнала событий дневника здоровья: скорость записи, полное
+восстановление из журнала, запись снимка с компакцией и восстановление
+по схеме снимок + хвост.
+
+    cd src
+    python -m benchmarks.event_replay --events 1000000 --users 10000 --output bench.json
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Dict
+
+from benchmarks.common import save_results
+
+from services.event_log import EventLog
+from services.health_service import HealthService, METRIC_RECORDED, PROFILE_CREATED
+
+
+def _write_events(log: EventLog, count: int, users: int, rng: random.Random) -> float:
+    started = time.perf_counter()
+    now = time.time()
+    for i in range(count):
+        user_id = rng.randint(1, users)
+        if rng.random() < 0.5:
+            value = {"systolic": rng.randint(100, 170), "diastolic": rng.randint(60, 110)}
+            data = {"type": "pressure", "value": value, "notes": None}
+        else:
+            data = {"type": "weight", "value": {"value": round(rng.uniform(50, 120), 1)}, "notes": None}
+        log.append(METRIC_RECORDED, user_id, data, now - count + i)
+    return time.perf_counter() - started
+
+
+def _recover(directory: str, segment_bytes: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    service = HealthService(event_log=EventLog(directory, segment_bytes=segment_bytes))
+    elapsed = time.perf_counter() - started
+    metrics_count = (sum(len(metrics) for metrics in service.health_metrics.values())
+                     + sum(len(rows) for rows in service.restored_metrics.values()))
+    return {"service": service, "recover_s": round(elapsed, 3), "metrics": metrics_count,
+            "profiles": len(service.user_profiles)}
+
+
+def run(events: int, users: int, tail_ratio: float = 0.1, segment_mb: int = 64, seed: int = 1) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    segment_bytes = segment_mb * 1024 * 1024
+    directory = tempfile.mkdtemp(prefix="event_log_bench_")
+    results: Dict[str, Any] = {"events": events, "users": users}
+    try:
+        log = EventLog(directory, segment_bytes=segment_bytes)
+        log.recover(lambda records: None, lambda event: None)
+        for user_id in range(1, users + 1):
+            log.append(PROFILE_CREATED, user_id, {"user_id": user_id, "gender": rng.choice(["male", "female"]),
+                                                   "age": rng.randint(18, 90)})
+        append_s = _write_events(log, events, users, rng)
+        log.close()
+        results["append"] = {"events_per_s": round(events / append_s), "log_mb": round(log.size_bytes() / 2 ** 20, 1),
+                             "segments": len(log.segments())}
+        print(f"append: {results['append']['events_per_s']} events/s, {results['append']['log_mb']} MB "
+              f"in {results['append']['segments']} segments")
+
+        full = _recover(directory, segment_bytes)
+        service = full.pop("service")
+        results["full_replay"] = full
+        print(f"full replay: {full['recover_s']}s ({full['metrics']} metrics, {full['profiles']} profiles)")
+
+        started = time.perf_counter()
+        asyncio.run(service.snapshot())
+        snapshot_s = time.perf_counter() - started
+        service.event_log.close()
+        results["snapshot"] = {"write_s": round(snapshot_s, 3), "disk_mb": round(log.size_bytes() / 2 ** 20, 1),
+                               "segments_left": len(log.segments())}
+        print(f"snapshot + compaction: {snapshot_s:.2f}s, {results['snapshot']['disk_mb']} MB on disk, "
+              f"{results['snapshot']['segments_left']} segments left")
+
+        tail = int(events * tail_ratio)
+        log = EventLog(directory, segment_bytes=segment_bytes)
+        log.recover(lambda records: None, lambda event: None)
+        _write_events(log, tail, users, rng)
+        log.close()
+
+        snapshot_replay = _recover(directory, segment_bytes)
+        snapshot_replay.pop("service").event_log.close()
+        snapshot_replay["tail_events"] = tail
+        results["snapshot_replay"] = snapshot_replay
+        print(f"snapshot + {tail} tail events: {snapshot_replay['recover_s']}s "
+              f"({snapshot_replay['metrics']} metrics)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Health diary event log replay benchmark")
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--tail-ratio", type=float, default=0.1, help="Доля событий после снимка")
+    parser.add_argument("--segment-mb", type=int, default=64)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.events, args.users, args.tail_ratio, args.segment_mb)
+    if args.output:
+        save_results(args.output, "event_replay", results)
+
+
+if __name__ == "__main__":
+    main()
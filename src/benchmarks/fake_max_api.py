@@ -0,0 +1,67 @@
+"""
+Локальная заглушка MAX API для нагрузочных прогонов.
+
+Отвечает на эндпоинты, которые использует MaxApiService, с настраиваемой
+задержкой и считает полученные запросы. GET /updates отдает обновления,
+добавленные через app.state.enqueue, с маркером и ожиданием до timeout.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def create_fake_max_api(latency_ms: float = 0.0) -> Starlette:
+    calls: Counter = Counter()
+    # Журнал обновлений: маркер — число уже выданных клиенту обновлений
+    pending: List[Dict[str, Any]] = []
+
+    async def _respond(request: Request, payload):
+        calls[f"{request.method} {request.url.path}"] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return JSONResponse(payload)
+
+    async def messages(request: Request):
+        return await _respond(request, {"message": {"body": {"mid": "mid.fake", "seq": 1}}})
+
+    async def answers(request: Request):
+        return await _respond(request, {"success": True})
+
+    async def subscriptions(request: Request):
+        return await _respond(request, {"success": True})
+
+    async def me(request: Request):
+        return await _respond(request, {"user_id": 1, "first_name": "FakeBot", "is_bot": True})
+
+    async def chat(request: Request):
+        return await _respond(request, {"chat_id": int(request.path_params["chat_id"]), "type": "dialog"})
+
+    async def updates(request: Request):
+        params = request.query_params
+        marker = int(params.get("marker", 0))
+        limit = int(params.get("limit", 100))
+        deadline = time.monotonic() + float(params.get("timeout", 0))
+        # Журнал пополняется из другого потока, поэтому ожидание опросом
+        while len(pending) <= marker and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        batch = pending[marker:marker + limit]
+        return await _respond(request, {"updates": batch, "marker": marker + len(batch)})
+
+    app = Starlette(routes=[
+        Route("/messages", messages, methods=["POST", "PUT"]),
+        Route("/answers", answers, methods=["POST"]),
+        Route("/subscriptions", subscriptions, methods=["POST", "DELETE"]),
+        Route("/me", me, methods=["GET"]),
+        Route("/chats/{chat_id:int}", chat, methods=["GET"]),
+        Route("/updates", updates, methods=["GET"])
+    ])
+    app.state.calls = calls
+    app.state.pending = pending
+    app.state.enqueue = pending.extend
+    return app
@@ -0,0 +1,88 @@
+"""
+HTTP-кэширование и сжатие: байты и задержка для профиля, статики и
+главной страницы — полный ответ без сжатия, со сжатием и условный GET (304).
+
+    cd src
+    python -m benchmarks.http_caching --requests 500 --output bench.json
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.common import ServerThread, latency_summary, save_results
+
+PROFILE = {"full_name": "Бенчмарк", "birth_year": 1975, "gender": "female", "blood_type": "A",
+           "weight": 70, "height": 170, "emergency_contact": "112"}
+
+
+async def _drive(client: httpx.AsyncClient, path: str, headers: Dict[str, str], requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    wire_bytes = 0
+    statuses = set()
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - request_started)
+        wire_bytes += response.num_bytes_downloaded
+        statuses.add(response.status_code)
+    summary = latency_summary(latencies, time.perf_counter() - started)
+    summary["bytes_per_request"] = round(wire_bytes / requests)
+    summary["status"] = sorted(statuses)
+    return summary
+
+
+async def measure(url: str, requests: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=url) as client:
+        await client.post("/api/profile", params={"user_id": 1}, json=PROFILE)
+        targets = {"profile": "/api/profile/1", "script": "/static/js/script.js?v=2", "index": "/"}
+        for name, path in targets.items():
+            first = await client.get(path, headers={"Accept-Encoding": "gzip, br"})
+            validators = {key: first.headers[key] for key in ("etag", "last-modified") if key in first.headers}
+            scenarios = {
+                "identity": {"Accept-Encoding": "identity"},
+                "compressed": {"Accept-Encoding": "gzip, br"}
+            }
+            if "etag" in validators:
+                scenarios["conditional"] = {"Accept-Encoding": "gzip, br", "If-None-Match": validators["etag"]}
+            for scenario, headers in scenarios.items():
+                summary = await _drive(client, path, headers, requests)
+                results[f"{name}_{scenario}"] = summary
+                print(f"{name:<8} {scenario:<12} {summary['bytes_per_request']:>7} B/req  "
+                      f"p50={summary['p50_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms status={summary['status']}")
+    return results
+
+
+def run(requests: int) -> Dict[str, Any]:
+    os.environ.pop("WEBHOOK_URL", None)
+    from main import app
+
+    with ServerThread(app) as server:
+        results = asyncio.run(measure(server.url, requests))
+    for name in ("profile", "script", "index"):
+        identity = results[f"{name}_identity"]["bytes_per_request"]
+        for scenario in ("compressed", "conditional"):
+            if f"{name}_{scenario}" in results:
+                saved = 1 - results[f"{name}_{scenario}"]["bytes_per_request"] / identity
+                results[f"{name}_{scenario}"]["bytes_saved"] = round(saved, 4)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP caching and compression benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.requests)
+    if args.output:
+        save_results(args.output, "http_caching", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Проверка загрузки данных по намерению: сколько обращений к хранилищу
+профилей делает каждое текстовое намерение бота.
+
+Намерения без требований (помощь, меню, симптомы, неизвестная команда) не
+должны читать хранилище; намерения с профилем — читать его один раз.
+Скрипт завершается с ошибкой, если это нарушено.
+
+    cd src
+    python -m benchmarks.intent_storage
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict
+
+from benchmarks.common import ServerThread
+from benchmarks.fake_max_api import create_fake_max_api
+
+USER_ID = 7
+
+# Текст сообщения для каждого намерения
+INTENT_TEXTS = {
+    "start": "/start",
+    "health_menu": "здоровье",
+    "screening": "обследование",
+    "symptoms": "симптом",
+    "find_clinic": "клиника",
+    "communities": "сообщества",
+    "profile": "профиль",
+    "help": "помощь",
+    "unknown": "абракадабра"
+}
+
+
+def message(text: str, seq: int) -> Dict[str, Any]:
+    return {
+        "sender": {"user_id": USER_ID, "first_name": "Intent"},
+        "recipient": {"chat_id": USER_ID},
+        "timestamp": int(time.time() * 1000) + seq,
+        "body": {"mid": f"mid.intent.{seq}", "seq": seq, "text": text}
+    }
+
+
+async def scenario(with_profile: bool) -> Dict[str, Dict[str, int]]:
+    from handlers.message_handler import MessageHandler
+
+    handler = MessageHandler()
+    service = handler.health_service
+    store = service.profile_store
+    if with_profile:
+        await service.create_user_profile(USER_ID, {"gender": "female", "age": 52})
+        await service.flush()
+
+    results = {}
+    for seq, (intent, text) in enumerate(INTENT_TEXTS.items()):
+        assert handler._match_intent(text) == intent, f"{text!r} does not match {intent}"
+        # Холодный кэш: каждое чтение профиля доходит до хранилища
+        service.profile_cache.clear()
+        reads, writes = store.reads, store.writes
+        await handler.handle_message(message(text, seq))
+        results[intent] = {"reads": store.reads - reads, "writes": store.writes - writes}
+    return results
+
+
+def check(results: Dict[str, Dict[str, int]], requirements: Dict[str, tuple]) -> list:
+    failures = []
+    for intent, counts in results.items():
+        needs_profile = bool(requirements.get(intent))
+        if counts["writes"]:
+            failures.append(f"{intent}: {counts['writes']} writes")
+        if not needs_profile and counts["reads"]:
+            failures.append(f"{intent}: {counts['reads']} reads, expected none")
+        if needs_profile and counts["reads"] > 1:
+            failures.append(f"{intent}: {counts['reads']} reads, expected at most one")
+    return failures
+
+
+def run(latency_ms: float) -> Dict[str, Any]:
+    fake_api = create_fake_max_api(latency_ms)
+    results: Dict[str, Any] = {}
+    with ServerThread(fake_api) as server:
+        os.environ["MAX_API_URL"] = server.url
+        os.environ.setdefault("MAX_BOT_TOKEN", "intent-token")
+        from handlers.message_handler import MessageHandler
+
+        for mode, with_profile in (("no_profile", False), ("with_profile", True)):
+            results[mode] = asyncio.run(scenario(with_profile))
+
+    failures = []
+    for mode, intents in results.items():
+        for intent, counts in intents.items():
+            print(f"{mode:<13} {intent:<12} reads={counts['reads']} writes={counts['writes']}")
+        failures += [f"{mode} {failure}" for failure in check(intents, MessageHandler.INTENT_REQUIREMENTS)]
+    if failures:
+        raise SystemExit("❌ " + "; ".join(failures))
+    print("✅ Intents without data requirements made no storage calls")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage calls per bot intent")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Задержка заглушки MAX API")
+    args = parser.parse_args()
+    run(args.latency_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк записи показателей в SQLite: транзакция на каждую строку против
+групповой фиксации (GroupCommitWriter) при разном числе одновременных писателей.
+
+    cd src
+    python -m benchmarks.metric_inserts --rows 5000 --concurrency 1 16 64 --output bench.json
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from benchmarks.common import latency_summary, save_results
+
+from models.health_models import HealthMetric
+from services.metric_store import GroupCommitWriter, SqliteMetricStore, metric_row
+
+
+def _rows(count: int) -> List[Any]:
+    now = datetime.now()
+    return [
+        metric_row(HealthMetric(user_id=i % 500, metric_type="pressure",
+                                value={"systolic": 120 + i % 40, "diastolic": 80}, timestamp=now))
+        for i in range(count)
+    ]
+
+
+async def _drive(write, rows: List[Any], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    queue = list(reversed(rows))
+
+    async def writer():
+        while queue:
+            row = queue.pop()
+            started = time.perf_counter()
+            await write(row)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(concurrency)))
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def _measure(directory: str, rows: int, concurrency: int, max_batch: int, max_delay_ms: float):
+    results = {}
+
+    store = SqliteMetricStore(os.path.join(directory, f"row_{concurrency}.db"))
+    results["row_at_a_time"] = await _drive(
+        lambda row: asyncio.to_thread(store.insert_many, [row]), _rows(rows), concurrency
+    )
+    results["row_at_a_time"]["commits"] = store.commits
+    store.close()
+
+    store = SqliteMetricStore(os.path.join(directory, f"group_{concurrency}.db"))
+    writer = GroupCommitWriter(store, max_batch=max_batch, max_delay=max_delay_ms / 1000)
+    results["group_commit"] = await _drive(writer.write, _rows(rows), concurrency)
+    results["group_commit"]["commits"] = store.commits
+    assert store.count() == rows
+    store.close()
+    return results
+
+
+def run(rows: int, concurrency_levels: List[int], max_batch: int = 256, max_delay_ms: float = 0.0) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="metric_inserts_")
+    results: Dict[str, Any] = {}
+    try:
+        for concurrency in concurrency_levels:
+            level = asyncio.run(_measure(directory, rows, concurrency, max_batch, max_delay_ms))
+            results[f"c{concurrency}"] = level
+            for mode, summary in level.items():
+                print(f"c={concurrency:<4} {mode:<14} {summary['throughput_rps']:>9} rows/s  "
+                      f"p50={summary['p50_ms']:.2f}ms p99={summary['p99_ms']:.2f}ms commits={summary['commits']}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metric insert group-commit benchmark")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-delay-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.concurrency, args.max_batch, args.max_delay_ms)
+    if args.output:
+        save_results(args.output, "metric_inserts", results)
+
+
+if __name__ == "__main__":
+    main()
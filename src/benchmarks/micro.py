@@ -0,0 +1,324 @@
+"""
+Микробенчмарки сервисов: HealthService (включая агрегаты показателей и детектор аномалий), ScreeningService, SymptomChecker, CommunityService, utils.validators.
+
+    cd src
+    python -m benchmarks.micro --output bench.json
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from benchmarks.common import measure, save_results
+
+from models.health_models import UserProfile, Gender, RiskFactor, MedicalCondition, SymptomSession, HealthMetric
+from services.anomaly_detector import AnomalyDetector
+from services.community_service import CommunityService
+from services.health_service import HealthService
+from services.screening_service import ScreeningService, diff_catalogues, get_screening_catalogue
+from services.screening_views import ScreeningViews
+from services.symptom_checker import SymptomChecker
+from utils import validators
+
+
+def _sample_profile(user_id: int = 1) -> UserProfile:
+    return UserProfile(
+        user_id=user_id,
+        gender=Gender.MALE,
+        age=52,
+        risk_factors=[RiskFactor.SMOKING, RiskFactor.OBESITY],
+        conditions=[MedicalCondition(condition_id="hypertension", name="Гипертония")]
+    )
+
+
+def _async(loop: asyncio.AbstractEventLoop, factory: Callable[[], Any]) -> Callable[[], Any]:
+    return lambda: loop.run_until_complete(factory())
+
+
+def bench_health_service(loop: asyncio.AbstractEventLoop, number: int) -> Dict[str, Any]:
+    service = HealthService()
+    profile_data = {"gender": "female", "age": 40, "risk_factors": ["smoking"], "conditions": []}
+    for user_id in range(1, 1001):
+        loop.run_until_complete(service.create_user_profile(user_id, profile_data))
+        for value in range(20):
+            loop.run_until_complete(service.add_health_metric(user_id, "pulse", {"value": 60 + value}))
+
+    counter = iter(range(10 ** 9))
+    return {
+        "health.get_user_profile": measure(_async(loop, lambda: service.get_user_profile(500)), number),
+        "health.add_health_metric": measure(
+            _async(loop, lambda: service.add_health_metric(next(counter) % 1000 + 1, "pulse", {"value": 70})),
+            number
+        ),
+        "health.get_screening_view": measure(_async(loop, lambda: service.get_screening_view(500)), number),
+        "health.get_user_metrics": measure(_async(loop, lambda: service.get_user_metrics(500, "pulse")), number),
+        "health.get_health_summary": measure(_async(loop, lambda: service.get_health_summary(500)), number),
+        "health.analyze_health_trends": measure(
+            _async(loop, lambda: service.analyze_health_trends(500, "pulse")), number
+        )
+    }
+
+
+def bench_screening_service(number: int) -> Dict[str, Any]:
+    service = ScreeningService()
+    profile = _sample_profile()
+    return {
+        "screening.get_personalized_schedule": measure(lambda: service.get_personalized_schedule(profile), number),
+        "screening.format_schedule_message": measure(lambda: service.format_schedule_message(profile), number)
+    }
+
+
+def bench_screening_reload(users: int = 10000) -> Dict[str, Any]:
+    """Смена одного правила каталога: пересчет всех календарей против пересчета затронутых когорт"""
+    rng = random.Random(11)
+    service = ScreeningService()
+    views = ScreeningViews(service)
+    profiles = [
+        UserProfile(user_id=user_id, gender=rng.choice(list(Gender)), age=rng.randint(18, 85),
+                    risk_factors=rng.sample(list(RiskFactor), rng.randint(0, 2)))
+        for user_id in range(1, users + 1)
+    ]
+    for profile in profiles:
+        views.compute(profile)
+
+    old = get_screening_catalogue()
+    rules = [rec.model_copy(update={"start_age": 50}) if rec.id == "psa_men_45" else rec for rec in old.rules]
+    diff = diff_catalogues(old, type(old)(old.version, rules))
+
+    def recompute_all():
+        for profile in profiles:
+            views.compute(profile)
+
+    blind = measure(recompute_all, number=1, repeat=3)
+    by_cohort = measure(lambda: views.apply_catalogue_diff(diff), number=1, repeat=3)
+    by_cohort["speedup"] = round(blind["best_us"] / by_cohort["best_us"], 1)
+    report = views.apply_catalogue_diff(diff)
+    print(f"catalogue diff touched {report['users_recomputed']} of {report['users']} users "
+          f"({report['cohorts_affected']} of {report['cohorts']} cohorts)")
+    return {"screening.reload_recompute_all": blind, "screening.reload_affected_cohorts": by_cohort}
+
+
+def bench_symptom_checker(loop: asyncio.AbstractEventLoop, number: int) -> Dict[str, Any]:
+    checker = SymptomChecker()
+
+    def full_session():
+        session = SymptomSession(user_id=1, body_part="headache")
+        for index, answer in enumerate(["Пульсирующая", "Несколько часов", "Да", "Да"]):
+            checker.process_answer(session, index, answer)
+        return checker._get_next_question(session)
+
+    return {
+        "symptoms.start_symptom_check": measure(
+            _async(loop, lambda: checker.start_symptom_check("headache", 1)), number
+        ),
+        "symptoms.full_session": measure(full_session, number)
+    }
+
+
+def bench_validators(number: int) -> Dict[str, Any]:
+    return {
+        "validators.validate_blood_pressure_string": measure(
+            lambda: validators.validate_blood_pressure_string("120/80"), number
+        ),
+        "validators.validate_health_metric": measure(
+            lambda: validators.validate_health_metric("pressure", {"systolic": 120, "diastolic": 80}), number
+        ),
+        "validators.sanitize_user_input": measure(
+            lambda: validators.sanitize_user_input("Болит голова <b>второй</b> день {срочно}"), number
+        ),
+        "validators.validate_email": measure(lambda: validators.validate_email("user@example.com"), number),
+        "validators.validate_phone": measure(lambda: validators.validate_phone("+7 (912) 345-67-89"), number),
+        "validators.validate_user_profile": measure(
+            lambda: validators.validate_user_profile({
+                "user_id": 1, "gender": "male", "age": 40, "risk_factors": ["smoking"],
+                "conditions": [{"condition_id": "hypertension", "name": "Гипертония", "severity": "mild"}]
+            }),
+            number
+        )
+    }
+
+
+def bench_validators_batch(rows: int = 10000) -> Dict[str, Any]:
+    """Пакетная проверка против поштучного validate_health_metric на одинаковых данных"""
+    rng = random.Random(7)
+    metrics = []
+    for _ in range(rows):
+        metric_type = rng.choice(["pressure", "pulse", "temperature", "weight"])
+        if metric_type == "pressure":
+            metrics.append((metric_type, {"systolic": rng.randint(50, 260), "diastolic": rng.randint(30, 160)}))
+        elif metric_type == "temperature":
+            metrics.append((metric_type, {"value": round(rng.uniform(34, 43), 1)}))
+        else:
+            metrics.append((metric_type, {"value": rng.randint(20, 320)}))
+
+    def per_item():
+        return [validators.validate_health_metric(t, v)[0] for t, v in metrics]
+
+    timings = {}
+    for name, fn in (("per_item", per_item), ("batch", lambda: validators.validate_metrics_batch(metrics))):
+        fn()
+        started = time.perf_counter()
+        for _ in range(5):
+            fn()
+        timings[name] = (time.perf_counter() - started) / 5
+
+    return {
+        f"validators.metrics_per_item_{rows}": {"best_us": round(timings["per_item"] * 1e6, 1)},
+        f"validators.metrics_batch_{rows}": {
+            "best_us": round(timings["batch"] * 1e6, 1),
+            "numpy": validators.np is not None,
+            "speedup": round(timings["per_item"] / timings["batch"], 2)
+        }
+    }
+
+
+def bench_community_matching(users: int = 10000) -> Dict[str, Any]:
+    """Подборка сообществ для многих пользователей: поштучно против match_communities_batch"""
+    rng = random.Random(11)
+    condition_ids = ["diabetes", "hypertension", "migraine", "vitiligo", "asthma"]
+    profiles = [
+        UserProfile(
+            user_id=user_id,
+            gender=Gender.FEMALE,
+            age=45,
+            conditions=[MedicalCondition(condition_id=cid, name=cid) for cid in rng.sample(condition_ids, rng.randint(0, 3))]
+        )
+        for user_id in range(users)
+    ]
+
+    def per_user():
+        service = CommunityService()
+        digests = {}
+        for profile in profiles:
+            messages = [service._render_community_message(community)
+                        for community in (service.get_community_for_condition(c.condition_id) for c in profile.conditions)
+                        if community]
+            if messages:
+                digests[profile.user_id] = "\n\n".join(messages)
+        return digests
+
+    def batch():
+        return CommunityService().build_digests(profiles)
+
+    timings = {}
+    for name, fn in (("per_user", per_user), ("batch", batch)):
+        fn()
+        started = time.perf_counter()
+        for _ in range(3):
+            fn()
+        timings[name] = (time.perf_counter() - started) / 3
+
+    return {
+        f"community.match_per_user_{users}": {"best_us": round(timings["per_user"] * 1e6, 1)},
+        f"community.match_batch_{users}": {
+            "best_us": round(timings["batch"] * 1e6, 1),
+            "speedup": round(timings["per_user"] / timings["batch"], 2)
+        }
+    }
+
+
+def bench_metric_series(loop: asyncio.AbstractEventLoop, days: int = 180) -> Dict[str, Any]:
+    """Дневной ряд давления за полгода: по сырым показателям против агрегатов"""
+    rng = random.Random(5)
+    service = HealthService()
+    now = datetime.now()
+    metrics = service._user_metrics(1, create=True)
+    for i in range(days * 96):
+        metric_type = "pressure" if i % 3 else "pulse"
+        value = ({"systolic": rng.randint(100, 160), "diastolic": rng.randint(60, 100)}
+                 if metric_type == "pressure" else {"value": rng.randint(55, 110)})
+        metrics.append(HealthMetric(user_id=1, metric_type=metric_type, value=value,
+                                    timestamp=now - timedelta(minutes=15 * i)))
+    start = now - timedelta(days=days)
+
+    def raw_scan():
+        days_values: Dict[Any, list] = {}
+        for metric in service.health_metrics[1]:
+            if metric.metric_type == "pressure" and metric.timestamp >= start:
+                days_values.setdefault(metric.timestamp.date(), []).append(metric.value["systolic"])
+        return [(day, len(values), min(values), max(values), sum(values) / len(values))
+                for day, values in sorted(days_values.items())]
+
+    # Агрегаты строятся при первом запросе
+    loop.run_until_complete(service.get_metric_series(1, "pressure", "systolic", start=start))
+    raw = measure(raw_scan, number=5, repeat=3)
+    rollups = measure(_async(loop, lambda: service.get_metric_series(1, "pressure", "systolic", start=start)),
+                      number=200)
+    rollups["speedup"] = round(raw["best_us"] / rollups["best_us"], 1)
+    return {"health.metric_series_raw_scan": raw, "health.metric_series_rollups": rollups}
+
+
+def bench_anomaly_detector(loop: asyncio.AbstractEventLoop, number: int) -> Dict[str, Any]:
+    """Стоимость проверки на пути записи: observe и add_health_metric с детектором и без"""
+    rng = random.Random(7)
+    detector = AnomalyDetector()
+    plain = HealthService()
+    checked = HealthService(anomaly_detector=AnomalyDetector())
+    for user_id in range(1, 1001):
+        for _ in range(20):
+            value = {"systolic": rng.randint(115, 135), "diastolic": rng.randint(70, 85)}
+            detector.observe(user_id, "pressure", value)
+            checked.anomaly_detector.observe(user_id, "pressure", value)
+
+    counter = iter(range(10 ** 9))
+
+    def reading():
+        return {"systolic": rng.randint(115, 135), "diastolic": rng.randint(70, 85)}
+
+    without = measure(
+        _async(loop, lambda: plain.add_health_metric(next(counter) % 1000 + 1, "pressure", reading())), number
+    )
+    with_detector = measure(
+        _async(loop, lambda: checked.add_health_metric(next(counter) % 1000 + 1, "pressure", reading())), number
+    )
+    with_detector["overhead_us"] = round(with_detector["best_us"] - without["best_us"], 3)
+    return {
+        "anomaly.observe": measure(lambda: detector.observe(next(counter) % 1000 + 1, "pressure", reading()), number),
+        "health.add_health_metric_plain": without,
+        "health.add_health_metric_with_detector": with_detector
+    }
+
+
+def run(number: int = 2000) -> Dict[str, Any]:
+    loop = asyncio.new_event_loop()
+    try:
+        results: Dict[str, Any] = {}
+        results.update(bench_health_service(loop, number))
+        results.update(bench_screening_service(number))
+        results.update(bench_screening_reload())
+        results.update(bench_symptom_checker(loop, number))
+        results.update(bench_validators(number))
+        results.update(bench_validators_batch())
+        results.update(bench_community_matching())
+        results.update(bench_metric_series(loop))
+        results.update(bench_anomaly_detector(loop, number))
+    finally:
+        loop.close()
+
+    for name, result in results.items():
+        line = f"{name:<45} best={result['best_us']:>9.3f}us"
+        if "median_us" in result:
+            line += f"  median={result['median_us']:>9.3f}us"
+        if "speedup" in result:
+            line += f"  speedup=x{result['speedup']}"
+        if "overhead_us" in result:
+            line += f"  overhead={result['overhead_us']}us"
+        print(line)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service micro-benchmarks")
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.number)
+    if args.output:
+        save_results(args.output, "micro", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Загрузка оболочки мини-приложения (GET /): рендер index.html через
+TemplateResponse на каждый запрос против заранее отрендеренной страницы с
+готовыми сжатыми вариантами — задержка и байты на запрос для полного
+ответа, сжатого ответа и условного GET (304).
+
+    cd src
+    python -m benchmarks.page_load --requests 500 --output bench.json
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.common import ServerThread, latency_summary, measure, save_results
+
+SCENARIOS = {
+    "identity": {"Accept-Encoding": "identity"},
+    "compressed": {"Accept-Encoding": "gzip, br"}
+}
+
+
+async def _drive(client: httpx.AsyncClient, path: str, headers: Dict[str, str], requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    wire_bytes = 0
+    statuses = set()
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - request_started)
+        wire_bytes += response.num_bytes_downloaded
+        statuses.add(response.status_code)
+    summary = latency_summary(latencies, time.perf_counter() - started)
+    summary["bytes_per_request"] = round(wire_bytes / requests)
+    summary["status"] = sorted(statuses)
+    return summary
+
+
+async def measure_http(url: str, requests: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=url) as client:
+        for mode, path in (("template_response", "/_bench/template-response"), ("prerendered", "/")):
+            first = await client.get(path, headers=SCENARIOS["compressed"])
+            scenarios = dict(SCENARIOS)
+            if "etag" in first.headers:
+                scenarios["conditional"] = {**SCENARIOS["compressed"], "If-None-Match": first.headers["etag"]}
+            for scenario, headers in scenarios.items():
+                summary = await _drive(client, path, headers, requests)
+                results[f"{mode}_{scenario}"] = summary
+                print(f"{mode:<18} {scenario:<12} {summary['bytes_per_request']:>7} B/req  "
+                      f"p50={summary['p50_ms']:.3f}ms p99={summary['p99_ms']:.3f}ms status={summary['status']}")
+    return results
+
+
+def run(requests: int) -> Dict[str, Any]:
+    os.environ.pop("WEBHOOK_URL", None)
+    from starlette.datastructures import Headers
+    from starlette.requests import Request
+    import main
+
+    templates = main.get_templates()
+    page = main.get_shell_page()
+
+    # Прежний обработчик: рендер шаблона на каждый запрос
+    @main.app.get("/_bench/template-response", include_in_schema=False)
+    async def template_response(request: Request):
+        return templates.TemplateResponse("index.html", {"request": request})
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""}
+    headers = Headers(raw=[(b"accept-encoding", b"gzip, br")])
+    results: Dict[str, Any] = {
+        "render": {
+            "template_response": measure(lambda: templates.TemplateResponse("index.html", {"request": Request(scope)}),
+                                         number=200),
+            "prerendered": measure(lambda: page.response(headers), number=200)
+        }
+    }
+    for mode, summary in results["render"].items():
+        print(f"{mode:<18} build response {summary['best_us']:>10.1f}us")
+
+    with ServerThread(main.app) as server:
+        results.update(asyncio.run(measure_http(server.url, requests)))
+    for scenario in ("identity", "compressed", "conditional"):
+        # Без ETag прежний ответ на условный запрос — полный сжатый ответ
+        baseline = results.get(f"template_response_{scenario}", results["template_response_compressed"])
+        summary = results[f"prerendered_{scenario}"]
+        summary["p50_speedup"] = round(baseline["p50_ms"] / summary["p50_ms"], 2) if summary["p50_ms"] else None
+        summary["bytes_saved"] = round(1 - summary["bytes_per_request"] / baseline["bytes_per_request"], 4)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mini-app shell page load benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.requests)
+    if args.output:
+        save_results(args.output, "page_load", results)
+
+
+if __name__ == "__main__":
+    main()
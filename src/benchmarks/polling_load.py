@@ -0,0 +1,129 @@
+"""
+Нагрузочный прогон long polling: обновления складываются в очередь заглушки
+MAX API, UpdatePoller забирает их пачками и прогоняет через общий конвейер
+submit_update (дедупликация + упорядочивание по пользователю).
+
+Для каждого размера пачки считается пропускная способность на разгрузке
+накопленной очереди и задержка доставки при равномерном потоке обновлений.
+
+    cd src
+    python -m benchmarks.polling_load --updates 2000 --limits 1 10 100 --output bench.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import ServerThread, latency_summary, save_results
+from benchmarks.fake_max_api import create_fake_max_api
+from benchmarks.webhook_load import make_update
+
+
+async def measure(fake_api, limits: List[int], updates: int, trickle: int, trickle_interval_ms: float,
+                  timeout: int, users: int, callback_ratio: float, seed: int) -> Dict[str, Any]:
+    import main
+    from services.update_poller import UpdatePoller
+
+    rng = random.Random(seed)
+    seq = 0
+    enqueued_at: Dict[str, float] = {}
+    delivered: List[float] = []
+
+    async def submit(update):
+        task = await main.submit_update(update)
+        key = update.callback.callback_id if update.callback else update.message.body.mid
+
+        async def complete():
+            handled = await task if task is not None else False
+            delivered.append(time.perf_counter() - enqueued_at.pop(key))
+            return handled
+
+        return asyncio.ensure_future(complete())
+
+    def enqueue(count: int):
+        nonlocal seq
+        batch = [make_update(seq + i, users, callback_ratio, rng) for i in range(count)]
+        seq += count
+        now = time.perf_counter()
+        for update in batch:
+            key = update["callback"]["callback_id"] if "callback" in update else update["message"]["body"]["mid"]
+            enqueued_at[key] = now
+        fake_api.state.enqueue(batch)
+
+    async def wait_delivered(count: int):
+        while len(delivered) < count:
+            await asyncio.sleep(0.001)
+
+    results: Dict[str, Any] = {}
+    for limit in limits:
+        poller = UpdatePoller(main.get_max_api(), submit, limit=limit, timeout=timeout)
+        poller.marker = len(fake_api.state.pending)
+
+        # Разгрузка накопленной очереди (например, после простоя бота)
+        delivered.clear()
+        enqueue(updates)
+        started = time.perf_counter()
+        poller.start()
+        await wait_delivered(updates)
+        backlog = latency_summary(delivered, time.perf_counter() - started)
+        backlog["batches"] = poller.batches
+
+        # Равномерный поток: задержка от появления обновления до обработки
+        delivered.clear()
+        for _ in range(trickle):
+            enqueue(1)
+            await asyncio.sleep(trickle_interval_ms / 1000)
+        await wait_delivered(trickle)
+        stream = latency_summary(delivered, trickle * trickle_interval_ms / 1000)
+        await poller.stop()
+
+        results[f"polling_l{limit}"] = {"backlog": backlog, "stream": stream, "failed": poller.failed}
+        print(
+            f"limit={limit:<4} backlog {backlog['throughput_rps']:>8} ups in {backlog['batches']} batches  "
+            f"stream p50={stream['p50_ms']:.2f}ms p99={stream['p99_ms']:.2f}ms failed={poller.failed}"
+        )
+
+    await main.get_update_executor().stop()
+    return results
+
+
+def run(updates: int, limits: List[int], trickle: int = 200, trickle_interval_ms: float = 5.0, timeout: int = 30,
+        users: int = 500, callback_ratio: float = 0.5, api_latency_ms: float = 0.0, seed: int = 42) -> Dict[str, Any]:
+    fake_api = create_fake_max_api(latency_ms=api_latency_ms)
+
+    with ServerThread(fake_api) as api_server:
+        # Настройки читаются при импорте config, поэтому окружение задаем до импорта приложения
+        os.environ["MAX_API_URL"] = api_server.url
+        os.environ.setdefault("MAX_BOT_TOKEN", "benchmark-token")
+        os.environ.setdefault("OUTBOUND_RATE_PER_S", "0")
+        results = asyncio.run(measure(fake_api, limits, updates, trickle, trickle_interval_ms, timeout,
+                                      users, callback_ratio, seed))
+
+    results["max_api_calls"] = dict(fake_api.state.calls)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long polling pipeline load test")
+    parser.add_argument("--updates", type=int, default=2000, help="Размер накопленной очереди")
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--trickle", type=int, default=200, help="Обновлений в равномерном потоке")
+    parser.add_argument("--trickle-interval-ms", type=float, default=5.0)
+    parser.add_argument("--timeout", type=int, default=30, help="Время ожидания long polling, с")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--callback-ratio", type=float, default=0.5)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.updates, args.limits, args.trickle, args.trickle_interval_ms, args.timeout, args.users,
+                  args.callback_ratio, args.api_latency_ms, args.seed)
+    if args.output:
+        save_results(args.output, "polling_load", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Бенчмарк популяционной аналитики: синтетический журнал событий (снимок +
+хвост), прогон задания с разным числом процессов, время, пропускная
+способность и пиковая память.
+
+    cd src
+    python -m benchmarks.population_analytics --users 20000 --events 1000000 --workers 1 2 4 --output bench.json
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import resource
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import save_results
+
+from models.health_models import UserProfile
+from services.event_log import EventLog
+from services.health_service import HealthService, METRIC_RECORDED, PROFILE_CREATED
+from services.population_analytics import run_analytics
+
+
+def _write_metrics(log: EventLog, count: int, users: int, rng: random.Random, span_days: int = 180):
+    now = time.time()
+    for _ in range(count):
+        user_id = rng.randint(1, users)
+        ts = now - rng.uniform(0, span_days * 86400)
+        if rng.random() < 0.6:
+            base = 115 + user_id % 40
+            data = {"type": "pressure", "notes": None,
+                    "value": {"systolic": base + rng.randint(-10, 10), "diastolic": 70 + user_id % 25}}
+        else:
+            data = {"type": "weight", "notes": None, "value": {"value": round(60 + user_id % 50 + rng.uniform(-2, 2), 1)}}
+        log.append(METRIC_RECORDED, user_id, data, ts)
+
+
+def generate_log(directory: str, users: int, events: int, seed: int = 3):
+    """Профили и первая половина показателей попадают в снимок, вторая — в хвост журнала"""
+    rng = random.Random(seed)
+    log = EventLog(directory)
+    log.recover(lambda records: None, lambda event: None)
+    for user_id in range(1, users + 1):
+        conditions = [{"condition_id": "hypertension", "name": "Гипертония"}] if rng.random() < 0.2 else []
+        risk_factors = ["obesity"] if rng.random() < 0.3 else []
+        profile = UserProfile(user_id=user_id, gender=rng.choice(["male", "female"]), age=rng.randint(16, 90),
+                              risk_factors=risk_factors, conditions=conditions)
+        log.append(PROFILE_CREATED, user_id, profile.model_dump(mode="json"))
+    _write_metrics(log, events // 2, users, rng)
+    log.close()
+
+    service = HealthService(event_log=EventLog(directory))
+    asyncio.run(service.snapshot())
+    service.event_log.close()
+
+    log = EventLog(directory)
+    log.recover(lambda records: None, lambda event: None)
+    _write_metrics(log, events - events // 2, users, rng)
+    log.close()
+
+
+def _measure_job(directory: str, workers: int, chunk_bytes: int, results):
+    # ru_maxrss в КБ (Linux); для воркеров пула — максимум по ним
+    started = time.perf_counter()
+    tables = run_analytics(directory, workers, chunk_bytes)
+    elapsed = time.perf_counter() - started
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    results.put((elapsed, round(own / 1024, 1), round(children / 1024, 1), tables))
+
+
+def run(users: int, events: int, workers_levels: List[int], chunk_mb: int = 4) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix="analytics_bench_")
+    results: Dict[str, Any] = {"users": users, "events": events}
+    try:
+        # Генерация и прогоны — в отдельных процессах: ru_maxrss наследуется
+        # при fork/exec, и память генерации иначе попала бы в замеры
+        context = multiprocessing.get_context("spawn")
+        started = time.perf_counter()
+        generator = context.Process(target=generate_log, args=(directory, users, events))
+        generator.start()
+        generator.join()
+        print(f"generated {users} users / {events} events in {time.perf_counter() - started:.1f}s")
+
+        for workers in workers_levels:
+            queue = context.Queue()
+            job = context.Process(target=_measure_job, args=(directory, workers, chunk_mb * 1024 * 1024, queue))
+            job.start()
+            elapsed, parent_mb, worker_mb, tables = queue.get()
+            job.join()
+            results[f"workers_{workers}"] = {
+                "elapsed_s": round(elapsed, 2),
+                "readings_per_s": round(events / elapsed),
+                "parent_rss_mb": parent_mb,
+                "worker_rss_mb": worker_mb,
+                "cohorts": len(tables["hypertension_prevalence"]["age_band"]),
+                "trend_rows": len(tables["obesity_weight_trend"]["month"])
+            }
+            print(f"workers={workers:<3} {elapsed:.2f}s  {events / elapsed:,.0f} readings/s  "
+                  f"peak RSS parent {parent_mb} MB, worker {worker_mb} MB")
+        results["hypertension_prevalence"] = tables["hypertension_prevalence"]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Population analytics job benchmark")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-mb", type=int, default=4)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.users, args.events, args.workers, args.chunk_mb)
+    if args.output:
+        save_results(args.output, "population_analytics", results)
+
+
+if __name__ == "__main__":
+    main()
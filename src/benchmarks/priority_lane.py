@@ -0,0 +1,106 @@
+"""
+Приоритетная полоса исходящих сообщений под синтетической нагрузкой.
+
+Поток обычных сообщений превышает лимит частоты, очередь растет; на его
+фоне с постоянным интервалом отправляются срочные сообщения. Сравнение:
+срочные в общей очереди против приоритетной полосы — задержка доставки по
+полосам и доля сообщений, уложившихся в SLO.
+
+    cd src
+    python -m benchmarks.priority_lane --rate 100 --offered 200 --seconds 5 --output bench.json
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import ServerThread, latency_summary, save_results
+from benchmarks.fake_max_api import create_fake_max_api
+
+
+def _slo_share(latencies: List[float], slo_s: float) -> float:
+    return round(sum(1 for latency in latencies if latency <= slo_s) / len(latencies), 4) if latencies else 0.0
+
+
+async def measure(api_url: str, use_priority: bool, rate: float, offered: float, seconds: float,
+                  urgent_interval_ms: float, workers: int, priority_slo: float, normal_slo: float) -> Dict[str, Any]:
+    from services.max_api import MaxApiService, close_http_client
+    from services.outbound import OutboundDispatcher
+
+    api = MaxApiService()
+    api.base_url = api_url
+    dispatcher = OutboundDispatcher(rate=rate, burst=int(rate // 5) or 1, workers=workers,
+                                    priority_slo=priority_slo, normal_slo=normal_slo)
+    latencies: Dict[str, List[float]] = {"normal": [], "urgent": []}
+
+    async def send(chat_id: int, lane: str, priority: bool):
+        started = time.perf_counter()
+        await dispatcher.submit(
+            lambda: api._make_request("POST", "/messages", params={"chat_id": chat_id}, json={"text": lane}),
+            priority
+        )
+        latencies[lane].append(time.perf_counter() - started)
+
+    tasks = []
+    started = time.perf_counter()
+    next_urgent = started
+    sent = 0
+    while time.perf_counter() - started < seconds:
+        now = time.perf_counter()
+        # Обычные сообщения с частотой offered, срочные — раз в urgent_interval_ms
+        while sent < (now - started) * offered:
+            tasks.append(asyncio.ensure_future(send(sent, "normal", False)))
+            sent += 1
+        if now >= next_urgent:
+            tasks.append(asyncio.ensure_future(send(-sent, "urgent", use_priority)))
+            next_urgent += urgent_interval_ms / 1000
+        await asyncio.sleep(0.002)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop()
+    await close_http_client()
+
+    results = {}
+    for lane, slo in (("urgent", priority_slo), ("normal", normal_slo)):
+        summary = latency_summary(latencies[lane], elapsed)
+        summary["slo_ms"] = slo * 1000
+        summary["within_slo"] = _slo_share(latencies[lane], slo)
+        results[lane] = summary
+    return results
+
+
+def run(rate: float, offered: float, seconds: float, urgent_interval_ms: float = 100.0, workers: int = 16,
+        api_latency_ms: float = 20.0, priority_slo_ms: float = 500.0, normal_slo_ms: float = 5000.0) -> Dict[str, Any]:
+    fake_api = create_fake_max_api(latency_ms=api_latency_ms)
+    results: Dict[str, Any] = {"rate": rate, "offered": offered, "seconds": seconds}
+
+    with ServerThread(fake_api) as api_server:
+        for mode, use_priority in (("shared_queue", False), ("priority_lane", True)):
+            lanes = asyncio.run(measure(api_server.url, use_priority, rate, offered, seconds, urgent_interval_ms,
+                                        workers, priority_slo_ms / 1000, normal_slo_ms / 1000))
+            results[mode] = lanes
+            for lane, summary in lanes.items():
+                print(f"{mode:<14} {lane:<7} n={summary['count']:<5} p50={summary['p50_ms']:>9.2f}ms "
+                      f"p99={summary['p99_ms']:>9.2f}ms  within SLO {summary['slo_ms']:.0f}ms: "
+                      f"{summary['within_slo']:.1%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbound priority lane benchmark")
+    parser.add_argument("--rate", type=float, default=100.0, help="лимит частоты обычной полосы, сообщений/с")
+    parser.add_argument("--offered", type=float, default=200.0, help="частота обычных сообщений, сообщений/с")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--urgent-interval-ms", type=float, default=100.0)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--api-latency-ms", type=float, default=20.0)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.rate, args.offered, args.seconds, args.urgent_interval_ms, args.workers, args.api_latency_ms)
+    if args.output:
+        save_results(args.output, "priority_lane", results)
+
+
+if __name__ == "__main__":
+    main()
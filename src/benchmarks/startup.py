@@ -0,0 +1,76 @@
+"""
+Бенчмарк холодного старта: время импорта (python -X importtime) и время lifespan.
+
+    cd src
+    python -m benchmarks.startup --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import_time(module: str = "main") -> Dict[str, Any]:
+    """Импорт модуля в отдельном процессе с -X importtime и разбор отчета"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    modules: List[Dict[str, Any]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # Строка заголовка таблицы
+            continue
+        modules.append({
+            "module": parts[2].strip(),
+            "self_us": self_us,
+            "cumulative_us": cumulative_us
+        })
+
+    total = next((m["cumulative_us"] for m in modules if m["module"] == module), 0)
+    return {"module": module, "total_us": total, "modules": modules}
+
+
+def measure_startup_time() -> float:
+    """Время от создания TestClient до готовности приложения (lifespan), в секундах"""
+    sys.path.insert(0, SRC_DIR)
+    from fastapi.testclient import TestClient
+    from main import app
+
+    started = time.perf_counter()
+    with TestClient(app) as client:
+        elapsed = time.perf_counter() - started
+        client.get("/health")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    report = measure_import_time(args.module)
+    print(f"📦 import {report['module']}: {report['total_us'] / 1000:.1f} ms")
+    print(f"\nTop {args.top} by self time:")
+    for item in sorted(report["modules"], key=lambda m: m["self_us"], reverse=True)[:args.top]:
+        print(f"  {item['self_us'] / 1000:8.1f} ms  {item['module']}")
+
+    print(f"\n🚀 lifespan startup: {measure_startup_time() * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
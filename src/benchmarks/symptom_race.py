@@ -0,0 +1,96 @@
+"""
+Воспроизведение гонки за CallbackHandler.symptom_sessions.
+
+Пользователь проходит опрос о головной боли и дважды быстро нажимает ответ
+на последний вопрос. Оба обновления обрабатываются одновременно: без
+упорядочивания оба видят сессию, оба отправляют рекомендацию, а второй
+падает на удалении уже удаленной сессии. Через KeyedExecutor второе нажатие
+обрабатывается после первого и получает "Сессия опроса не найдена".
+
+    cd src
+    python -m benchmarks.symptom_race --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict
+
+from benchmarks.common import ServerThread
+from benchmarks.fake_max_api import create_fake_max_api
+
+USER_ID = 42
+
+
+def callback_update(payload: str, seq: int) -> Dict[str, Any]:
+    timestamp = int(time.time() * 1000) + seq
+    return {
+        "update_type": "message_callback",
+        "timestamp": timestamp,
+        "callback": {
+            "timestamp": timestamp,
+            "callback_id": f"cb.race.{seq}",
+            "payload": payload,
+            "user": {"user_id": USER_ID, "first_name": "Race", "is_bot": False}
+        }
+    }
+
+
+async def scenario(ordered: bool, shards: int) -> Dict[str, Any]:
+    from handlers.webhook_handler import WebhookHandler
+    from models.max_models import Update
+    from utils.keyed_executor import KeyedExecutor
+
+    handler = WebhookHandler()
+    executor = KeyedExecutor(shards, name=f"race_{'ordered' if ordered else 'direct'}")
+
+    async def deliver(payload: str, seq: int):
+        update = Update(**callback_update(payload, seq))
+        if ordered:
+            return await executor.run(handler.ordering_key(update), lambda: handler.handle_update(update))
+        return await handler.handle_update(update)
+
+    # Выбор симптома и ответы на первые вопросы — последовательно
+    await deliver("symptom_head", 0)
+    for question_index in range(3):
+        await deliver(f"symptom_answer_{question_index}_0", question_index + 1)
+
+    # Двойное нажатие на ответ последнего вопроса
+    results = await asyncio.gather(
+        deliver("symptom_answer_3_0", 10),
+        deliver("symptom_answer_3_0", 11),
+        return_exceptions=True
+    )
+    await executor.stop()
+
+    errors = [f"{type(result).__name__}: {result}" for result in results if isinstance(result, BaseException)]
+    return {"errors": errors, "sessions_left": len(handler.callback_handler.symptom_sessions)}
+
+
+def run(latency_ms: float, shards: int) -> Dict[str, Any]:
+    fake_api = create_fake_max_api(latency_ms)
+    results = {}
+    with ServerThread(fake_api) as server:
+        os.environ["MAX_API_URL"] = server.url
+        os.environ.setdefault("MAX_BOT_TOKEN", "race-token")
+        for ordered in (False, True):
+            fake_api.state.calls.clear()
+            outcome = asyncio.run(scenario(ordered, shards))
+            outcome["messages_sent"] = sum(fake_api.state.calls.values())
+            results["ordered" if ordered else "direct"] = outcome
+
+    for mode, outcome in results.items():
+        print(f"{mode:<8} messages={outcome['messages_sent']} errors={outcome['errors'] or 'none'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce the symptom session race")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Задержка заглушки MAX API")
+    parser.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args()
+    run(args.latency_ms, args.shards)
+
+
+if __name__ == "__main__":
+    main()
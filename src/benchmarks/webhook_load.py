@@ -0,0 +1,134 @@
+"""
+Нагрузочный прогон /webhook с синтетическим трафиком message_created/message_callback.
+
+Приложение и заглушка MAX API поднимаются локально через uvicorn; для каждого
+уровня конкурентности считаются p50/p95/p99 и пропускная способность.
+
+    cd src
+    python -m benchmarks.webhook_load --requests 2000 --concurrency 1 8 32 --output bench.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import ServerThread, latency_summary, save_results
+from benchmarks.fake_max_api import create_fake_max_api
+
+MESSAGE_TEXTS = ["/start", "здоровье", "симптомы", "клиники", "помощь", "профиль", "привет"]
+CALLBACK_PAYLOADS = ["main_menu", "help", "symptoms", "symptom_head", "health_diary", "communities", "profile"]
+
+
+def make_update(seq: int, users: int, callback_ratio: float, rng: random.Random) -> Dict[str, Any]:
+    """Синтетическое обновление MAX в формате models.max_models.Update"""
+    user_id = rng.randint(1, users)
+    user = {"user_id": user_id, "first_name": f"User{user_id}", "is_bot": False}
+    timestamp = int(time.time() * 1000) + seq
+
+    if rng.random() < callback_ratio:
+        return {
+            "update_type": "message_callback",
+            "timestamp": timestamp,
+            "callback": {
+                "timestamp": timestamp,
+                "callback_id": f"cb.{seq}",
+                "payload": rng.choice(CALLBACK_PAYLOADS),
+                "user": user
+            }
+        }
+
+    return {
+        "update_type": "message_created",
+        "timestamp": timestamp,
+        "message": {
+            "sender": user,
+            "recipient": {"chat_id": user_id, "chat_type": "dialog", "user_id": user_id},
+            "timestamp": timestamp,
+            "body": {"mid": f"mid.{seq}", "seq": seq, "text": rng.choice(MESSAGE_TEXTS)}
+        }
+    }
+
+
+async def drive(url: str, updates: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                update = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/webhook", json=update)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    summary = latency_summary(latencies, elapsed)
+    summary["errors"] = errors
+    return summary
+
+
+def run(requests: int, concurrency_levels: List[int], users: int = 500, callback_ratio: float = 0.5,
+        api_latency_ms: float = 0.0, seed: int = 42) -> Dict[str, Any]:
+    fake_api = create_fake_max_api(latency_ms=api_latency_ms)
+    results: Dict[str, Any] = {}
+
+    with ServerThread(fake_api) as api_server:
+        # Настройки читаются при импорте config, поэтому окружение задаем до импорта приложения
+        os.environ["MAX_API_URL"] = api_server.url
+        os.environ.setdefault("MAX_BOT_TOKEN", "benchmark-token")
+        os.environ.pop("WEBHOOK_URL", None)
+        # Меряется конвейер, а не лимит частоты исходящих сообщений
+        os.environ.setdefault("OUTBOUND_RATE_PER_S", "0")
+        from main import app
+
+        with ServerThread(app) as app_server:
+            rng = random.Random(seed)
+            # Прогрев: ленивые сервисы и соединения
+            asyncio.run(drive(app_server.url, [make_update(i, users, callback_ratio, rng) for i in range(50)], 4))
+
+            for concurrency in concurrency_levels:
+                updates = [make_update(i, users, callback_ratio, rng) for i in range(requests)]
+                summary = asyncio.run(drive(app_server.url, updates, concurrency))
+                results[f"webhook_c{concurrency}"] = summary
+                print(
+                    f"c={concurrency:<4} {summary['throughput_rps']:>8} rps  "
+                    f"p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms "
+                    f"p99={summary['p99_ms']:.2f}ms errors={summary['errors']}"
+                )
+
+    results["max_api_calls"] = dict(fake_api.state.calls)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook pipeline load test")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--callback-ratio", type=float, default=0.5)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON-файл для сохранения результатов")
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency, args.users, args.callback_ratio, args.api_latency_ms, args.seed)
+    if args.output:
+        save_results(args.output, "webhook_load", results)
+
+
+if __name__ == "__main__":
+    main()
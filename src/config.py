@@ -20,6 +20,99 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
 
+    # Startup: ленивая инициализация сервисов и регистрация webhook в фоне
+    fast_start: bool = True
+
+    # Метрики Prometheus (/metrics)
+    metrics_enabled: bool = False
+
+    # Трассировка (спаны в формате OpenTelemetry, экспорт в JSON Lines)
+    tracing_enabled: bool = False
+    trace_sample_rate: float = 1.0
+    trace_export_path: Optional[str] = "traces.jsonl"
+
+    # Админ-эндпоинты (X-Admin-Token) и сэмплирующий профайлер
+    admin_token: Optional[str] = None
+    profiler_enabled: bool = False
+    profiler_max_seconds: float = 30.0
+
+    # Кэш профилей и отложенная запись
+    profile_cache_size: int = 10000
+    profile_cache_ttl: float = 300.0
+    profile_write_behind: bool = False
+    profile_write_behind_batch: int = 100
+    profile_write_behind_interval_ms: float = 50.0
+
+    # Каталог клиник (CSV или Parquet) и шаг сетки пространственного индекса в градусах
+    clinic_catalog_path: Optional[str] = None
+    clinic_grid_cell_deg: float = 0.02
+
+    # Бинарный справочный каталог (python -m services.catalog), общий для воркеров через mmap
+    reference_catalog_path: Optional[str] = None
+
+    # Каталог правил обследований (JSON с версией; None — data/screening_catalogue.json
+    # или секция справочного каталога) и период проверки файла на изменения (0 — без слежения)
+    screening_catalogue_path: Optional[str] = None
+    screening_catalogue_watch_s: float = 5.0
+
+    # Дедупликация повторных доставок webhook: memory (в процессе) или redis (общая для воркеров)
+    webhook_dedup_enabled: bool = True
+    webhook_dedup_backend: str = "memory"
+    webhook_dedup_redis_url: Optional[str] = None
+    webhook_dedup_window_s: float = 600.0
+    webhook_dedup_max_size: int = 100000
+
+    # Обработка webhook: обновления одного пользователя строго по порядку, разных — параллельно
+    webhook_shards: int = 16
+    webhook_shard_queue_size: int = 1000
+
+    # Клиент MAX API: общий пул соединений вместо клиента на каждый запрос
+    max_api_timeout_s: float = 5.0
+    max_api_max_connections: int = 100
+
+    # Исходящие сообщения: обычная полоса (очередь + лимит частоты) и
+    # приоритетная для срочных оповещений; отправителей меньше, чем соединений
+    outbound_dispatch_enabled: bool = True
+    outbound_rate_per_s: float = 30.0
+    outbound_burst: int = 30
+    outbound_workers: int = 16
+    outbound_queue_size: int = 10000
+    outbound_priority_slo_ms: float = 500.0
+    outbound_normal_slo_ms: float = 5000.0
+
+    # Получение обновлений: webhook или polling (GET /updates без публичного URL)
+    update_mode: str = "webhook"
+    polling_limit: int = 100
+    polling_timeout_s: int = 30
+    polling_marker_path: Optional[str] = "polling.marker"
+
+    # Журнал событий дневника здоровья (None — без сохранения между перезапусками)
+    event_log_dir: Optional[str] = None
+    event_log_segment_mb: int = 64
+    event_log_snapshot_every: int = 100000
+    event_log_fsync: bool = False
+
+    # Запись показателей в БД (DATABASE_URL) групповой фиксацией
+    metric_store_enabled: bool = False
+    metric_commit_batch: int = 256
+    metric_commit_delay_ms: float = 0.0
+
+    # Обнаружение аномалий в показателях (EWMA-базовая линия пользователя)
+    anomaly_detection_enabled: bool = True
+    anomaly_ewma_alpha: float = 0.1
+    anomaly_z_threshold: float = 3.0
+    anomaly_warmup: int = 5
+
+    # HTTP: сжатие ответов (gzip; brotli, если установлен пакет brotli) и кэширование статики
+    http_compression_enabled: bool = True
+    http_compression_min_bytes: int = 500
+    # Крупные и потоковые ответы (без Content-Length) не буферизуются для сжатия
+    http_compression_max_bytes: int = 1048576
+    static_max_age_s: int = 31536000
+    # Кэш байткода Jinja для динамических шаблонов (None — системный временный каталог)
+    template_bytecode_cache: bool = True
+    template_bytecode_cache_dir: Optional[str] = None
+
     # Database
     database_url: str = "sqlite:///./health_compass.db"
 
@@ -4,12 +4,23 @@ from services.health_service import HealthService
 from services.symptom_checker import SymptomChecker
 from services.community_service import CommunityService
 from models.health_models import UserProfile, Gender, RiskFactor, SymptomSession
+from utils.metrics import CALLBACK_LATENCY, normalize_payload
+from utils.tracing import tracer
+
+METRIC_LABELS = {
+    "pressure": "❤️ Давление",
+    "pulse": "💓 Пульс",
+    "temperature": "🌡️ Температура",
+    "weight": "⚖️ Вес"
+}
+COMPONENT_LABELS = {"systolic": "верхнее", "diastolic": "нижнее"}
 
 
 class CallbackHandler:
-    def __init__(self):
+    def __init__(self, health_service: HealthService = None, message_handler=None):
         self.max_api = MaxApiService()
-        self.health_service = HealthService()
+        self.health_service = health_service or HealthService()
+        self._message_handler = message_handler
         self.symptom_checker = SymptomChecker()
         self.community_service = CommunityService()
 
@@ -17,9 +28,25 @@ class CallbackHandler:
         self.user_sessions = {}
         self.symptom_sessions = {}
 
+    @property
+    def message_handler(self):
+        """Экраны, общие с текстовыми командами; один обработчик на весь срок жизни"""
+        if self._message_handler is None:
+            from handlers.message_handler import MessageHandler
+            self._message_handler = MessageHandler(self.health_service)
+        return self._message_handler
+
     async def handle_callback(self, callback: Dict[str, Any], message: Dict[str, Any] = None):
         """Обработка callback от кнопок"""
         payload = callback.get("payload", "")
+
+        payload_label = normalize_payload(payload)
+        span = tracer.start_span("callback_handler", attributes={"callback.payload": payload_label})
+        with span, CALLBACK_LATENCY.time(payload_label):
+            await self._dispatch_callback(callback, message, payload)
+
+    async def _dispatch_callback(self, callback: Dict[str, Any], message: Dict[str, Any], payload: str):
+        """Маршрутизация callback по payload"""
         user = callback.get("user", {})
         user_id = user.get("user_id")
         chat_id = callback.get("user", {}).get("user_id")
@@ -37,14 +64,16 @@ class CallbackHandler:
             await self._handle_my_screenings(chat_id, user_id)
         elif payload == "symptoms":
             await self._handle_symptoms(chat_id)
-        elif payload.startswith("symptom_"):
-            await self._handle_symptom_selection(chat_id, user_id, payload)
         elif payload.startswith("symptom_answer_"):
             await self._handle_symptom_answer(chat_id, user_id, payload, callback)
+        elif payload.startswith("symptom_"):
+            await self._handle_symptom_selection(chat_id, user_id, payload)
         elif payload == "find_clinic":
-            await self._handle_find_clinic(chat_id)
+            await self._handle_find_clinic(chat_id, user_id)
         elif payload == "health_diary":
             await self._handle_health_diary(chat_id, user_id)
+        elif payload == "health_stats":
+            await self._handle_health_stats(chat_id, user_id)
         elif payload == "communities":
             await self._handle_communities(chat_id, user_id)
         elif payload == "profile":
@@ -64,26 +93,20 @@ class CallbackHandler:
 
     async def _handle_main_menu(self, chat_id: int, user_id: int):
         """Главное меню"""
-        from handlers.message_handler import MessageHandler
-        message_handler = MessageHandler()
-        await message_handler._handle_start(chat_id, {"user_id": user_id, "first_name": "Пользователь"})
+        await self.message_handler._handle_start(chat_id, {"user_id": user_id, "first_name": "Пользователь"})
 
     async def _handle_my_screenings(self, chat_id: int, user_id: int):
         """Мои обследования"""
-        profile = await self.health_service.get_user_profile(user_id)
+        view = await self.health_service.get_screening_view(user_id)
 
-        if profile:
-            from handlers.message_handler import MessageHandler
-            message_handler = MessageHandler()
-            await message_handler._handle_screening_schedule(chat_id, profile)
+        if view:
+            await self.message_handler._handle_screening_schedule(chat_id, view)
         else:
             await self._ask_for_profile(chat_id)
 
     async def _handle_symptoms(self, chat_id: int):
         """Симптомы"""
-        from handlers.message_handler import MessageHandler
-        message_handler = MessageHandler()
-        await message_handler._handle_symptoms_start(chat_id)
+        await self.message_handler._handle_symptoms_start(chat_id)
 
     async def _handle_symptom_selection(self, chat_id: int, user_id: int, payload: str):
         """Выбор симптома"""
@@ -144,6 +167,8 @@ class CallbackHandler:
         else:
             # Показываем рекомендацию
             await self._show_symptom_recommendation(chat_id, next_step)
+            # Запоминаем рекомендацию для поиска клиник по специалистам
+            self.user_sessions.setdefault(user_id, {})["last_recommendation"] = next_step
             # Очищаем сессию
             del self.symptom_sessions[user_id]
 
@@ -174,24 +199,24 @@ class CallbackHandler:
             [{"type": "callback", "text": "↩️ Главное меню", "payload": "main_menu"}]
         ]
 
-        await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
+        await self.max_api.send_message_with_keyboard(
+            chat_id, text, buttons, priority=recommendation['urgency'] == 'high'
+        )
 
-    async def _handle_find_clinic(self, chat_id: int):
-        """Поиск клиник"""
-        from handlers.message_handler import MessageHandler
-        message_handler = MessageHandler()
-        await message_handler._handle_find_clinic(chat_id)
+    async def _handle_find_clinic(self, chat_id: int, user_id: int = None):
+        """Поиск клиник (с учетом последней рекомендации по симптомам)"""
+        recommendation = self.user_sessions.get(user_id, {}).get("last_recommendation") if user_id else None
+        await self.message_handler._handle_find_clinic(chat_id, user_id, recommendation)
 
     async def _handle_health_diary(self, chat_id: int, user_id: int):
         """Дневник здоровья"""
-        profile = await self.health_service.get_user_profile(user_id)
+        # Профиль и показатели загружаются одним параллельным запросом
+        health_summary = await self.health_service.get_health_summary(user_id)
 
-        if not profile:
+        if "error" in health_summary:
             await self._ask_for_profile(chat_id)
             return
 
-        health_summary = await self.health_service.get_health_summary(user_id)
-
         text = "📊 Ваш дневник здоровья:\n\n"
         text += f"• Заболевания: {health_summary['conditions_count']}\n"
         text += f"• Записей показателей: {health_summary['metrics_count']}\n"
@@ -217,29 +242,51 @@ class CallbackHandler:
 
         await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
 
+    async def _handle_health_stats(self, chat_id: int, user_id: int, days: int = 30):
+        """Статистика показателей за период (по дневным агрегатам)"""
+        profile = await self.health_service.get_user_profile(user_id)
+        if not profile:
+            await self._ask_for_profile(chat_id)
+            return
+
+        stats = await self.health_service.get_metric_stats(user_id, days)
+        if not stats:
+            text = f"📈 За последние {days} дней показателей нет.\n\nДобавьте измерения в дневнике здоровья."
+        else:
+            text = f"📈 Статистика за {days} дней:\n"
+            for metric_type, components in stats.items():
+                text += f"\n{METRIC_LABELS.get(metric_type, metric_type)}:\n"
+                for component, summary in components.items():
+                    label = COMPONENT_LABELS.get(component, "")
+                    prefix = f"{label}: " if label else ""
+                    text += (
+                        f"• {prefix}среднее {summary['mean']:g}, "
+                        f"от {summary['min']:g} до {summary['max']:g} ({summary['count']} изм.)\n"
+                    )
+
+        buttons = [
+            [{"type": "callback", "text": "📊 Дневник здоровья", "payload": "health_diary"}],
+            [{"type": "callback", "text": "↩️ Главное меню", "payload": "main_menu"}]
+        ]
+        await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
+
     async def _handle_communities(self, chat_id: int, user_id: int):
         """Сообщества"""
         profile = await self.health_service.get_user_profile(user_id)
 
         if profile:
-            from handlers.message_handler import MessageHandler
-            message_handler = MessageHandler()
-            await message_handler._handle_community_suggestions(chat_id, profile)
+            await self.message_handler._handle_community_suggestions(chat_id, profile)
         else:
             await self._ask_for_profile(chat_id)
 
     async def _handle_profile(self, chat_id: int, user_id: int):
         """Профиль"""
-        from handlers.message_handler import MessageHandler
-        message_handler = MessageHandler()
         profile = await self.health_service.get_user_profile(user_id)
-        await message_handler._handle_profile_management(chat_id, user_id, profile)
+        await self.message_handler._handle_profile_management(chat_id, user_id, profile)
 
     async def _handle_help(self, chat_id: int):
         """Помощь"""
-        from handlers.message_handler import MessageHandler
-        message_handler = MessageHandler()
-        await message_handler._handle_help(chat_id)
+        await self.message_handler._handle_help(chat_id)
 
     async def _handle_create_profile(self, chat_id: int, user_id: int):
         """Создание профиля"""
@@ -314,6 +361,4 @@ class CallbackHandler:
 
     async def _ask_for_profile(self, chat_id: int):
         """Запрос на создание профиля"""
-        from handlers.message_handler import MessageHandler
-        message_handler = MessageHandler()
-        await message_handler._ask_for_profile(chat_id)
\ No newline at end of file
+        await self.message_handler._ask_for_profile(chat_id)
\ No newline at end of file
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from models.health_models import UserProfile, HealthMetric
+from services.screening_views import ScreeningView
+
+# Данные, которые может запросить обработчик намерения
+PROFILE = "profile"
+METRICS = "metrics"
+SCREENING_SCHEDULE = "screening_schedule"
+
+
+class UpdateContext:
+    """
+    Данные пользователя для обработки одного обновления.
+
+    Загружается только то, что объявил обработчик: независимые запросы
+    (профиль, показатели, календарь обследований) выполняются параллельно;
+    календарь берется из материализованного представления HealthService.
+    Повторная загрузка не выполняется.
+    """
+
+    def __init__(self, user_id: int, health_service, metrics_limit: int = 5):
+        self.user_id = user_id
+        self.health_service = health_service
+        self.metrics_limit = metrics_limit
+        self.profile: Optional[UserProfile] = None
+        self.metrics: List[HealthMetric] = []
+        self.screening_view: Optional[ScreeningView] = None
+        self._loaded = set()
+
+    @property
+    def screening_schedule(self) -> Optional[List[Dict[str, Any]]]:
+        return self.screening_view.schedule if self.screening_view else None
+
+    async def load(self, *requirements: str) -> "UpdateContext":
+        needed = set(requirements) - self._loaded
+        if not needed or self.user_id is None:
+            return self
+
+        loaders = {}
+        if PROFILE in needed:
+            loaders[PROFILE] = self.health_service.get_user_profile(self.user_id)
+        if METRICS in needed:
+            loaders[METRICS] = self.health_service.get_user_metrics(self.user_id, limit=self.metrics_limit)
+        if SCREENING_SCHEDULE in needed:
+            loaders["screening_view"] = self.health_service.get_screening_view(self.user_id)
+
+        results = await asyncio.gather(*loaders.values())
+        for name, value in zip(loaders, results):
+            setattr(self, name, value)
+        self._loaded.update(needed)
+
+        return self
@@ -3,18 +3,41 @@ from services.max_api import MaxApiService
 from services.screening_service import ScreeningService
 from services.health_service import HealthService
 from services.community_service import CommunityService
+from services.clinic_service import get_clinic_service, parse_location
 from models.health_models import UserProfile
+from handlers.context import UpdateContext, PROFILE, SCREENING_SCHEDULE
+from services.screening_views import ScreeningView
+from utils.tracing import tracer
 
 
 class MessageHandler:
-    def __init__(self):
+    # Намерения по ключевым словам (проверяются по порядку) и данные, которые им нужны
+    INTENTS = [
+        ("start", ("/start", "начать"), (PROFILE,)),
+        ("health_menu", ("здоровье", "health"), ()),
+        ("screening", ("обследование", "скрининг"), (SCREENING_SCHEDULE,)),
+        ("symptoms", ("симптом", "болит"), ()),
+        ("find_clinic", ("клиник", "больниц"), ()),
+        ("communities", ("сообществ", "поддержк"), (PROFILE,)),
+        ("profile", ("профиль", "profile"), (PROFILE,)),
+        ("help", ("помощь", "help"), ())
+    ]
+    INTENT_REQUIREMENTS = {name: requirements for name, _, requirements in INTENTS}
+
+    def __init__(self, health_service: HealthService = None):
         self.max_api = MaxApiService()
         self.screening_service = ScreeningService()
-        self.health_service = HealthService()
+        # Общий сервис приложения (журнал, детектор, календари); свой — только вне приложения
+        self.health_service = health_service or HealthService(screening_service=self.screening_service)
         self.community_service = CommunityService()
 
     async def handle_message(self, message: Dict[str, Any]):
         """Обработка входящих сообщений"""
+        with tracer.start_span("message_handler"):
+            await self._dispatch_message(message)
+
+    async def _dispatch_message(self, message: Dict[str, Any]):
+        """Маршрутизация сообщения по тексту"""
         text = message.get("body", {}).get("text", "").lower()
         chat_id = message.get("recipient", {}).get("chat_id")
         user = message.get("sender", {})
@@ -23,30 +46,48 @@ class MessageHandler:
         if not chat_id:
             return
 
-        # Проверка профиля пользователя
-        profile = await self.health_service.get_user_profile(user_id)
+        intent = self._match_intent(text)
+        if intent == "unknown" and await self._handle_community_search(chat_id, text):
+            return
+        await self.handle_intent(intent, chat_id, user)
+
+    def _match_intent(self, text: str) -> str:
+        """Определение намерения по ключевым словам"""
+        for name, keywords, _ in self.INTENTS:
+            if any(keyword in text for keyword in keywords):
+                return name
+        return "unknown"
+
+    async def handle_intent(self, intent: str, chat_id: int, user: Dict[str, Any]):
+        """Загрузка нужных намерению данных и вызов обработчика"""
+        user_id = user.get("user_id")
+
+        # Профиль запрашивается только если он нужен обработчику
+        context = UpdateContext(user_id, self.health_service)
+        await context.load(*self.INTENT_REQUIREMENTS.get(intent, ()))
+        profile = context.profile
 
-        if "/start" in text or "начать" in text:
+        if intent == "start":
             await self._handle_start(chat_id, user, profile)
-        elif "здоровье" in text or "health" in text:
+        elif intent == "health_menu":
             await self._handle_health_menu(chat_id)
-        elif "обследование" in text or "скрининг" in text:
-            if profile:
-                await self._handle_screening_schedule(chat_id, profile)
+        elif intent == "screening":
+            if context.screening_view:
+                await self._handle_screening_schedule(chat_id, context.screening_view)
             else:
                 await self._ask_for_profile(chat_id)
-        elif "симптом" in text or "болит" in text:
+        elif intent == "symptoms":
             await self._handle_symptoms_start(chat_id)
-        elif "клиник" in text or "больниц" in text:
-            await self._handle_find_clinic(chat_id)
-        elif "сообществ" in text or "поддержк" in text:
+        elif intent == "find_clinic":
+            await self._handle_find_clinic(chat_id, user_id)
+        elif intent == "communities":
             if profile:
                 await self._handle_community_suggestions(chat_id, profile)
             else:
                 await self._ask_for_profile(chat_id)
-        elif "профиль" in text or "profile" in text:
+        elif intent == "profile":
             await self._handle_profile_management(chat_id, user_id, profile)
-        elif "помощь" in text or "help" in text:
+        elif intent == "help":
             await self._handle_help(chat_id)
         else:
             await self._handle_unknown(chat_id)
@@ -113,23 +154,16 @@ class MessageHandler:
 
         await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
 
-    async def _handle_screening_schedule(self, chat_id: int, profile: UserProfile):
-        """Показать персональный календарь обследований"""
-        # Заглушка - замените на реальную логику
-        schedule_text = f"""💉 Персональный календарь обследований для {profile.age} лет:
-
-• 📅 Ежегодный осмотр: через 2 месяца
-• ❤️ Кардиограмма: через 6 месяцев  
-• 🩸 Анализ крови: через 3 месяца
-• 👁️ Осмотр офтальмолога: через 1 год
-
-Следующее обследование: Общий анализ крови через 3 месяца"""
+    async def _handle_screening_schedule(self, chat_id: int, view: ScreeningView):
+        """Показать персональный календарь обследований (текст рассчитан заранее)"""
+        with tracer.start_span("render_schedule"):
+            schedule_text = view.message
 
-        buttons = [
-            [{"type": "callback", "text": "🏥 Найти клинику для обследований", "payload": "find_clinic_screening"}],
-            [{"type": "callback", "text": "📱 Настроить напоминания", "payload": "set_reminders"}],
-            [{"type": "callback", "text": "🔄 Обновить профиль", "payload": "update_profile"}]
-        ]
+            buttons = [
+                [{"type": "callback", "text": "🏥 Найти клинику для обследований", "payload": "find_clinic_screening"}],
+                [{"type": "callback", "text": "📱 Настроить напоминания", "payload": "set_reminders"}],
+                [{"type": "callback", "text": "🔄 Обновить профиль", "payload": "update_profile"}]
+            ]
 
         await self.max_api.send_message_with_keyboard(chat_id, schedule_text, buttons)
 
@@ -154,8 +188,28 @@ class MessageHandler:
 
         await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
 
-    async def _handle_find_clinic(self, chat_id: int):
-        """Поиск клиник"""
+    async def _handle_find_clinic(self, chat_id: int, user_id: int = None, recommendation: Dict = None):
+        """
+        Поиск клиник: ближайшие к адресу из профиля (с нужными по рекомендации
+        специалистами), если каталог загружен, иначе меню выбора типа.
+        Профиль читается только при доступном каталоге.
+        """
+        clinic_service = get_clinic_service()
+        if clinic_service.available and user_id:
+            profile = await self.health_service.get_user_profile(user_id)
+            coordinates = parse_location(profile.location) if profile else None
+            if coordinates:
+                if recommendation:
+                    results = clinic_service.find_for_recommendation(*coordinates, recommendation)
+                else:
+                    results = clinic_service.find_nearest(*coordinates)
+
+                buttons = [[{"type": "callback", "text": "↩️ Главное меню", "payload": "main_menu"}]]
+                await self.max_api.send_message_with_keyboard(
+                    chat_id, clinic_service.format_clinics_message(results), buttons
+                )
+                return
+
         text = "🏥 Поиск медицинских учреждений\n\nВыберите тип учреждения:"
 
         buttons = [
@@ -183,19 +237,48 @@ class MessageHandler:
                 [{"type": "callback", "text": "👤 Добавить заболевание", "payload": "add_condition"}]
             ]
         else:
-            text = "👥 Рекомендуемые сообщества поддержки:\n\n"
-            text += "• 💙 Сообщество по гипертонии\n"
-            text += "• 🩸 Сообщество по диабету\n"
-            text += "• 🌀 Сообщество по мигрени\n\n"
-            text += "Присоединяйтесь к сообществам для обмена опытом и поддержки!"
+            community_ids = self.community_service.match_communities_batch(
+                {profile.user_id: profile.conditions}
+            )[profile.user_id]
+
+            if community_ids:
+                text = self.community_service.format_communities_list(
+                    community_ids, "👥 Рекомендуемые сообщества поддержки:"
+                )
+                text += "\nПрисоединяйтесь к сообществам для обмена опытом и поддержки!"
+            else:
+                text = "👥 Для ваших заболеваний сообщества пока не созданы.\n\n"
+                text += "Посмотрите все сообщества поддержки!"
+
+            buttons = []
+            for community_id in community_ids:
+                community = self.community_service.get_community_for_condition(community_id)
+                if community.get("max_chat_link"):
+                    buttons.append([{
+                        "type": "link",
+                        "text": f"Присоединиться к {community['name']}",
+                        "url": community["max_chat_link"]
+                    }])
+            buttons.append([{"type": "callback", "text": "📋 Все сообщества", "payload": "all_communities"}])
 
-            buttons = [
-                [{"type": "link", "text": "💙 Присоединиться к сообществу по гипертонии", "url": "https://max.example.com/chat/hypertension"}],
-                [{"type": "link", "text": "🩸 Присоединиться к сообществу по диабету", "url": "https://max.example.com/chat/diabetes"}],
-                [{"type": "callback", "text": "📋 Все сообщества", "payload": "all_communities"}]
-            ]
+        await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
+
+    async def _handle_community_search(self, chat_id: int, text: str) -> bool:
+        """Поиск сообществ по свободному тексту; False, если сообщение не о сообществах"""
+        results = self.community_service.search_topic(text, limit=3)
+        if not results:
+            return False
+
+        buttons = [
+            [{"type": "link", "text": f"Присоединиться к {community['name']}", "url": community["max_chat_link"]}]
+            for _, community in results
+            if community.get("max_chat_link")
+        ]
+        buttons.append([{"type": "callback", "text": "📋 Все сообщества", "payload": "all_communities"}])
 
+        text = self.community_service.format_search_message(text.strip(), results)
         await self.max_api.send_message_with_keyboard(chat_id, text, buttons)
+        return True
 
     async def _handle_profile_management(self, chat_id: int, user_id: int, profile: UserProfile = None):
         """Управление профилем"""
@@ -1,18 +1,35 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from models.max_models import Update
 from handlers.message_handler import MessageHandler
 from handlers.callback_handler import CallbackHandler
-from services.health_service import HealthService
+from utils.tracing import tracer
 
 class WebhookHandler:
-    def __init__(self):
-        self.message_handler = MessageHandler()
-        self.callback_handler = CallbackHandler()
-        self.health_service = HealthService()
+    def __init__(self, health_service=None):
+        self.message_handler = MessageHandler(health_service)
+        # Обработчики делят один сервис здоровья и одни экраны
+        self.callback_handler = CallbackHandler(self.message_handler.health_service, self.message_handler)
+
+    @staticmethod
+    def ordering_key(update: Update) -> Optional[int]:
+        """Пользователь, обновления которого должны обрабатываться по порядку"""
+        if update.callback is not None:
+            return update.callback.user.user_id
+        if update.message is not None:
+            return update.message.sender.user_id
+        if update.user is not None:
+            return update.user.user_id
+        return update.chat_id
 
     async def handle_update(self, update: Update) -> Dict[str, Any]:
         """Обработка входящего обновления от MAX API"""
+        with tracer.start_span("handle_update", attributes={"update.type": update.update_type}):
+            await self._dispatch_update(update)
 
+        return {"status": "processed", "update_type": update.update_type}
+
+    async def _dispatch_update(self, update: Update):
+        """Маршрутизация обновления по типу"""
         if update.update_type == "message_created" and update.message:
             await self.message_handler.handle_message(update.message.dict())
 
@@ -28,8 +45,6 @@ class WebhookHandler:
         elif update.update_type == "bot_stopped":
             await self._handle_bot_stopped(update)
 
-        return {"status": "processed", "update_type": update.update_type}
-
     async def _handle_bot_started(self, update: Update):
         """Обработка запуска бота"""
         chat_id = update.chat_id
@@ -37,9 +52,8 @@ class WebhookHandler:
         user_id = user.get("user_id")
 
         if chat_id and user_id:
-            # Проверяем есть ли профиль пользователя
-            profile = await self.health_service.get_user_profile(user_id)
-            await self.message_handler._handle_start(chat_id, user, profile)
+            # Профиль загружается по требованиям намерения "start"
+            await self.message_handler.handle_intent("start", chat_id, user)
 
     async def _handle_bot_stopped(self, update: Update):
         """Обработка остановки бота"""
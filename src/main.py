@@ -1,19 +1,20 @@
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Request, HTTPException, Header
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime
 import os
 
 from config import settings
 from models.max_models import Update
-from models.health_models import UserProfile, HealthMetric
-from handlers.webhook_handler import WebhookHandler
-from services.max_api import MaxApiService
-from services.health_service import HealthService
-from services.screening_service import ScreeningService
+from services.update_dedup import update_key
+from utils.metrics import metrics, MetricsMiddleware
+from utils.http_cache import (
+    CachedStaticFiles, CompressionMiddleware, PrerenderedPage, conditional_json, version_etag
+)
+from utils.tracing import tracer, current_span, FileSpanExporter, TracingMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 
@@ -29,10 +30,216 @@ logger = logging.getLogger(__name__)
 # -------------------------------
 # Глобальные сервисы
 # -------------------------------
+# Сервисы и обработчики создаются лениво при первом обращении (или в фоне
+# при fast_start), чтобы тяжелые импорты и каталоги правил не задерживали старт.
 max_api = None
 webhook_handler = None
 health_service = None
 screening_service = None
+update_deduplicator = None
+update_executor = None
+update_poller = None
+
+# Ссылки на фоновые задачи старта, чтобы их не собрал GC и можно было отменить
+_startup_tasks = set()
+
+
+def get_max_api():
+    global max_api
+    if max_api is None and settings.max_bot_token:
+        from services.max_api import MaxApiService
+        max_api = MaxApiService()
+    return max_api
+
+
+def get_webhook_handler():
+    global webhook_handler
+    if webhook_handler is None and settings.max_bot_token:
+        from handlers.webhook_handler import WebhookHandler
+        webhook_handler = WebhookHandler(get_health_service())
+        callback_handler = webhook_handler.callback_handler
+        metrics.gauge(
+            "healthcompass_symptom_sessions",
+            "Active symptom questionnaire sessions",
+            lambda: len(callback_handler.symptom_sessions)
+        )
+        metrics.gauge(
+            "healthcompass_user_sessions",
+            "Active callback user sessions",
+            lambda: len(callback_handler.user_sessions)
+        )
+    return webhook_handler
+
+
+def get_health_service():
+    global health_service
+    if health_service is None:
+        from services.health_service import HealthService
+        event_log = None
+        if settings.event_log_dir:
+            from services.event_log import EventLog
+            event_log = EventLog(
+                settings.event_log_dir,
+                segment_bytes=settings.event_log_segment_mb * 1024 * 1024,
+                fsync=settings.event_log_fsync
+            )
+        metric_writer = None
+        if settings.metric_store_enabled:
+            from services.metric_store import GroupCommitWriter, SqliteMetricStore, sqlite_path
+            metric_writer = GroupCommitWriter(
+                SqliteMetricStore(sqlite_path(settings.database_url)),
+                max_batch=settings.metric_commit_batch,
+                max_delay=settings.metric_commit_delay_ms / 1000
+            )
+        anomaly_detector = None
+        if settings.anomaly_detection_enabled:
+            from services.anomaly_detector import AnomalyDetector, critical_alert_notifier, log_anomaly
+            anomaly_detector = AnomalyDetector(
+                alpha=settings.anomaly_ewma_alpha,
+                z_threshold=settings.anomaly_z_threshold,
+                warmup=settings.anomaly_warmup
+            )
+            anomaly_detector.subscribe(log_anomaly)
+            api = get_max_api()
+            if api is not None:
+                anomaly_detector.subscribe(critical_alert_notifier(api))
+            metrics.gauge(
+                "healthcompass_anomaly_baselines",
+                "Per-user metric baselines tracked by the anomaly detector",
+                lambda: len(anomaly_detector.state)
+            )
+        health_service = HealthService(event_log=event_log, metric_writer=metric_writer,
+                                       anomaly_detector=anomaly_detector,
+                                       screening_service=get_screening_service())
+        service = health_service
+        metrics.gauge(
+            "healthcompass_user_profiles",
+            "User profiles held in the health service store",
+            lambda: len(service.user_profiles)
+        )
+        metrics.gauge(
+            "healthcompass_screening_views",
+            "Materialized per-user screening schedules",
+            lambda: len(service.screening_views)
+        )
+        metrics.gauge(
+            "healthcompass_profile_cache_size",
+            "Profiles held in the read-through cache",
+            lambda: len(service.profile_cache)
+        )
+    return health_service
+
+
+def get_update_deduplicator():
+    global update_deduplicator
+    if update_deduplicator is None and settings.webhook_dedup_enabled:
+        from services.update_dedup import InMemoryDedupStore, RedisDedupStore, UpdateDeduplicator
+        if settings.webhook_dedup_backend == "redis" and settings.webhook_dedup_redis_url:
+            store = RedisDedupStore(settings.webhook_dedup_redis_url, settings.webhook_dedup_window_s)
+        else:
+            store = InMemoryDedupStore(settings.webhook_dedup_window_s, settings.webhook_dedup_max_size)
+            metrics.gauge(
+                "healthcompass_webhook_dedup_keys",
+                "Update keys held in the in-memory dedup window",
+                lambda: len(store)
+            )
+        update_deduplicator = UpdateDeduplicator(store)
+    return update_deduplicator
+
+
+def get_update_executor():
+    global update_executor
+    if update_executor is None:
+        from utils.keyed_executor import KeyedExecutor
+        update_executor = KeyedExecutor(settings.webhook_shards, settings.webhook_shard_queue_size, name="webhook")
+    return update_executor
+
+
+def get_screening_service():
+    global screening_service
+    if screening_service is None:
+        from services.screening_service import ScreeningService
+        screening_service = ScreeningService()
+    return screening_service
+
+
+async def _register_webhook():
+    """Регистрация webhook и получение информации о боте"""
+    api = get_max_api()
+    try:
+        await api.set_webhook(
+            url=settings.webhook_url,
+            secret=settings.webhook_secret
+        )
+        logger.info("✅ Webhook set successfully")
+        bot_info = await api.get_my_info()
+        logger.info(f"🤖 Bot info: {bot_info.get('first_name', 'Unknown')}")
+    except Exception as e:
+        logger.error(f"❌ Failed to set webhook: {e}")
+
+
+async def _warm_up():
+    """Фоновая инициализация сервисов и каталогов правил"""
+    screening = get_screening_service()
+    get_health_service()
+    handler = get_webhook_handler()
+    # Каталоги загружаются при первом обращении к ним
+    screening.recommendations
+    await asyncio.to_thread(get_shell_page)
+    if settings.clinic_catalog_path or settings.reference_catalog_path:
+        from services.clinic_service import get_clinic_service
+        await asyncio.to_thread(get_clinic_service)
+    if handler:
+        handler.callback_handler.symptom_checker.symptom_rules
+        handler.callback_handler.community_service.search_index
+        handler.message_handler.community_service.search_index
+    logger.info("✅ Services warmed up")
+
+
+def _start_polling():
+    """Запуск long polling вместо webhook (не нужен публичный URL)"""
+    global update_poller
+    from services.update_poller import UpdatePoller
+    update_poller = UpdatePoller(
+        get_max_api(),
+        submit_update,
+        limit=settings.polling_limit,
+        timeout=settings.polling_timeout_s,
+        marker_path=settings.polling_marker_path
+    )
+    update_poller.start()
+
+
+def reload_screening_catalogue(force: bool = False) -> Dict[str, Any]:
+    """Перечитывает каталог обследований и пересчитывает календари затронутых когорт"""
+    from services.screening_service import get_screening_catalogue, reload_screening_catalogue as reload
+
+    diff = reload(force)
+    if diff is None:
+        return {"reloaded": False, "version": get_screening_catalogue().version}
+    report = get_health_service().screening_views.apply_catalogue_diff(diff)
+    logger.info(
+        f"✅ Screening schedules recomputed for {report['users_recomputed']} of {report['users']} users "
+        f"({report['cohorts_affected']} of {report['cohorts']} cohorts)"
+    )
+    return {"reloaded": True, **diff.to_dict(), **report}
+
+
+async def _watch_screening_catalogue():
+    """Горячая перезагрузка каталога обследований по изменению файла"""
+    while True:
+        await asyncio.sleep(settings.screening_catalogue_watch_s)
+        try:
+            reload_screening_catalogue()
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Screening catalogue reload failed, keeping the current version: {e}")
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _startup_tasks.add(task)
+    task.add_done_callback(_startup_tasks.discard)
+    return task
 
 
 # -------------------------------
@@ -40,38 +247,54 @@ screening_service = None
 # -------------------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global max_api, webhook_handler, health_service, screening_service
-
     logger.info("🚀 Starting Health Compass MAX Mini-App...")
 
-    # Инициализация сервисов
-    health_service = HealthService()
-    screening_service = ScreeningService()
+    if settings.fast_start:
+        _spawn(_warm_up())
+    else:
+        await _warm_up()
+
+    if settings.screening_catalogue_watch_s > 0:
+        _spawn(_watch_screening_catalogue())
 
     if settings.max_bot_token:
-        max_api = MaxApiService()
-        webhook_handler = WebhookHandler()
-
-        if settings.webhook_url:
-            try:
-                await max_api.set_webhook(
-                    url=settings.webhook_url,
-                    secret=settings.webhook_secret
-                )
-                logger.info("✅ Webhook set successfully")
-                bot_info = await max_api.get_my_info()
-                logger.info(f"🤖 Bot info: {bot_info.get('first_name', 'Unknown')}")
-            except Exception as e:
-                logger.error(f"❌ Failed to set webhook: {e}")
+        # Обработчики шардов создаются вне контекста какого-либо запроса
+        get_update_executor().start()
+        if settings.update_mode == "polling":
+            _start_polling()
+        elif settings.webhook_url:
+            if settings.fast_start:
+                _spawn(_register_webhook())
+            else:
+                await _register_webhook()
         else:
             logger.info("ℹ️ Webhook URL not configured, bot component disabled")
     else:
         logger.info("ℹ️ Bot token not configured, running as mini-app only")
-        max_api = None
-        webhook_handler = None
 
     yield
 
+    for task in list(_startup_tasks):
+        task.cancel()
+
+    if update_poller is not None:
+        await update_poller.stop()
+
+    if update_executor is not None:
+        await update_executor.stop()
+
+    if health_service is not None:
+        await health_service.flush()
+
+    # Очередь исходящих досылается до закрытия пула соединений
+    from services.max_api import close_http_client, stop_outbound_dispatcher
+    await stop_outbound_dispatcher()
+    if max_api is not None:
+        await close_http_client()
+
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+
     logger.info("🛑 Shutting down Health Compass MAX Mini-App...")
 
 
@@ -82,14 +305,6 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 TEMPLATES_DIR = os.path.join(STATIC_DIR, "templates")
 
-# Проверяем и создаем директорию static, если её нет
-if not os.path.exists(STATIC_DIR):
-    logger.warning(f"⚠️ Static directory does not exist: {STATIC_DIR}, creating it...")
-    os.makedirs(STATIC_DIR, exist_ok=True)
-
-print("🗂 BASE_DIR:", BASE_DIR)
-print("🗂 STATIC_DIR:", STATIC_DIR, "exists:", os.path.exists(STATIC_DIR))
-
 # -------------------------------
 # Создание FastAPI приложения
 # -------------------------------
@@ -100,21 +315,89 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# -------------------------------
+# Сжатие ответов
+# -------------------------------
+if settings.http_compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.http_compression_min_bytes,
+        maximum_size=settings.http_compression_max_bytes
+    )
+
+# -------------------------------
+# Метрики
+# -------------------------------
+metrics.enabled = settings.metrics_enabled
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# -------------------------------
+# Трассировка
+# -------------------------------
+if settings.tracing_enabled:
+    tracer.configure(
+        enabled=True,
+        sample_rate=settings.trace_sample_rate,
+        exporter=FileSpanExporter(settings.trace_export_path) if settings.trace_export_path else None
+    )
+    # Добавляется последним, чтобы корневой спан охватывал и метрики
+    app.add_middleware(TracingMiddleware)
+
 # -------------------------------
 # Статика и шаблоны
 # -------------------------------
 if os.path.exists(STATIC_DIR):
-    app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+    app.mount("/static", CachedStaticFiles(directory=STATIC_DIR, max_age=settings.static_max_age_s), name="static")
     logger.info(f"✅ Static files mounted from: {STATIC_DIR}")
 else:
     logger.error(f"❌ Static directory does not exist: {STATIC_DIR}")
 
-try:
-    templates = Jinja2Templates(directory=TEMPLATES_DIR)
-    logger.info(f"✅ Templates loaded from: {TEMPLATES_DIR}")
-except Exception as e:
-    logger.error(f"❌ Failed to load templates from {TEMPLATES_DIR}: {e}")
-    templates = None
+templates = None
+
+
+def get_templates():
+    """Ленивая загрузка Jinja-шаблонов (jinja2 импортируется при первом рендере)"""
+    global templates
+    if templates is None:
+        try:
+            from fastapi.templating import Jinja2Templates
+            env_options = {}
+            if settings.template_bytecode_cache:
+                # Скомпилированные шаблоны переживают перезапуск и общие для воркеров
+                from jinja2 import FileSystemBytecodeCache
+                if settings.template_bytecode_cache_dir:
+                    os.makedirs(settings.template_bytecode_cache_dir, exist_ok=True)
+                env_options["bytecode_cache"] = FileSystemBytecodeCache(settings.template_bytecode_cache_dir)
+            templates = Jinja2Templates(directory=TEMPLATES_DIR, **env_options)
+            logger.info(f"✅ Templates loaded from: {TEMPLATES_DIR}")
+        except Exception as e:
+            logger.error(f"❌ Failed to load templates from {TEMPLATES_DIR}: {e}")
+    return templates
+
+
+shell_page: Optional[PrerenderedPage] = None
+
+
+def get_shell_page() -> Optional[PrerenderedPage]:
+    """
+    Оболочка мини-приложения (index.html) одинакова для всех пользователей:
+    рендерится один раз и перерисовывается только при изменении шаблона.
+    """
+    global shell_page
+    try:
+        version = os.stat(os.path.join(TEMPLATES_DIR, "index.html")).st_mtime_ns
+    except OSError as e:
+        logger.error(f"❌ Shell template not available: {e}")
+        return shell_page
+    if shell_page is None or shell_page.version != version:
+        templates = get_templates()
+        if templates is None:
+            return None
+        body = templates.get_template("index.html").render().encode("utf-8")
+        shell_page = PrerenderedPage(body, version)
+        logger.info(f"✅ Shell pre-rendered: {len(body)} bytes, variants {sorted(shell_page.variants)}")
+    return shell_page
 
 
 # -------------------------------
@@ -122,9 +405,10 @@ except Exception as e:
 # -------------------------------
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
-    if templates is None:
+    page = get_shell_page()
+    if page is None:
         raise HTTPException(status_code=500, detail="Templates not available")
-    return templates.TemplateResponse("index.html", {"request": request})
+    return page.response(request.headers)
 
 
 @app.get("/api")
@@ -146,21 +430,144 @@ async def health_check():
     }
 
 
+async def submit_update(update: Update) -> Optional[asyncio.Task]:
+    """
+    Общий конвейер обновлений для webhook и long polling: проверка повтора
+    и постановка в очередь шарда пользователя.
+
+    Обновления одного пользователя обрабатываются в порядке вызовов, поэтому
+    пачку нужно ставить последовательно и только потом ждать задачи.
+
+    Returns:
+        Optional[asyncio.Task]: задача обработки или None, если обновление —
+        повторная доставка и пропущено
+    """
+    webhook_handler = get_webhook_handler()
+
+    # Повторные доставки MAX отбрасываются до запуска обработчиков
+    deduplicator = get_update_deduplicator()
+    dedup_key = update_key(update) if deduplicator else None
+    if dedup_key and not await deduplicator.claim(dedup_key, update.update_type):
+        logger.info(f"🔁 Duplicate update skipped: {dedup_key}")
+        return None
+
+    try:
+        logger.info(f"📨 Received update: {update.update_type}")
+        # Обновления одного пользователя выполняются по порядку (гонки за symptom_sessions)
+        future = await get_update_executor().submit(
+            webhook_handler.ordering_key(update),
+            lambda: webhook_handler.handle_update(update)
+        )
+    except Exception:
+        if dedup_key:
+            await deduplicator.release(dedup_key)
+        raise
+    return asyncio.ensure_future(_complete_update(future, deduplicator, dedup_key))
+
+
+async def _complete_update(future: asyncio.Future, deduplicator, dedup_key: Optional[str]) -> bool:
+    try:
+        await future
+    except Exception:
+        if dedup_key:
+            # Повтор упавшего обновления должен быть обработан
+            await deduplicator.release(dedup_key)
+        raise
+    return True
+
+
+async def process_update(update: Update) -> bool:
+    """
+    Returns:
+        bool: False, если обновление — повторная доставка и пропущено
+
+    Raises:
+        Exception: ошибка обработчика; отметка дедупликации при этом снимается
+    """
+    task = await submit_update(update)
+    if task is None:
+        return False
+    return await task
+
+
 @app.post("/webhook")
 async def webhook(update: Update):
-    if not webhook_handler:
+    if not get_webhook_handler():
         raise HTTPException(status_code=503, detail="Bot component not configured")
+
+    # Разбор и валидация тела уже выполнены FastAPI: фиксируем их как отдельный спан
+    root_span = current_span()
+    if root_span.sampled:
+        tracer.record_span("parse", root_span.start_ns, time.time_ns())
+        root_span.set_attribute("update.type", update.update_type)
+
     try:
-        logger.info(f"📨 Received update: {update.update_type}")
-        result = await webhook_handler.handle_update(update)
-        return JSONResponse(content={"status": "ok", "handled": True})
+        handled = await process_update(update)
     except Exception as e:
         logger.error(f"💥 Error processing update: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+    if not handled:
+        return JSONResponse(content={"status": "ok", "handled": False, "duplicate": True})
+    return JSONResponse(content={"status": "ok", "handled": True})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# -------------------------------
+# Админ: профилирование
+# -------------------------------
+@app.get("/admin/profile")
+async def admin_profile(
+    seconds: float = 5.0,
+    interval_ms: float = 5.0,
+    slow_ms: float = 100.0,
+    format: str = "json",
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    if not settings.admin_token or x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    from utils.profiler import profile_event_loop
+
+    seconds = min(max(seconds, 0.1), settings.profiler_max_seconds)
+    try:
+        # Сторож блокировок опрашивает цикл каждые slow_ms / 4: без нижней границы он крутится вхолостую
+        report = await profile_event_loop(seconds, max(interval_ms, 1.0) / 1000, max(slow_ms, 10.0) / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    for warning in report["slow_callbacks"]:
+        logger.warning(f"🐢 Event loop blocked for {warning['blocked_ms']} ms: {warning['stack']}")
+
+    if format == "collapsed":
+        return PlainTextResponse(report["collapsed"])
+    return report
+
+
+# -------------------------------
+# Админ: каталог обследований
+# -------------------------------
+@app.post("/admin/screening/reload")
+async def admin_reload_screening(x_admin_token: Optional[str] = Header(default=None)):
+    if not settings.admin_token or x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        return reload_screening_catalogue(force=True)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 
 @app.get("/bot/info")
 async def get_bot_info():
+    max_api = get_max_api()
     if not max_api:
         raise HTTPException(status_code=503, detail="Service not ready")
     try:
@@ -206,7 +613,7 @@ async def create_profile(profile: ProfileCreate, request: Request):
             "risk_factors": [],
             "conditions": []
         }
-        user_profile = await health_service.create_user_profile(user_id, profile_data)
+        user_profile = await get_health_service().create_user_profile(user_id, profile_data)
         return {"status": "ok", "profile": user_profile.model_dump()}
     except Exception as e:
         logger.error(f"Error creating profile: {e}")
@@ -214,17 +621,38 @@ async def create_profile(profile: ProfileCreate, request: Request):
 
 
 @app.get("/api/profile/{user_id}")
-async def get_profile(user_id: int):
+async def get_profile(user_id: int, request: Request):
     try:
-        profile = await health_service.get_user_profile(user_id)
+        profile = await get_health_service().get_user_profile(user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
-        return profile.model_dump()
+        # Версия профиля — updated_at: повторный запрос с If-None-Match получает 304
+        return conditional_json(
+            request,
+            lambda: profile.model_dump(mode="json"),
+            version_etag(user_id, int(profile.updated_at.timestamp() * 1e6)),
+            profile.updated_at
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting profile: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/screening-schedule/{user_id}")
+async def get_screening_schedule(user_id: int, request: Request):
+    view = await get_health_service().get_screening_view(user_id)
+    if view is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return conditional_json(
+        request,
+        view.to_dict,
+        version_etag(user_id, int(view.profile_updated_at.timestamp() * 1e6), view.catalogue_version),
+        view.profile_updated_at
+    )
+
+
 # -------------------------------
 # Остальные эндпоинты health-metrics, screening-schedule
 # можно оставить как есть
@@ -5,7 +5,8 @@ from .health_models import (
     UserProfile,
     ScreeningRecommendation,
     HealthMetric,
-    SymptomSession
+    SymptomSession,
+    Clinic
 )
 
 from .max_models import (
@@ -26,6 +27,7 @@ __all__ = [
     "ScreeningRecommendation",
     "HealthMetric",
     "SymptomSession",
+    "Clinic",
 
     # MAX API models
     "User",
@@ -54,4 +54,15 @@ class SymptomSession(BaseModel):
     body_part: str
     current_question: int = 0
     answers: Dict[str, Any] = {}
-    started_at: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    started_at: datetime = Field(default_factory=datetime.now)
+
+class Clinic(BaseModel):
+    id: str
+    name: str
+    kind: str
+    address: str
+    lat: float
+    lon: float
+    specialists: List[str] = []
+    examinations: List[str] = []
+    phone: Optional[str] = None
\ No newline at end of file
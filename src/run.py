@@ -5,7 +5,6 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
 print(f"📁 Working from: {current_dir}")
-print(f"🔍 Python path: {sys.path}")
 
 try:
     from main import app
@@ -3,11 +3,13 @@ from .health_service import HealthService
 from .screening_service import ScreeningService
 from .community_service import CommunityService
 from .symptom_checker import SymptomChecker
+from .clinic_service import ClinicService
 
 __all__ = [
     'MaxApiService',
     'HealthService',
     'ScreeningService',
     'CommunityService',
-    'SymptomChecker'
+    'SymptomChecker',
+    'ClinicService'
 ]
\ No newline at end of file
@@ -0,0 +1,176 @@
+import asyncio
+import inspect
+import logging
+import math
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.metrics import METRIC_ANOMALIES
+
+logger = logging.getLogger(__name__)
+
+# Критические значения (ниже low или выше high) — сигнал независимо от истории
+CRITICAL_THRESHOLDS: Dict[Tuple[str, str], Tuple[float, float]] = {
+    ("pressure", "systolic"): (90, 180),
+    ("pressure", "diastolic"): (50, 120),
+    ("pulse", "value"): (40, 130),
+    ("temperature", "value"): (35.5, 39.5)
+}
+
+# Нижняя граница стандартного отклонения: у стабильных рядов дисперсия почти
+# нулевая, и без нее любое колебание выглядело бы аномалией
+MIN_STD: Dict[str, float] = {"pressure": 4.0, "pulse": 4.0, "temperature": 0.2, "weight": 0.5}
+DEFAULT_MIN_STD = 1.0
+
+ALERT_LABELS: Dict[Tuple[str, str], str] = {
+    ("pressure", "systolic"): "Верхнее давление",
+    ("pressure", "diastolic"): "Нижнее давление",
+    ("pulse", "value"): "Пульс",
+    ("temperature", "value"): "Температура"
+}
+
+CRITICAL = "critical"
+DEVIATION = "deviation"
+
+
+class AnomalyEvent(NamedTuple):
+    user_id: int
+    metric_type: str
+    component: str
+    value: float
+    kind: str
+    baseline: Optional[float]
+    z_score: Optional[float]
+    timestamp: datetime
+
+
+class AnomalyDetector:
+    """
+    Потоковое обнаружение аномалий в показателях.
+
+    На каждого пользователя, тип показателя и поле хранится O(1) состояние:
+    экспоненциально сглаженные среднее и дисперсия (EWMA). Показание
+    отмечается, если выходит за критические пороги или отклоняется от
+    собственной базовой линии пользователя более чем на z_threshold
+    стандартных отклонений (после warmup показаний).
+
+    Подписчики получают события после возврата из observe (call_soon),
+    поэтому оповещения не задерживают запись показателя.
+    """
+
+    def __init__(self, alpha: float = 0.1, z_threshold: float = 3.0, warmup: int = 5):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        # (user_id, metric_type, component) -> [mean, var, count]
+        self.state: Dict[Tuple[int, str, str], List[float]] = {}
+        self._subscribers: List[Callable[[AnomalyEvent], Any]] = []
+        self._tasks: set = set()
+
+    def subscribe(self, callback: Callable[[AnomalyEvent], Any]):
+        """callback может быть синхронным или корутиной"""
+        self._subscribers.append(callback)
+
+    def baseline(self, user_id: int, metric_type: str, component: str = "value") -> Optional[Tuple[float, float]]:
+        """(среднее, стандартное отклонение) или None, если истории нет"""
+        state = self.state.get((user_id, metric_type, component))
+        if state is None:
+            return None
+        return state[0], math.sqrt(state[1])
+
+    def observe(self, user_id: int, metric_type: str, value: Dict[str, Any],
+                timestamp: Optional[datetime] = None) -> List[AnomalyEvent]:
+        """Проверяет показание, обновляет базовую линию и возвращает найденные аномалии"""
+        events = []
+        alpha = self.alpha
+        for component, number in value.items():
+            if isinstance(number, bool) or not isinstance(number, (int, float)):
+                continue
+            key = (user_id, metric_type, component)
+            state = self.state.get(key)
+
+            thresholds = CRITICAL_THRESHOLDS.get((metric_type, component))
+            if thresholds is not None and not thresholds[0] <= number <= thresholds[1]:
+                events.append(AnomalyEvent(user_id, metric_type, component, number, CRITICAL,
+                                           state[0] if state else None, None, timestamp or datetime.now()))
+            elif state is not None and state[2] >= self.warmup:
+                std = max(math.sqrt(state[1]), MIN_STD.get(metric_type, DEFAULT_MIN_STD))
+                z_score = (number - state[0]) / std
+                if abs(z_score) >= self.z_threshold:
+                    events.append(AnomalyEvent(user_id, metric_type, component, number, DEVIATION,
+                                               state[0], round(z_score, 2), timestamp or datetime.now()))
+
+            if state is None:
+                self.state[key] = [float(number), 0.0, 1]
+            else:
+                diff = number - state[0]
+                increment = alpha * diff
+                state[0] += increment
+                state[1] = (1 - alpha) * (state[1] + diff * increment)
+                state[2] += 1
+
+        for event in events:
+            self._emit(event)
+        return events
+
+    def _emit(self, event: AnomalyEvent):
+        METRIC_ANOMALIES.inc(event.metric_type, event.kind)
+        if not self._subscribers:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for callback in self._subscribers:
+            if loop is None:
+                self._deliver(callback, event)
+            else:
+                loop.call_soon(self._deliver, callback, event)
+
+    def _deliver(self, callback: Callable[[AnomalyEvent], Any], event: AnomalyEvent):
+        try:
+            result = callback(event)
+        except Exception as e:
+            logger.error(f"❌ Anomaly subscriber failed: {e}")
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Anomaly subscriber failed: {task.exception()}")
+
+
+def log_anomaly(event: AnomalyEvent):
+    """Подписчик по умолчанию: запись в лог для оповещений"""
+    if event.kind == CRITICAL:
+        logger.warning(
+            f"🚨 Critical {event.metric_type}.{event.component}={event.value} for user {event.user_id}"
+        )
+    else:
+        logger.warning(
+            f"⚠️ {event.metric_type}.{event.component}={event.value} deviates from baseline "
+            f"{event.baseline:.1f} (z={event.z_score}) for user {event.user_id}"
+        )
+
+
+def critical_alert_notifier(max_api) -> Callable[[AnomalyEvent], Awaitable[None]]:
+    """Подписчик: сообщение пользователю о критическом показателе через приоритетную полосу"""
+
+    async def notify(event: AnomalyEvent):
+        if event.kind != CRITICAL:
+            return
+        low, high = CRITICAL_THRESHOLDS[(event.metric_type, event.component)]
+        label = ALERT_LABELS.get((event.metric_type, event.component), event.metric_type)
+        text = (
+            f"🚨 {label}: {event.value} — вне безопасного диапазона ({low}–{high}).\n\n"
+            "Повторите измерение. Если значение подтвердится или самочувствие ухудшится, "
+            "вызовите скорую помощь: 103 или 112."
+        )
+        # Чат пользователя детектору неизвестен: MAX доставит в диалог с ботом
+        await max_api.send_message(None, text, priority=True, user_id=event.user_id)
+
+    return notify
@@ -0,0 +1,230 @@
+"""
+Бинарный справочный каталог, открываемый через mmap.
+
+Клиники, календарь обследований, правила симптомов и сообщества
+собираются заранее в один файл. Воркеры uvicorn открывают его через mmap
+только на чтение, поэтому страницы файла общие для всех процессов, а
+массивы индекса клиник читаются напрямую из отображения без копирования.
+
+Формат (little-endian):
+    заголовок   MAGIC, версия, число секций
+    таблица     имя секции (16 байт), смещение, длина
+    секции      выровнены на 8 байт; массивы array.array, JSON или
+                набор записей (смещения + склеенные JSON-записи)
+
+Сборка:
+    cd src
+    python -m services.catalog --out reference.catalog --clinics clinics.csv
+"""
+import argparse
+import array
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HCCATLG\x00"
+VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<16sQQ")
+_ALIGN = 8
+
+
+def is_catalog_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class CatalogWriter:
+    """Сборщик файла каталога (офлайн)"""
+
+    def __init__(self):
+        self.sections: List[Tuple[str, bytes]] = []
+
+    def add(self, name: str, data: bytes):
+        if len(name.encode()) > 16:
+            raise ValueError(f"Section name too long: {name}")
+        self.sections.append((name, bytes(data)))
+
+    def add_array(self, name: str, typecode: str, values: Iterable):
+        self.add(name, array.array(typecode, values).tobytes())
+
+    def add_json(self, name: str, value: Any):
+        self.add(name, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def add_blobs(self, name: str, blobs: Sequence[bytes]):
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        self.add_array(f"{name}.o", "Q", offsets)
+        self.add(f"{name}.d", b"".join(blobs))
+
+    def add_records(self, name: str, records: Dict[str, Any]):
+        """Словарь JSON-записей; порядок ключей сохраняется"""
+        self.add_json(f"{name}.k", list(records))
+        self.add_blobs(name, [json.dumps(value, ensure_ascii=False).encode("utf-8") for value in records.values()])
+
+    def write(self, path: str):
+        table_size = _HEADER.size + _SECTION.size * len(self.sections)
+        offset = _align(table_size)
+        layout = []
+        for name, data in self.sections:
+            layout.append((name, offset, data))
+            offset = _align(offset + len(data))
+
+        # Пишем во временный файл и подменяем атомарно: открытые отображения
+        # старого файла у работающих воркеров остаются валидными
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(layout)))
+            for name, section_offset, data in layout:
+                f.write(_SECTION.pack(name.encode(), section_offset, len(data)))
+            for name, section_offset, data in layout:
+                f.write(b"\x00" * (section_offset - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, path)
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class MappedBlobs(Sequence):
+    """Последовательность байтовых записей поверх mmap"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> memoryview:
+        return self._data[self._offsets[index]:self._offsets[index + 1]]
+
+
+class MappedRecords(Mapping):
+    """Словарь JSON-записей каталога; значение декодируется при обращении"""
+
+    def __init__(self, keys: List[str], blobs: MappedBlobs):
+        self._keys = keys
+        self._positions = {key: n for n, key in enumerate(keys)}
+        self._blobs = blobs
+
+    def __getitem__(self, key: str) -> Any:
+        return json.loads(bytes(self._blobs[self._positions[key]]))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._positions
+
+
+class ReferenceCatalog:
+    """Файл каталога, отображенный в память только для чтения"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise ValueError("Reference catalogue requires a little-endian platform")
+
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        magic, version, count = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a reference catalogue: {path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported catalogue version {version}: {path}")
+
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        for n in range(count):
+            name, offset, length = _SECTION.unpack_from(self._buffer, _HEADER.size + n * _SECTION.size)
+            self.sections[name.rstrip(b"\x00").decode()] = (offset, length)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sections or f"{name}.k" in self.sections
+
+    def section(self, name: str) -> memoryview:
+        offset, length = self.sections[name]
+        return self._buffer[offset:offset + length]
+
+    def array(self, name: str, typecode: str) -> memoryview:
+        return self.section(name).cast(typecode)
+
+    def json(self, name: str) -> Any:
+        return json.loads(bytes(self.section(name)))
+
+    def blobs(self, name: str) -> MappedBlobs:
+        return MappedBlobs(self.array(f"{name}.o", "Q"), self.section(f"{name}.d"))
+
+    def records(self, name: str) -> MappedRecords:
+        return MappedRecords(self.json(f"{name}.k"), self.blobs(name))
+
+
+_catalog: Optional[ReferenceCatalog] = None
+_catalog_opened = False
+
+
+def get_reference_catalog() -> Optional[ReferenceCatalog]:
+    """Общий для процесса каталог (REFERENCE_CATALOG_PATH) или None, если он не задан"""
+    global _catalog, _catalog_opened
+    if not _catalog_opened:
+        _catalog_opened = True
+        path = settings.reference_catalog_path
+        if path:
+            try:
+                _catalog = ReferenceCatalog(path)
+                logger.info(f"✅ Reference catalogue mapped: {path}")
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Failed to open reference catalogue {path}: {e}")
+    return _catalog
+
+
+def build_reference_catalog(path: str, clinics_path: Optional[str] = None, cell_deg: float = 0.02):
+    """Собирает каталог из встроенных справочников и (опционально) каталога клиник"""
+    from services.clinic_service import load_clinics, write_clinic_catalog
+    from services.community_service import CommunityService
+    from services.screening_service import BUNDLED_CATALOGUE_PATH, ScreeningCatalogue
+    from services.symptom_checker import SymptomChecker
+
+    writer = CatalogWriter()
+    screening = ScreeningCatalogue.from_file(settings.screening_catalogue_path or BUNDLED_CATALOGUE_PATH)
+    writer.add_records("screening", {rec.id: rec.model_dump(mode="json") for rec in screening.rules})
+    writer.add_json("screening.v", screening.version)
+    writer.add_records("symptom_rules", SymptomChecker()._builtin_symptom_rules())
+    writer.add_records("communities", CommunityService()._builtin_communities())
+    if clinics_path:
+        write_clinic_catalog(writer, load_clinics(clinics_path), cell_deg)
+    writer.write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped reference catalogue")
+    parser.add_argument("--out", required=True, help="Путь к файлу каталога")
+    parser.add_argument("--clinics", help="Каталог клиник (CSV или Parquet)")
+    parser.add_argument("--cell-deg", type=float, default=settings.clinic_grid_cell_deg)
+    args = parser.parse_args()
+
+    build_reference_catalog(args.out, args.clinics, args.cell_deg)
+    print(f"Catalogue written: {args.out} ({os.path.getsize(args.out)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
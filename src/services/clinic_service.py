@@ -0,0 +1,450 @@
+import csv
+import heapq
+from bisect import bisect_left
+import logging
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import settings
+from models.health_models import Clinic
+from services.catalog import ReferenceCatalog, get_reference_catalog, is_catalog_file
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Если фильтр по услугам оставляет меньше клиник, дешевле перебрать их все
+BRUTE_FORCE_LIMIT = 2000
+
+
+def normalize_term(term: str) -> str:
+    return " ".join(term.lower().replace("ё", "е").split())
+
+
+def parse_location(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Координаты из строки вида "55.7558, 37.6173" (поле UserProfile.location)"""
+    if not location:
+        return None
+    parts = location.replace(";", ",").split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def _to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+def _chord_to_km(chord_sq: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_sq) / 2))
+
+
+def _km_to_chord_sq(km: float) -> float:
+    return (2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)) ** 2
+
+
+def _cell_key(cell: Tuple[int, int]) -> int:
+    # Упорядоченный беззнаковый ключ ячейки для бинарного поиска в каталоге
+    return ((cell[0] + 2 ** 31) << 32) | (cell[1] + 2 ** 31)
+
+
+class ClinicIndex:
+    """
+    Пространственный индекс клиник.
+
+    Клиники раскладываются по сетке ячеек cell_deg x cell_deg градусов;
+    поиск ближайших обходит кольца ячеек вокруг точки запроса и
+    останавливается, когда непросмотренные ячейки заведомо дальше
+    найденных. Расстояния сравниваются по хорде между единичными векторами
+    (монотонна по расстоянию на сфере и не требует тригонометрии).
+
+    Услуги клиники (специалисты, обследования, тип) кодируются битовой
+    маской для проверки при обходе; инвертированные индексы используются,
+    когда самый редкий из запрошенных признаков встречается у немногих клиник.
+    """
+
+    def __init__(self, clinics: Sequence[Clinic], cell_deg: float = 0.02):
+        self.clinics = list(clinics)
+        self.cell_deg = cell_deg
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        self.postings: Dict[str, List[int]] = {}
+        self.term_bits: Dict[str, int] = {}
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+        self.zs: List[float] = []
+        self.masks: List[int] = []
+
+        for idx, clinic in enumerate(self.clinics):
+            self.grid.setdefault(self._cell(clinic.lat, clinic.lon), []).append(idx)
+            x, y, z = _to_unit_vector(clinic.lat, clinic.lon)
+            self.xs.append(x)
+            self.ys.append(y)
+            self.zs.append(z)
+
+            mask = 0
+            for term in self._clinic_terms(clinic):
+                bit = self.term_bits.setdefault(term, 1 << len(self.term_bits))
+                if not mask & bit:
+                    mask |= bit
+                    self.postings.setdefault(term, []).append(idx)
+            self.masks.append(mask)
+
+        if self.grid:
+            rows = [cell[0] for cell in self.grid]
+            cols = [cell[1] for cell in self.grid]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+        else:
+            self._bounds = (0, 0, 0, 0)
+
+    def __len__(self) -> int:
+        return len(self.clinics)
+
+    def clinic(self, index: int) -> Clinic:
+        return self.clinics[index]
+
+    def _members(self, cell: Tuple[int, int]) -> Sequence[int]:
+        return self.grid.get(cell, ())
+
+    @property
+    def _cell_count(self) -> int:
+        return len(self.grid)
+
+    @staticmethod
+    def _clinic_terms(clinic: Clinic) -> List[str]:
+        terms = [f"specialist:{normalize_term(s)}" for s in clinic.specialists]
+        terms += [f"examination:{normalize_term(e)}" for e in clinic.examinations]
+        terms.append(f"kind:{normalize_term(clinic.kind)}")
+        return terms
+
+    @staticmethod
+    def _query_terms(specialists: Iterable[str], examinations: Iterable[str], kind: Optional[str]) -> List[str]:
+        terms = [f"specialist:{normalize_term(s)}" for s in specialists]
+        terms += [f"examination:{normalize_term(e)}" for e in examinations]
+        if kind:
+            terms.append(f"kind:{normalize_term(kind)}")
+        return terms
+
+    @property
+    def _columns(self) -> int:
+        return math.ceil(360 / self.cell_deg - 1e-9)
+
+    def _wrap_col(self, col: int) -> int:
+        # Долгота замкнута: столбцы по обе стороны 180° меридиана — соседи
+        first = math.floor(-180 / self.cell_deg)
+        return (col - first) % self._columns + first
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), self._wrap_col(int(math.floor(lon / self.cell_deg)))
+
+    def _ring(self, row: int, col: int, radius: int):
+        wrap = self._wrap_col
+        if radius == 0:
+            yield row, col
+            return
+        for j in range(col - radius, col + radius + 1):
+            yield row - radius, wrap(j)
+            yield row + radius, wrap(j)
+        for i in range(row - radius + 1, row + radius):
+            yield i, wrap(col - radius)
+            yield i, wrap(col + radius)
+
+    def nearest(self, lat: float, lon: float, limit: int = 5, specialists: Sequence[str] = (),
+                examinations: Sequence[str] = (), kind: Optional[str] = None,
+                max_distance_km: Optional[float] = None) -> List[Tuple[Clinic, float]]:
+        """
+        Ближайшие клиники, где есть все указанные специалисты и обследования.
+
+        Returns:
+            List[Tuple[Clinic, float]]: клиники и расстояние в км, по возрастанию расстояния
+        """
+        terms = self._query_terms(specialists, examinations, kind)
+        query_mask = 0
+        for term in terms:
+            bit = self.term_bits.get(term)
+            if bit is None:
+                # Такой услуги нет ни в одной клинике
+                return []
+            query_mask |= bit
+
+        point = _to_unit_vector(lat, lon)
+        rarest = min((self.postings[term] for term in terms), key=len, default=None)
+        if rarest is not None and len(rarest) <= BRUTE_FORCE_LIMIT:
+            best = self._scan(point, rarest, limit, query_mask)
+        else:
+            best = self._grid_search(lat, lon, point, limit, query_mask, max_distance_km)
+
+        results = []
+        for chord_sq, i in best:
+            distance = _chord_to_km(chord_sq)
+            if max_distance_km is not None and distance > max_distance_km:
+                break
+            results.append((self.clinic(i), round(distance, 3)))
+        return results
+
+    def _scan(self, point: Tuple[float, float, float], candidates: Iterable[int], limit: int,
+              query_mask: int) -> List[Tuple[float, int]]:
+        px, py, pz = point
+        xs, ys, zs, masks = self.xs, self.ys, self.zs, self.masks
+        found = [
+            ((xs[i] - px) ** 2 + (ys[i] - py) ** 2 + (zs[i] - pz) ** 2, i)
+            for i in candidates
+            if masks[i] & query_mask == query_mask
+        ]
+        return heapq.nsmallest(limit, found)
+
+    def _grid_search(self, lat: float, lon: float, point: Tuple[float, float, float], limit: int,
+                     query_mask: int, max_distance_km: Optional[float]) -> List[Tuple[float, int]]:
+        px, py, pz = point
+        xs, ys, zs, masks = self.xs, self.ys, self.zs, self.masks
+        row, col = self._cell(lat, lon)
+        min_row, max_row, min_col, max_col = self._bounds
+        max_radius = max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+        max_chord_sq = _km_to_chord_sq(max_distance_km) if max_distance_km is not None else None
+
+        heap: List[Tuple[float, int]] = []  # max-heap по расстоянию (-chord², idx)
+        for radius in range(max_radius + 1):
+            if (2 * radius + 1) ** 2 > 4 * self._cell_count or 2 * radius + 1 > self._columns:
+                # Точка далеко от клиник: кольца почти пусты (или обошли весь круг
+                # долгот и повторяются), полный перебор дешевле
+                return self._scan(point, range(len(self)), limit, query_mask)
+            for cell in self._ring(row, col, radius):
+                for i in self._members(cell):
+                    if masks[i] & query_mask != query_mask:
+                        continue
+                    chord_sq = (xs[i] - px) ** 2 + (ys[i] - py) ** 2 + (zs[i] - pz) ** 2
+                    if len(heap) < limit:
+                        heapq.heappush(heap, (-chord_sq, i))
+                    elif chord_sq < -heap[0][0]:
+                        heapq.heapreplace(heap, (-chord_sq, i))
+
+            # Непросмотренные клиники отстоят минимум на radius ячеек по широте или долготе
+            edge_lat = min(abs(lat) + (radius + 1) * self.cell_deg, 89.9)
+            bound_km = radius * self.cell_deg * KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+            bound_chord_sq = _km_to_chord_sq(bound_km)
+            if len(heap) == limit and -heap[0][0] <= bound_chord_sq:
+                break
+            if max_chord_sq is not None and bound_chord_sq > max_chord_sq:
+                break
+
+        return sorted((-chord_sq, i) for chord_sq, i in heap)
+
+
+class _WideMasks(Sequence):
+    """Маски шире 64 бит: читаются из mmap по мере обращения"""
+
+    def __init__(self, buffer: memoryview, width: int):
+        self._buffer = buffer
+        self._width = width
+
+    def __len__(self) -> int:
+        return len(self._buffer) // self._width
+
+    def __getitem__(self, index: int) -> int:
+        start = index * self._width
+        return int.from_bytes(self._buffer[start:start + self._width], "little")
+
+
+class MappedClinicIndex(ClinicIndex):
+    """
+    ClinicIndex поверх справочного каталога.
+
+    Координаты, маски, сетка и инвертированные индексы — срезы mmap без
+    копирования; ячейка ищется бинарным поиском по отсортированным ключам,
+    запись клиники декодируется только для попавших в выдачу.
+    """
+
+    def __init__(self, catalog: ReferenceCatalog):
+        meta = catalog.json("clinic.meta")
+        self.catalog = catalog
+        self.cell_deg = meta["cell_deg"]
+        self._count = meta["count"]
+        self._bounds = tuple(meta["bounds"])
+
+        self.xs = catalog.array("clinic.x", "d")
+        self.ys = catalog.array("clinic.y", "d")
+        self.zs = catalog.array("clinic.z", "d")
+        masks = catalog.section("clinic.mask")
+        mask_bytes = meta["mask_bytes"]
+        self.masks = masks.cast("Q") if mask_bytes == 8 else _WideMasks(masks, mask_bytes)
+
+        self._cell_keys = catalog.array("clinic.cells", "Q")
+        self._cell_starts = catalog.array("clinic.cstart", "I")
+        self._cell_items = catalog.array("clinic.citems", "I")
+
+        posting_starts = catalog.array("clinic.pstart", "I")
+        posting_items = catalog.array("clinic.pitems", "I")
+        self.term_bits = {term: 1 << n for n, term in enumerate(meta["terms"])}
+        self.postings = {
+            term: posting_items[posting_starts[n]:posting_starts[n + 1]] for n, term in enumerate(meta["terms"])
+        }
+        self._records = catalog.blobs("clinic.rec")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clinic(self, index: int) -> Clinic:
+        return Clinic.model_validate_json(bytes(self._records[index]))
+
+    def _members(self, cell: Tuple[int, int]) -> Sequence[int]:
+        key = _cell_key(cell)
+        position = bisect_left(self._cell_keys, key)
+        if position < len(self._cell_keys) and self._cell_keys[position] == key:
+            return self._cell_items[self._cell_starts[position]:self._cell_starts[position + 1]]
+        return ()
+
+    @property
+    def _cell_count(self) -> int:
+        return len(self._cell_keys)
+
+
+def write_clinic_catalog(writer, clinics: Sequence[Clinic], cell_deg: float = 0.02):
+    """Строит индекс клиник в памяти и записывает его в секции справочного каталога (см. MappedClinicIndex)"""
+    index = ClinicIndex(clinics, cell_deg)
+    cells = sorted(index.grid, key=_cell_key)
+    cell_starts, cell_items = [0], []
+    for cell in cells:
+        cell_items.extend(index.grid[cell])
+        cell_starts.append(len(cell_items))
+
+    terms = sorted(index.term_bits, key=index.term_bits.get)
+    posting_starts, posting_items = [0], []
+    for term in terms:
+        posting_items.extend(index.postings.get(term, ()))
+        posting_starts.append(len(posting_items))
+
+    mask_bytes = max(1, (len(terms) + 63) // 64) * 8
+    writer.add_json("clinic.meta", {
+        "count": len(index.clinics),
+        "cell_deg": index.cell_deg,
+        "bounds": list(index._bounds),
+        "terms": terms,
+        "mask_bytes": mask_bytes
+    })
+    writer.add_array("clinic.x", "d", index.xs)
+    writer.add_array("clinic.y", "d", index.ys)
+    writer.add_array("clinic.z", "d", index.zs)
+    writer.add("clinic.mask", b"".join(mask.to_bytes(mask_bytes, "little") for mask in index.masks))
+    writer.add_array("clinic.cells", "Q", [_cell_key(cell) for cell in cells])
+    writer.add_array("clinic.cstart", "I", cell_starts)
+    writer.add_array("clinic.citems", "I", cell_items)
+    writer.add_array("clinic.pstart", "I", posting_starts)
+    writer.add_array("clinic.pitems", "I", posting_items)
+    writer.add_blobs("clinic.rec", [clinic.model_dump_json().encode("utf-8") for clinic in index.clinics])
+
+
+def load_clinics_csv(path: str) -> List[Clinic]:
+    """
+    Загрузка каталога клиник из CSV.
+
+    Колонки: id, name, kind, address, lat, lon, specialists, examinations, phone;
+    списки специалистов и обследований разделяются символом "|".
+    """
+    clinics = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            clinics.append(Clinic(
+                id=row["id"],
+                name=row["name"],
+                kind=row.get("kind") or "clinic",
+                address=row.get("address") or "",
+                lat=float(row["lat"]),
+                lon=float(row["lon"]),
+                specialists=[s for s in (row.get("specialists") or "").split("|") if s],
+                examinations=[e for e in (row.get("examinations") or "").split("|") if e],
+                phone=row.get("phone") or None
+            ))
+    return clinics
+
+
+def load_clinics_parquet(path: str) -> List[Clinic]:
+    """Загрузка каталога из Parquet (требуется pyarrow); списки — колонки list<string>"""
+    import pyarrow.parquet as pq
+
+    return [Clinic(**row) for row in pq.read_table(path).to_pylist()]
+
+
+def load_clinics(path: str) -> List[Clinic]:
+    if path.endswith(".parquet"):
+        return load_clinics_parquet(path)
+    return load_clinics_csv(path)
+
+
+class ClinicService:
+    def __init__(self, catalog_path: Optional[str] = None):
+        self.catalog_path = catalog_path
+        self.index: Optional[ClinicIndex] = None
+        if catalog_path:
+            self.load(catalog_path)
+
+    @property
+    def available(self) -> bool:
+        return self.index is not None and len(self.index) > 0
+
+    def load(self, path: str):
+        if is_catalog_file(path):
+            self.use_catalog(ReferenceCatalog(path))
+            return
+        clinics = load_clinics(path)
+        self.index = ClinicIndex(clinics, cell_deg=settings.clinic_grid_cell_deg)
+        logger.info(f"✅ Clinic catalogue loaded: {len(clinics)} clinics from {path}")
+
+    def use_catalog(self, catalog: ReferenceCatalog):
+        self.index = MappedClinicIndex(catalog)
+        logger.info(f"✅ Clinic index mapped: {len(self.index)} clinics from {catalog.path}")
+
+    def find_nearest(self, lat: float, lon: float, limit: int = 5, specialists: Sequence[str] = (),
+                     examinations: Sequence[str] = (), kind: Optional[str] = None) -> List[Tuple[Clinic, float]]:
+        if not self.available:
+            return []
+        return self.index.nearest(lat, lon, limit, specialists, examinations, kind)
+
+    def find_for_recommendation(self, lat: float, lon: float, recommendation: Dict,
+                                limit: int = 5) -> List[Tuple[Clinic, float]]:
+        """Клиники для рекомендации SymptomChecker: сначала со всеми обследованиями, затем только со специалистами"""
+        specialists = recommendation.get("specialists", [])
+        examinations = recommendation.get("examinations", [])
+        results = self.find_nearest(lat, lon, limit, specialists, examinations)
+        if not results and examinations:
+            results = self.find_nearest(lat, lon, limit, specialists)
+        return results
+
+    def format_clinics_message(self, results: List[Tuple[Clinic, float]]) -> str:
+        if not results:
+            return "❌ Подходящие клиники рядом не найдены"
+
+        message = "🏥 Ближайшие клиники:\n\n"
+        for clinic, distance in results:
+            message += f"• {clinic.name} — {distance:.1f} км\n"
+            message += f"  📍 {clinic.address}\n"
+            if clinic.phone:
+                message += f"  📞 {clinic.phone}\n"
+            message += "\n"
+        return message.rstrip() + "\n"
+
+
+_clinic_service: Optional[ClinicService] = None
+
+
+def get_clinic_service() -> ClinicService:
+    """Общий для процесса каталог клиник (загружается один раз)"""
+    global _clinic_service
+    if _clinic_service is None:
+        path = settings.clinic_catalog_path
+        if path and not os.path.exists(path):
+            logger.error(f"❌ Clinic catalogue not found: {path}")
+            path = None
+        _clinic_service = ClinicService(path)
+        if not path:
+            catalog = get_reference_catalog()
+            if catalog is not None and "clinic.meta" in catalog:
+                _clinic_service.use_catalog(catalog)
+    return _clinic_service
@@ -1,13 +1,52 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from models.health_models import MedicalCondition, UserProfile
+from services.catalog import get_reference_catalog
+from utils.text_search import SearchIndex, analyze
+
+# Вес совпадения в зависимости от поля сообщества
+SEARCH_FIELD_WEIGHTS = {"name": 3.0, "synonyms": 3.0, "description": 1.0, "success_stories": 0.5}
+
+# Вес сообщества для заболевания: найдено по condition_id или только по названию
+CONDITION_ID_MATCH_WEIGHT = 1.0
+CONDITION_NAME_MATCH_WEIGHT = 0.5
+
+# Сообщение считается вопросом о сообществе, если больше этой доли его слов
+# совпадает с названием или синонимами сообщества
+MIN_TOPIC_COVERAGE = 0.5
+
+
+class CommunitySnippet(NamedTuple):
+    message: str  # Полная карточка сообщества (format_community_message)
+    summary: str  # Две строки для списков и подборок
 
 
 class CommunityService:
     def __init__(self):
-        self.condition_communities = {
+        self._condition_communities = None
+        self._search_index: Optional[SearchIndex] = None
+        self._condition_index: Optional[Dict[str, List[str]]] = None
+        self._community_order: Dict[str, int] = {}
+        self._snippets: Optional[Dict[str, CommunitySnippet]] = None
+        self._topic_terms: Optional[Dict[str, frozenset]] = None
+
+    @property
+    def condition_communities(self) -> Dict[str, Any]:
+        if self._condition_communities is None:
+            catalog = get_reference_catalog()
+            if catalog is not None and "communities" in catalog:
+                self._condition_communities = catalog.records("communities")
+            else:
+                self._condition_communities = self._builtin_communities()
+        return self._condition_communities
+
+    def _builtin_communities(self) -> Dict[str, Any]:
+        return {
             "vitiligo": {
                 "name": "Витилиго: поддержка и лечение",
                 "description": "Сообщество людей с витилиго. Обсуждаем лечение, психологическую поддержку, истории успеха.",
                 "max_chat_link": "https://max.ru/vitiligo_support",
+                "synonyms": ["витилиго", "vitiligo", "белые пятна на коже", "депигментация"],
                 "success_stories": [
                     "Мария: Нашла эффективную схему лечения после 5 лет поисков",
                     "Алексей: Принял свою особенность и помогает другим"
@@ -17,6 +56,7 @@ class CommunityService:
                 "name": "Сахарный диабет: жизнь без ограничений",
                 "description": "Поддержка, обмен опытом, новости в лечении диабета.",
                 "max_chat_link": "https://max.ru/diabetes_support",
+                "synonyms": ["диабет", "diabetes", "сахар в крови", "глюкоза", "инсулин"],
                 "success_stories": [
                     "Дмитрий: Сбросил 25 кг и контролирую диабет без лекарств",
                     "Ольга: Научилась жить полноценной жизнью с диабетом 1 типа"
@@ -26,6 +66,7 @@ class CommunityService:
                 "name": "Гипертония под контролем",
                 "description": "Обсуждаем контроль давления, питание, физические нагрузки.",
                 "max_chat_link": "https://max.ru/hypertension_support",
+                "synonyms": ["гипертензия", "hypertension", "высокое давление", "давление скачет"],
                 "success_stories": [
                     "Сергей: Нормализовал давление без таблеток через изменение образа жизни"
                 ]
@@ -33,7 +74,8 @@ class CommunityService:
             "migraine": {
                 "name": "Мигрень и головные боли",
                 "description": "Поиск триггеров, эффективные методы лечения, поддержка.",
-                "max_chat_link": "https://max.ru/migraine_support"
+                "max_chat_link": "https://max.ru/migraine_support",
+                "synonyms": ["мигрень", "migraine", "головная боль", "болит голова"]
             }
         }
 
@@ -41,10 +83,25 @@ class CommunityService:
         return self.condition_communities.get(condition_id)
 
     def format_community_message(self, condition_id: str) -> str:
-        community = self.get_community_for_condition(condition_id)
-        if not community:
+        snippet = self.snippets.get(condition_id)
+        if not snippet:
             return "❌ Сообщество для вашего заболевания пока не создано"
+        return snippet.message
 
+    @property
+    def snippets(self) -> Dict[str, CommunitySnippet]:
+        # Тексты сообществ форматируются один раз, а не на каждый запрос
+        if self._snippets is None:
+            self._snippets = {
+                community_id: CommunitySnippet(
+                    message=self._render_community_message(community),
+                    summary=f"• {community['name']}\n  {community['description']}\n"
+                )
+                for community_id, community in self.condition_communities.items()
+            }
+        return self._snippets
+
+    def _render_community_message(self, community: Dict[str, Any]) -> str:
         message = f"👥 {community['name']}\n\n"
         message += f"{community['description']}\n\n"
 
@@ -58,4 +115,166 @@ class CommunityService:
         return message
 
     def get_all_communities(self) -> Dict[str, Any]:
-        return self.condition_communities
\ No newline at end of file
+        return self.condition_communities
+
+    @property
+    def search_index(self) -> SearchIndex:
+        # Индекс строится один раз, дальше обновляется в add_community
+        if self._search_index is None:
+            index = SearchIndex(SEARCH_FIELD_WEIGHTS)
+            for condition_id, community in self.condition_communities.items():
+                index.add(condition_id, self._search_fields(community))
+            self._search_index = index
+        return self._search_index
+
+    @staticmethod
+    def _search_fields(community: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: community.get(field) for field in SEARCH_FIELD_WEIGHTS}
+
+    def add_community(self, condition_id: str, community: Dict[str, Any]):
+        """Добавление или обновление сообщества с инкрементальным обновлением индекса"""
+        if not isinstance(self.condition_communities, dict):
+            # Записи каталога только для чтения: изменения держим в копии процесса
+            self._condition_communities = dict(self.condition_communities)
+        self._condition_communities[condition_id] = community
+        if self._search_index is not None:
+            self._search_index.add(condition_id, self._search_fields(community))
+        self._condition_index = None
+        self._snippets = None
+        self._topic_terms = None
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, Dict[str, Any]]]:
+        """Сообщества по свободному тексту ("сахар", "давление"), от наиболее подходящих"""
+        return [
+            (condition_id, self.condition_communities[condition_id])
+            for condition_id, _ in self.search_index.search(query, limit)
+        ]
+
+    @property
+    def topic_terms(self) -> Dict[str, frozenset]:
+        """Основы слов названия и синонимов каждого сообщества"""
+        if self._topic_terms is None:
+            self._topic_terms = {
+                community_id: frozenset(
+                    term for text in [community.get("name") or "", *(community.get("synonyms") or [])] for term in analyze(text)
+                )
+                for community_id, community in self.condition_communities.items()
+            }
+        return self._topic_terms
+
+    def search_topic(self, text: str, limit: int = 3) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Сообщества, о которых явно говорит сообщение: больше половины его слов
+        совпадают (по основе или префиксу) с названием или синонимами. Одно
+        общее слово ("высокая температура" и "высокое давление") не считается.
+
+        Returns:
+            List[Tuple[str, Dict[str, Any]]]: сообщества или [], если сообщение не о них
+        """
+        stems = list(dict.fromkeys(analyze(text)))
+        if not stems:
+            return []
+        results = []
+        for condition_id, community in self.search(text, limit):
+            terms = self.topic_terms.get(condition_id, frozenset())
+            matched = sum(
+                1 for base in stems
+                if base in terms or (len(base) >= 3 and any(term.startswith(base) for term in terms))
+            )
+            if matched / len(stems) > MIN_TOPIC_COVERAGE:
+                results.append((condition_id, community))
+        return results
+
+    def format_search_message(self, query: str, results: List[Tuple[str, Dict[str, Any]]]) -> str:
+        if not results:
+            return f"❌ По запросу «{query}» сообщества не найдены"
+
+        message = f"🔎 Сообщества по запросу «{query}»:\n\n"
+        for _, community in results:
+            message += f"• {community['name']}\n"
+            message += f"  {community['description']}\n\n"
+        return message.rstrip() + "\n"
+
+    @property
+    def condition_index(self) -> Dict[str, List[str]]:
+        """condition_id -> id сообществ; сообщество покрывает свой id и перечисленные в condition_ids"""
+        if self._condition_index is None:
+            index: Dict[str, List[str]] = {}
+            order: Dict[str, int] = {}
+            for community_id, community in self.condition_communities.items():
+                order[community_id] = len(order)
+                for condition_id in [community_id, *community.get("condition_ids", [])]:
+                    index.setdefault(condition_id, []).append(community_id)
+            self._condition_index = index
+            self._community_order = order
+        return self._condition_index
+
+    def _match_condition(self, condition_id: str, name: str) -> List[Tuple[str, float]]:
+        community_ids = self.condition_index.get(condition_id)
+        if community_ids:
+            return [(community_id, CONDITION_ID_MATCH_WEIGHT) for community_id in community_ids]
+        if name:
+            # Заболевание не из справочника ("Другое"): ищем по названию
+            return [(community_id, CONDITION_NAME_MATCH_WEIGHT)
+                    for community_id, _ in self.search_index.search(name, limit=1)]
+        return []
+
+    def match_communities_batch(self, users_conditions: Mapping[int, Iterable[Union[MedicalCondition, str]]],
+                                limit: int = 3) -> Dict[int, List[str]]:
+        """
+        Сообщества для многих пользователей за один проход.
+
+        Каждое уникальное заболевание сопоставляется с сообществами один раз:
+        по condition_id через индекс, иначе полнотекстовым поиском по названию.
+        Ранжирование выполняется один раз на уникальный набор заболеваний.
+        Сообщество, подходящее нескольким заболеваниям пользователя, выше в списке.
+
+        Args:
+            users_conditions: user_id -> заболевания (MedicalCondition или condition_id)
+            limit: максимум сообществ на пользователя
+
+        Returns:
+            Dict[int, List[str]]: user_id -> id сообществ по убыванию релевантности
+        """
+        self.condition_index
+        order = self._community_order
+        resolved: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+        ranked: Dict[Tuple[Tuple[str, str], ...], List[str]] = {}
+        results: Dict[int, List[str]] = {}
+
+        for user_id, conditions in users_conditions.items():
+            keys = tuple(sorted(
+                (condition, "") if isinstance(condition, str) else (condition.condition_id, condition.name)
+                for condition in conditions
+            ))
+            community_ids = ranked.get(keys)
+            if community_ids is None:
+                scores: Dict[str, float] = {}
+                for key in keys:
+                    matches = resolved.get(key)
+                    if matches is None:
+                        matches = resolved[key] = self._match_condition(*key)
+                    for community_id, weight in matches:
+                        scores[community_id] = scores.get(community_id, 0.0) + weight
+                community_ids = ranked[keys] = sorted(scores, key=lambda cid: (-scores[cid], order[cid]))[:limit]
+            results[user_id] = community_ids
+
+        return results
+
+    def format_communities_list(self, community_ids: Iterable[str], header: str) -> str:
+        snippets = self.snippets
+        return f"{header}\n\n" + "\n".join(snippets[cid].summary for cid in community_ids if cid in snippets)
+
+    def build_digests(self, profiles: Iterable[UserProfile], limit: int = 3) -> Dict[int, str]:
+        """Тексты еженедельной подборки сообществ; пользователи без подходящих сообществ пропускаются"""
+        matches = self.match_communities_batch({profile.user_id: profile.conditions for profile in profiles}, limit)
+        texts: Dict[Tuple[str, ...], str] = {}
+        digests: Dict[int, str] = {}
+        for user_id, community_ids in matches.items():
+            if not community_ids:
+                continue
+            key = tuple(community_ids)
+            if key not in texts:
+                texts[key] = self.format_communities_list(community_ids, "👥 Сообщества для вас на этой неделе:")
+            digests[user_id] = texts[key]
+        return digests
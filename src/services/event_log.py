@@ -0,0 +1,278 @@
+import gc
+import json
+import logging
+import os
+import re
+import struct
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Заголовок записи в сегменте: длина JSON-тела, crc32 (тело + seq), seq
+_RECORD = struct.Struct("<IIQ")
+_SEGMENT_RE = re.compile(r"^segment-(\d{20})\.log$")
+_SNAPSHOT_RE = re.compile(r"^snapshot-(\d{20})\.jsonl$")
+
+Event = List[Any]
+
+# Сканер C-декодера json без проверок кодировки в json.loads
+_scan_json = json.JSONDecoder().scan_once
+
+
+def _checksum(payload: bytes, seq: int) -> int:
+    return zlib.crc32(payload, seq & 0xFFFFFFFF)
+
+
+def scan_records(data: bytes) -> Iterator[Tuple[int, bytes, int]]:
+    """(seq, тело, смещение конца записи) для записей сегмента до первой поврежденной"""
+    unpack = _RECORD.unpack_from
+    header_size = _RECORD.size
+    size = len(data)
+    offset = 0
+    while offset + header_size <= size:
+        length, crc, seq = unpack(data, offset)
+        start = offset + header_size
+        end = start + length
+        if end > size:
+            return
+        payload = data[start:end]
+        if _checksum(payload, seq) != crc:
+            return
+        yield seq, payload, end
+        offset = end
+
+
+def decode_event(payload: bytes) -> Event:
+    return _scan_json(payload.decode("utf-8"), 0)[0]
+
+
+class EventLog:
+    """
+    Журнал событий только на добавление, разбитый на сегменты.
+
+    Событие — JSON-массив [type, user_id, ts, data] с заголовком (длина,
+    crc32, seq); запись последовательная, оборванный хвост последнего
+    сегмента после сбоя отбрасывается при восстановлении. seq в заголовке
+    позволяет пропускать покрытые снимком события без разбора JSON.
+
+    Снимок — JSON Lines: строка {"seq": N}, затем записи состояния. При старте
+    загружается последний снимок и применяются только события после него;
+    сегменты, полностью покрытые сохраненными снимками, удаляются (компакция).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync: bool = False,
+                 keep_snapshots: int = 2):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.keep_snapshots = max(1, keep_snapshots)
+        self.seq = 0
+        self.snapshot_seq = 0
+        self._file = None
+        self._segment_size = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def since_snapshot(self) -> int:
+        return self.seq - self.snapshot_seq
+
+    def _list(self, pattern: "re.Pattern") -> List[Tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """(seq первого события, путь) в порядке записи"""
+        return self._list(_SEGMENT_RE)
+
+    def snapshots(self) -> List[Tuple[int, str]]:
+        return self._list(_SNAPSHOT_RE)
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(path) for _, path in self.segments() + self.snapshots())
+
+    # -------------------------------
+    # Восстановление
+    # -------------------------------
+    def recover(self, restore: Callable[[Iterator[Dict[str, Any]]], None],
+                apply: Callable[[Event], None]) -> Dict[str, Any]:
+        """
+        Загрузка последнего снимка и применение хвоста журнала.
+
+        Args:
+            restore: принимает итератор записей снимка
+            apply: применяет одно событие
+
+        Returns:
+            Dict[str, Any]: seq снимка, число примененных событий, итоговый seq
+
+        Raises:
+            ValueError: поврежден сегмент, за которым есть другие сегменты
+        """
+        # Восстановление создает миллионы контейнеров: без GC оно в разы быстрее,
+        # а циклических ссылок в состоянии нет
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            snapshots = self.snapshots()
+            if snapshots:
+                _, path = snapshots[-1]
+                with open(path, encoding="utf-8") as f:
+                    header = json.loads(f.readline())
+                    restore(json.loads(line) for line in f)
+                self.seq = self.snapshot_seq = header["seq"]
+
+            replayed = 0
+            segments = self.segments()
+            for i, (_, path) in enumerate(segments):
+                is_last = i == len(segments) - 1
+                # Сегмент целиком покрыт снимком
+                if not is_last and segments[i + 1][0] <= self.seq + 1:
+                    continue
+                replayed += self._replay_segment(path, apply, is_last)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        if segments:
+            self._open_segment(segments[-1][1])
+        else:
+            self._open_segment(self._segment_path(self.seq + 1))
+
+        return {"snapshot_seq": self.snapshot_seq, "replayed": replayed, "seq": self.seq}
+
+    def _replay_segment(self, path: str, apply: Callable[[Event], None], is_last: bool) -> int:
+        with open(path, "rb") as f:
+            data = f.read()
+
+        size = len(data)
+        offset = 0
+        applied = 0
+        for seq, payload, end in scan_records(data):
+            if seq > self.seq:
+                apply(decode_event(payload))
+                self.seq = seq
+                applied += 1
+            offset = end
+
+        if offset < size:
+            if not is_last:
+                raise ValueError(f"Corrupted event log segment {path} at offset {offset}")
+            logger.warning(f"⚠️ Truncating torn tail of {path} at offset {offset} ({size - offset} bytes)")
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        return applied
+
+    # -------------------------------
+    # Запись
+    # -------------------------------
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{first_seq:020d}.log")
+
+    def _open_segment(self, path: str):
+        self._file = open(path, "ab")
+        self._segment_size = self._file.tell()
+
+    def _roll(self, first_seq: int):
+        self._sync()
+        self._file.close()
+        self._open_segment(self._segment_path(first_seq))
+
+    def append(self, event_type: str, user_id: int, data: Dict[str, Any], ts: Optional[float] = None) -> int:
+        """
+        Добавляет событие в конец журнала.
+
+        Returns:
+            int: seq события
+
+        Raises:
+            RuntimeError: журнал не открыт (не вызван recover)
+        """
+        if self._file is None:
+            raise RuntimeError("Event log is not recovered")
+
+        seq = self.seq + 1
+        payload = json.dumps(
+            [event_type, user_id, time.time() if ts is None else ts, data],
+            ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        if self._segment_size >= self.segment_bytes:
+            self._roll(seq)
+
+        record = _RECORD.pack(len(payload), _checksum(payload, seq), seq) + payload
+        self._file.write(record)
+        # Запись в ОС переживает падение процесса; fsync — и отключение питания
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._segment_size += len(record)
+        self.seq = seq
+        return seq
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    # -------------------------------
+    # Снимки и компакция
+    # -------------------------------
+    def write_snapshot(self, seq: int, records: Iterable[Dict[str, Any]]):
+        """
+        Атомарная запись снимка состояния на момент seq и компакция журнала.
+
+        Записи сериализуются по одной, поэтому вызов можно выполнять в потоке,
+        не блокируя event loop надолго.
+        """
+        path = os.path.join(self.directory, f"snapshot-{seq:020d}.jsonl")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"seq": seq}) + "\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.snapshot_seq = max(self.snapshot_seq, seq)
+        self.compact()
+
+    def compact(self) -> int:
+        """
+        Удаляет старые снимки (кроме keep_snapshots последних) и сегменты,
+        полностью покрытые самым старым из оставленных снимков.
+
+        Returns:
+            int: число удаленных файлов
+        """
+        snapshots = self.snapshots()
+        if not snapshots:
+            return 0
+
+        removed = 0
+        kept = snapshots[-self.keep_snapshots:]
+        for _, path in snapshots[:-self.keep_snapshots]:
+            os.remove(path)
+            removed += 1
+
+        covered_seq = kept[0][0]
+        segments = self.segments()
+        # Последний сегмент открыт на запись и не удаляется
+        for (_, path), (next_first_seq, _) in zip(segments, segments[1:]):
+            if next_first_seq > covered_seq + 1:
+                break
+            os.remove(path)
+            removed += 1
+
+        if removed:
+            logger.info(f"🧹 Event log compacted: {removed} files removed, snapshot seq {covered_seq}")
+        return removed
@@ -1,37 +1,248 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import asyncio
+import logging
+from typing import List, Dict, Any, Iterator, Optional
+from datetime import datetime, timedelta
+from config import settings
 from models.health_models import UserProfile, HealthMetric, MedicalCondition
+from services.anomaly_detector import AnomalyDetector
+from services.event_log import EventLog
+from services.metric_rollups import DAY, MetricRollups
+from services.metric_store import GroupCommitWriter, metric_row
+from services.profile_cache import ProfileCache, profile_invalidation_bus
+from services.profile_store import InMemoryProfileStore, WriteBehindBuffer
+from services.screening_service import ScreeningService
+from services.screening_views import ScreeningView, ScreeningViews
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Типы событий журнала дневника
+PROFILE_CREATED = "profile_created"
+PROFILE_UPDATED = "profile_updated"
+CONDITION_ADDED = "condition_added"
+METRIC_RECORDED = "metric_recorded"
 
 
 class HealthService:
-    def __init__(self):
+    def __init__(self, profile_store: InMemoryProfileStore = None, profile_cache: ProfileCache = None,
+                 event_log: EventLog = None, metric_writer: GroupCommitWriter = None,
+                 anomaly_detector: AnomalyDetector = None, screening_service: ScreeningService = None):
         # Временное хранилище (в продакшене заменить на БД)
-        self.user_profiles = {}
+        self.profile_store = profile_store or InMemoryProfileStore()
         self.health_metrics = {}
+        # Метрики из журнала в виде строк [type, value, ts, notes]: объекты
+        # HealthMetric создаются при первом обращении к метрикам пользователя
+        self.restored_metrics: Dict[int, List[List[Any]]] = {}
+        # Агрегаты по часам/дням/неделям; строятся при первом запросе, затем
+        # обновляются при каждой записи
+        self.metric_rollups: Dict[int, MetricRollups] = {}
+
+        # Read-through кэш профилей перед хранилищем
+        self.profile_cache = profile_cache or ProfileCache(
+            max_size=settings.profile_cache_size,
+            ttl=settings.profile_cache_ttl,
+            bus=profile_invalidation_bus
+        )
+        self.write_behind = WriteBehindBuffer(
+            self.profile_store,
+            max_batch=settings.profile_write_behind_batch,
+            flush_interval=settings.profile_write_behind_interval_ms / 1000,
+            on_flush=self._on_profiles_flushed
+        ) if settings.profile_write_behind else None
+
+        # Календари обследований пересчитываются при изменении профиля; подписка
+        # под id кэша профилей, чтобы не получать собственные инвалидации
+        self.screening_views = ScreeningViews(
+            screening_service or ScreeningService(),
+            bus=profile_invalidation_bus,
+            subscriber_id=self.profile_cache.cache_id
+        )
+
+        # Групповая фиксация показателей в БД
+        self.metric_writer = metric_writer
+        # Потоковая проверка показателей; оповещения уходят подписчикам детектора
+        self.anomaly_detector = anomaly_detector
+
+        # Журнал событий: состояние восстанавливается из снимка и хвоста журнала
+        self.event_log = event_log
+        self.snapshot_every = settings.event_log_snapshot_every
+        self._snapshot_task: Optional[asyncio.Task] = None
+        if event_log is not None:
+            stats = event_log.recover(self._restore_snapshot, self._apply_event)
+            logger.info(
+                f"✅ Health diary recovered: snapshot seq {stats['snapshot_seq']}, "
+                f"{stats['replayed']} events replayed, seq {stats['seq']}"
+            )
+
+    @property
+    def user_profiles(self) -> Dict[int, UserProfile]:
+        return self.profile_store.profiles
+
+    async def _save_profile(self, profile: UserProfile):
+        """Инвалидация кэшей (включая другие воркеры) и запись в хранилище"""
+        self.profile_cache.invalidate(profile.user_id)
+        if self.write_behind:
+            await self.write_behind.add(profile)
+        else:
+            await self.profile_store.save_many([profile])
+        self.screening_views.schedule(profile)
+
+    def _on_profiles_flushed(self, user_ids: List[int]):
+        # Другие воркеры могли закэшировать старую версию до сброса
+        for user_id in user_ids:
+            self.profile_cache.invalidate(user_id)
+
+    async def flush(self):
+        """Сброс отложенных записей (при остановке приложения)"""
+        await self.screening_views.wait()
+        if self.write_behind:
+            await self.write_behind.flush()
+        if self.metric_writer is not None:
+            await self.metric_writer.flush()
+        if self.event_log is not None:
+            if self._snapshot_task is not None:
+                await asyncio.gather(self._snapshot_task, return_exceptions=True)
+            self.event_log.close()
+
+    # -------------------------------
+    # Журнал событий
+    # -------------------------------
+    def _record(self, event_type: str, user_id: int, data: Dict[str, Any], timestamp: datetime):
+        if self.event_log is None:
+            return
+        self.event_log.append(event_type, user_id, data, timestamp.timestamp())
+        if self.event_log.since_snapshot >= self.snapshot_every and (
+                self._snapshot_task is None or self._snapshot_task.done()):
+            self._snapshot_task = asyncio.create_task(self.snapshot())
+
+    async def snapshot(self):
+        """Снимок состояния в фоне; запись и компакция выполняются в потоке"""
+        seq = self.event_log.seq
+        records = self._snapshot_records()
+        try:
+            await asyncio.to_thread(self.event_log.write_snapshot, seq, records)
+            logger.info(f"📸 Health diary snapshot written at seq {seq}")
+        except Exception as e:
+            logger.error(f"❌ Failed to write health diary snapshot at seq {seq}: {e}")
+
+    def _snapshot_records(self) -> Iterator[Dict[str, Any]]:
+        # Состояние фиксируется синхронно: профили в хранилище заменяются при
+        # сохранении, несброшенные копируются, списки метрик только растут
+        profiles = dict(self.profile_store.profiles)
+        if self.write_behind:
+            profiles.update({
+                user_id: profile.model_copy(deep=True) for user_id, profile in self.write_behind.pending.items()
+            })
+        metric_lists = [(user_id, metrics, len(metrics)) for user_id, metrics in self.health_metrics.items()]
+        row_lists = [(user_id, rows, len(rows)) for user_id, rows in self.restored_metrics.items()]
+
+        def records():
+            for profile in profiles.values():
+                yield {"p": profile.model_dump(mode="json")}
+            for user_id, metrics, count in metric_lists:
+                yield {"m": user_id, "r": [
+                    [m.metric_type, m.value, m.timestamp.timestamp(), m.notes] for m in metrics[:count]
+                ]}
+            for user_id, rows, count in row_lists:
+                yield {"m": user_id, "r": rows[:count]}
+
+        return records()
+
+    def _restore_snapshot(self, records: Iterator[Dict[str, Any]]):
+        profiles = self.profile_store.profiles
+        for record in records:
+            if "p" in record:
+                profile = UserProfile.model_validate(record["p"])
+                profiles[profile.user_id] = profile
+            else:
+                self.restored_metrics[record["m"]] = record["r"]
+
+    @staticmethod
+    def _restored_metric(user_id: int, metric_type: str, value: Dict[str, Any], ts: float,
+                         notes: Optional[str]) -> HealthMetric:
+        # Данные уже проверены при записи: повторная валидация замедлила бы восстановление
+        return HealthMetric.model_construct(
+            user_id=user_id, metric_type=metric_type, value=value,
+            timestamp=datetime.fromtimestamp(ts), notes=notes
+        )
+
+    def _apply_event(self, event: List[Any]):
+        event_type, user_id, ts, data = event
+        if event_type == METRIC_RECORDED:
+            rows = self.restored_metrics.get(user_id)
+            if rows is None:
+                rows = self.restored_metrics[user_id] = []
+            rows.append([data["type"], data["value"], ts, data.get("notes")])
+            return
+
+        profiles = self.profile_store.profiles
+        if event_type == PROFILE_CREATED:
+            profiles[user_id] = UserProfile.model_validate(data)
+            return
+
+        profile = profiles.get(user_id)
+        if profile is None:
+            logger.warning(f"⚠️ Event {event_type} for unknown profile {user_id} skipped")
+            return
+        if event_type == PROFILE_UPDATED:
+            profiles[user_id] = UserProfile.model_validate({**profile.model_dump(), **data})
+        elif event_type == CONDITION_ADDED:
+            profile.conditions.append(MedicalCondition.model_validate(data))
+            profile.updated_at = datetime.fromtimestamp(ts)
 
     async def create_user_profile(self, user_id: int, profile_data: Dict[str, Any]) -> UserProfile:
         profile = UserProfile(
             user_id=user_id,
             **profile_data
         )
-        self.user_profiles[user_id] = profile
+        self._record(PROFILE_CREATED, user_id, profile.model_dump(mode="json"), profile.updated_at)
+        await self._save_profile(profile)
         return profile
 
     async def get_user_profile(self, user_id: int) -> Optional[UserProfile]:
-        return self.user_profiles.get(user_id)
+        with tracer.start_span("health_service.get_user_profile"):
+            # Несброшенные изменения свежее всего, что есть в кэше и хранилище
+            if self.write_behind:
+                pending = self.write_behind.get(user_id)
+                if pending is not None:
+                    return pending
+
+            profile = self.profile_cache.get(user_id)
+            if profile is not None:
+                return profile
+
+            profile = await self.profile_store.get(user_id)
+            if profile is not None:
+                self.profile_cache.put(profile)
+            return profile
+
+    async def get_screening_view(self, user_id: int) -> Optional[ScreeningView]:
+        """Календарь обследований; None — профиля нет"""
+        view = self.screening_views.get(user_id)
+        if view is None:
+            profile = await self.get_user_profile(user_id)
+            if profile is None:
+                return None
+            view = self.screening_views.compute(profile)
+        return view
 
     async def update_user_profile(self, user_id: int, updates: Dict[str, Any]) -> Optional[UserProfile]:
-        if user_id not in self.user_profiles:
+        profile = await self.get_user_profile(user_id)
+        if not profile:
             return None
 
-        profile = self.user_profiles[user_id]
-
         # Обновляем поля
-        for key, value in updates.items():
-            if hasattr(profile, key):
-                setattr(profile, key, value)
+        changed = [key for key in updates if hasattr(profile, key)]
+        for key in changed:
+            setattr(profile, key, updates[key])
 
         profile.updated_at = datetime.now()
+        self._record(
+            PROFILE_UPDATED, user_id,
+            profile.model_dump(mode="json", include={*changed, "updated_at"}),
+            profile.updated_at
+        )
+        await self._save_profile(profile)
         return profile
 
     async def add_health_metric(self, user_id: int, metric_type: str, value: Dict[str, Any],
@@ -43,22 +254,74 @@ class HealthService:
             notes=notes
         )
 
-        if user_id not in self.health_metrics:
-            self.health_metrics[user_id] = []
+        # Подтверждение только после фиксации пачки, в которую попал показатель
+        if self.metric_writer is not None:
+            await self.metric_writer.write(metric_row(metric))
+        self._record(METRIC_RECORDED, user_id, {"type": metric_type, "value": value, "notes": notes}, metric.timestamp)
 
-        self.health_metrics[user_id].append(metric)
+        self._user_metrics(user_id, create=True).append(metric)
+        rollups = self.metric_rollups.get(user_id)
+        if rollups is not None:
+            rollups.add(metric_type, value, metric.timestamp)
+        if self.anomaly_detector is not None:
+            self.anomaly_detector.observe(user_id, metric_type, value, metric.timestamp)
         return metric
 
+    def _user_metrics(self, user_id: int, create: bool = False) -> Optional[List[HealthMetric]]:
+        rows = self.restored_metrics.pop(user_id, None)
+        if rows is not None:
+            self.health_metrics[user_id] = [self._restored_metric(user_id, *row) for row in rows]
+        elif create and user_id not in self.health_metrics:
+            self.health_metrics[user_id] = []
+        return self.health_metrics.get(user_id)
+
     async def get_user_metrics(self, user_id: int, metric_type: str = None, limit: int = 10) -> List[HealthMetric]:
-        if user_id not in self.health_metrics:
-            return []
+        with tracer.start_span("health_service.get_user_metrics"):
+            metrics = self._user_metrics(user_id)
+            if metrics is None:
+                return []
+
+            if metric_type:
+                metrics = [m for m in metrics if m.metric_type == metric_type]
+
+            return sorted(metrics, key=lambda x: x.timestamp, reverse=True)[:limit]
 
-        metrics = self.health_metrics[user_id]
+    def _user_rollups(self, user_id: int) -> MetricRollups:
+        rollups = self.metric_rollups.get(user_id)
+        if rollups is None:
+            rollups = self.metric_rollups[user_id] = MetricRollups()
+            for metric in self._user_metrics(user_id) or []:
+                rollups.add(metric.metric_type, metric.value, metric.timestamp)
+        return rollups
 
-        if metric_type:
-            metrics = [m for m in metrics if m.metric_type == metric_type]
+    async def get_metric_series(self, user_id: int, metric_type: str, component: str = "value",
+                                start: datetime = None, end: datetime = None,
+                                resolution: timedelta = DAY) -> List[Dict[str, Any]]:
+        """
+        Ряд значений для графиков по агрегатам, а не по сырым показателям.
 
-        return sorted(metrics, key=lambda x: x.timestamp, reverse=True)[:limit]
+        Args:
+            component: числовое поле показателя (value, systolic, diastolic)
+            resolution: желаемый шаг; берется самый крупный уровень агрегации
+                (час, день, неделя), не превышающий его
+
+        Returns:
+            List[Dict[str, Any]]: точки {start, count, min, max, mean} по возрастанию времени
+        """
+        with tracer.start_span("health_service.get_metric_series"):
+            return self._user_rollups(user_id).query(metric_type, component, start, end, resolution)
+
+    async def get_metric_stats(self, user_id: int, days: int = 30) -> Dict[str, Dict[str, Any]]:
+        """Сводка {count, min, max, mean} по каждому типу и полю за последние days дней"""
+        end = datetime.now()
+        start = end - timedelta(days=days - 1)
+        rollups = self._user_rollups(user_id)
+        stats = {}
+        for metric_type, component in rollups.components():
+            summary = rollups.summary(metric_type, component, start, None)
+            if summary:
+                stats.setdefault(metric_type, {})[component] = summary
+        return stats
 
     async def add_medical_condition(self, user_id: int, condition_data: Dict[str, Any]) -> Optional[UserProfile]:
         profile = await self.get_user_profile(user_id)
@@ -68,16 +331,19 @@ class HealthService:
         condition = MedicalCondition(**condition_data)
         profile.conditions.append(condition)
         profile.updated_at = datetime.now()
+        self._record(CONDITION_ADDED, user_id, condition.model_dump(mode="json"), profile.updated_at)
+        await self._save_profile(profile)
 
         return profile
 
     async def get_health_summary(self, user_id: int) -> Dict[str, Any]:
-        profile = await self.get_user_profile(user_id)
+        profile, metrics = await asyncio.gather(
+            self.get_user_profile(user_id),
+            self.get_user_metrics(user_id, limit=5)
+        )
         if not profile:
             return {"error": "Profile not found"}
 
-        metrics = await self.get_user_metrics(user_id, limit=5)
-
         return {
             "profile": profile,
             "recent_metrics": metrics,
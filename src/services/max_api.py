@@ -1,6 +1,74 @@
+import asyncio
 import httpx
 from typing import Optional, Dict, Any, List
 from config import settings
+from services.outbound import OutboundDispatcher
+from utils.metrics import MAX_API_LATENCY, MAX_API_ERRORS, normalize_endpoint
+from utils.tracing import tracer
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_dispatcher: Optional[OutboundDispatcher] = None
+_dispatcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Общий пул keep-alive соединений к MAX API.
+
+    Соединения привязаны к event loop, поэтому в другом цикле (тесты,
+    бенчмарки с asyncio.run) создается новый клиент.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=settings.max_api_timeout_s,
+            limits=httpx.Limits(
+                max_connections=settings.max_api_max_connections,
+                max_keepalive_connections=settings.max_api_max_connections
+            )
+        )
+        _client_loop = loop
+    return _client
+
+
+def get_outbound_dispatcher() -> Optional[OutboundDispatcher]:
+    """Диспетчер исходящих сообщений текущего event loop (None — отправка напрямую)"""
+    global _dispatcher, _dispatcher_loop
+    if not settings.outbound_dispatch_enabled:
+        return None
+    loop = asyncio.get_running_loop()
+    if _dispatcher is None or _dispatcher_loop is not loop:
+        _dispatcher = OutboundDispatcher(
+            rate=settings.outbound_rate_per_s,
+            burst=settings.outbound_burst,
+            workers=settings.outbound_workers,
+            queue_size=settings.outbound_queue_size,
+            priority_slo=settings.outbound_priority_slo_ms / 1000,
+            normal_slo=settings.outbound_normal_slo_ms / 1000
+        )
+        _dispatcher_loop = loop
+    return _dispatcher
+
+
+async def stop_outbound_dispatcher():
+    """Досылает очередь исходящих сообщений и останавливает обработчики"""
+    global _dispatcher, _dispatcher_loop
+    if _dispatcher is not None and _dispatcher_loop is asyncio.get_running_loop():
+        await _dispatcher.stop()
+    _dispatcher = None
+    _dispatcher_loop = None
+
+
+async def close_http_client():
+    """Досылает очередь исходящих сообщений и закрывает пул соединений"""
+    global _client, _client_loop
+    await stop_outbound_dispatcher()
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
 
 
 class MaxApiService:
@@ -10,34 +78,63 @@ class MaxApiService:
 
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         url = f"{self.base_url}{endpoint}"
-        params = kwargs.get('params', {})
+        params = kwargs.pop('params', {})
         params['access_token'] = self.token
+        endpoint_label = normalize_endpoint(endpoint)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method=method,
-                url=url,
-                params=params,
-                **kwargs
-            )
-            response.raise_for_status()
-            return response.json()
-
-    async def send_message(self, chat_id: int, text: str, attachments: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        span = tracer.start_span(
+            "max_api.request",
+            attributes={"http.method": method, "max_api.endpoint": endpoint_label}
+        )
+        with span, MAX_API_LATENCY.time(method, endpoint_label):
+            try:
+                response = await get_http_client().request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    **kwargs
+                )
+                span.set_attribute("http.status_code", response.status_code)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPStatusError as e:
+                MAX_API_ERRORS.inc(method, endpoint_label, str(e.response.status_code))
+                raise
+            except Exception as e:
+                MAX_API_ERRORS.inc(method, endpoint_label, type(e).__name__)
+                raise
+
+    async def send_message(self, chat_id: Optional[int], text: str, attachments: Optional[List[Dict]] = None,
+                           priority: bool = False, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Отправка в чат chat_id или, если передан user_id, в диалог с
+        пользователем (когда чат неизвестен, например для уведомлений).
+        priority=True — срочное сообщение в обход очереди и лимита частоты.
+        """
+        if (chat_id is None) == (user_id is None):
+            raise ValueError("Exactly one of chat_id and user_id is required")
+        recipient = {"chat_id": chat_id} if user_id is None else {"user_id": user_id}
         data = {
             "text": text,
             "attachments": attachments or [],
             "notify": True
         }
 
-        return await self._make_request(
-            "POST",
-            "/messages",
-            params={"chat_id": chat_id},
-            json=data
-        )
+        def send():
+            return self._make_request(
+                "POST",
+                "/messages",
+                params=dict(recipient),
+                json=data
+            )
 
-    async def send_message_with_keyboard(self, chat_id: int, text: str, buttons: List[List[Dict]]) -> Dict[str, Any]:
+        dispatcher = get_outbound_dispatcher()
+        if dispatcher is None:
+            return await send()
+        return await dispatcher.submit(send, priority)
+
+    async def send_message_with_keyboard(self, chat_id: int, text: str, buttons: List[List[Dict]],
+                                         priority: bool = False) -> Dict[str, Any]:
         attachments = [{
             "type": "inline_keyboard",
             "payload": {
@@ -45,7 +142,7 @@ class MaxApiService:
             }
         }]
 
-        return await self.send_message(chat_id, text, attachments)
+        return await self.send_message(chat_id, text, attachments, priority)
 
     async def edit_message(self, message_id: str, new_message: Dict[str, Any]) -> Dict[str, Any]:
         return await self._make_request(
@@ -92,5 +189,17 @@ class MaxApiService:
     async def delete_webhook(self, url: str) -> Dict[str, Any]:
         return await self._make_request("DELETE", "/subscriptions", params={"url": url})
 
+    async def get_updates(self, marker: Optional[int] = None, limit: int = 100, timeout: int = 30,
+                          types: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Long polling: ждет до timeout секунд, возвращает {"updates": [...], "marker": ...}"""
+        params: Dict[str, Any] = {"limit": limit, "timeout": timeout}
+        if marker is not None:
+            params["marker"] = marker
+        if types:
+            params["types"] = ",".join(types)
+
+        # HTTP-таймаут больше времени ожидания на стороне сервера
+        return await self._make_request("GET", "/updates", params=params, timeout=timeout + 10)
+
     async def get_my_info(self) -> Dict[str, Any]:
         return await self._make_request("GET", "/me")
\ No newline at end of file
@@ -0,0 +1,139 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Уровни агрегации от мелкого к крупному; границы — по локальному времени
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+WEEK = timedelta(weeks=1)
+RESOLUTIONS: Tuple[timedelta, ...] = (HOUR, DAY, WEEK)
+
+
+def bucket_start(timestamp: datetime, resolution: timedelta) -> datetime:
+    """Начало интервала агрегации (неделя начинается с понедельника)"""
+    if resolution == HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == DAY:
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+def pick_resolution(requested: timedelta) -> timedelta:
+    """Самый крупный уровень, не превышающий запрошенное разрешение"""
+    chosen = RESOLUTIONS[0]
+    for resolution in RESOLUTIONS:
+        if resolution <= requested:
+            chosen = resolution
+    return chosen
+
+
+class RollupBucket:
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "RollupBucket"):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "min": self.min, "max": self.max, "mean": round(self.mean, 2)}
+
+
+class _Series:
+    """Интервалы одного уровня: словарь по началу интервала и отсортированные ключи"""
+    __slots__ = ("buckets", "starts")
+
+    def __init__(self):
+        self.buckets: Dict[datetime, RollupBucket] = {}
+        self.starts: List[datetime] = []
+
+    def bucket(self, start: datetime) -> RollupBucket:
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            bucket = self.buckets[start] = RollupBucket()
+            # Показатели приходят почти по порядку: обычно это добавление в конец
+            if not self.starts or self.starts[-1] < start:
+                self.starts.append(start)
+            else:
+                insort(self.starts, start)
+        return bucket
+
+    def range(self, start: Optional[datetime], end: Optional[datetime]) -> List[Tuple[datetime, RollupBucket]]:
+        lo = bisect_left(self.starts, start) if start is not None else 0
+        hi = bisect_left(self.starts, end) if end is not None else len(self.starts)
+        return [(key, self.buckets[key]) for key in self.starts[lo:hi]]
+
+
+class MetricRollups:
+    """
+    Агрегаты показателей одного пользователя по часам, дням и неделям
+    (count, min, max, mean для каждого типа и числового поля — например,
+    pressure/systolic и pressure/diastolic). Обновляются при каждой записи.
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], Dict[timedelta, _Series]] = {}
+
+    def add(self, metric_type: str, value: Dict[str, Any], timestamp: datetime):
+        starts = [(resolution, bucket_start(timestamp, resolution)) for resolution in RESOLUTIONS]
+        for component, number in value.items():
+            if isinstance(number, bool) or not isinstance(number, (int, float)):
+                continue
+            levels = self._series.get((metric_type, component))
+            if levels is None:
+                levels = self._series[(metric_type, component)] = {resolution: _Series() for resolution in RESOLUTIONS}
+            for resolution, start in starts:
+                levels[resolution].bucket(start).add(number)
+
+    def components(self) -> List[Tuple[str, str]]:
+        return list(self._series)
+
+    def query(self, metric_type: str, component: str = "value", start: Optional[datetime] = None,
+              end: Optional[datetime] = None, resolution: timedelta = DAY) -> List[Dict[str, Any]]:
+        """
+        Точки ряда за [start, end) на самом крупном уровне, не превышающем resolution.
+
+        Интервалы выравниваются по своим границам: первый интервал начинается
+        с начала часа/дня/недели, в которые попадает start.
+        """
+        levels = self._series.get((metric_type, component))
+        if levels is None:
+            return []
+        level = pick_resolution(resolution)
+        aligned_start = bucket_start(start, level) if start is not None else None
+        return [
+            {"start": key, **bucket.to_dict()}
+            for key, bucket in levels[level].range(aligned_start, end)
+        ]
+
+    def summary(self, metric_type: str, component: str = "value", start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """Сводка за период по дневным интервалам; None — нет данных"""
+        levels = self._series.get((metric_type, component))
+        if levels is None:
+            return None
+        total = RollupBucket()
+        aligned_start = bucket_start(start, DAY) if start is not None else None
+        for _, bucket in levels[DAY].range(aligned_start, end):
+            total.merge(bucket)
+        return total.to_dict() if total.count else None
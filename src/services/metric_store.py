@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from models.health_models import HealthMetric
+from utils.metrics import METRIC_COMMIT_BATCH, METRIC_COMMIT_LATENCY
+
+logger = logging.getLogger(__name__)
+
+MetricRow = Tuple[int, str, str, float, Optional[str]]
+
+
+def sqlite_path(database_url: str) -> str:
+    """
+    sqlite:///./health_compass.db -> ./health_compass.db
+
+    Raises:
+        ValueError: URL не указывает на SQLite
+    """
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix):
+        raise ValueError(f"Only sqlite URLs are supported for the metric store: {database_url}")
+    return database_url[len(prefix):]
+
+
+def metric_row(metric: HealthMetric) -> MetricRow:
+    return (metric.user_id, metric.metric_type, json.dumps(metric.value, ensure_ascii=False),
+            metric.timestamp.timestamp(), metric.notes)
+
+
+class SqliteMetricStore:
+    """
+    Хранилище показателей в SQLite (WAL, synchronous=FULL: зафиксированная
+    транзакция переживает отключение питания).
+
+    Методы синхронные и вызываются через asyncio.to_thread; соединение одно,
+    доступ к нему сериализуется блокировкой.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.commits = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS health_metrics ("
+            "user_id INTEGER NOT NULL, metric_type TEXT NOT NULL, value TEXT NOT NULL, "
+            "timestamp REAL NOT NULL, notes TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_health_metrics_user ON health_metrics (user_id, timestamp)"
+        )
+
+    def insert_many(self, rows: List[MetricRow]):
+        """Вставка пачки строк одной транзакцией"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT INTO health_metrics VALUES (?, ?, ?, ?, ?)", rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self.commits += 1
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM health_metrics").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class GroupCommitWriter:
+    """
+    Групповая фиксация вставок.
+
+    Строки копятся max_delay секунд или до max_batch штук и записываются
+    одной транзакцией; write возвращает управление только после фиксации
+    пачки. Фиксация одна в каждый момент: пока она идет, новые строки
+    собираются в следующую пачку, которая уходит сразу по ее завершении,
+    поэтому под нагрузкой пачки растут сами, а без нагрузки задержка
+    ограничена max_delay (0 — пачка из записей одного шага event loop).
+    """
+
+    def __init__(self, store: SqliteMetricStore, max_batch: int = 256, max_delay: float = 0.0,
+                 name: str = "metrics"):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.name = name
+        self.pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._commit_task: Optional[asyncio.Task] = None
+
+    async def write(self, row: Any):
+        """
+        Raises:
+            Exception: ошибка фиксации пачки, в которую попала строка
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((row, future))
+        if self._commit_task is None:
+            if len(self.pending) >= self.max_batch:
+                self._start_commit()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_commit)
+        await future
+
+    def _start_commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._commit_task is not None or not self.pending:
+            return
+        batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+        self._commit_task = asyncio.ensure_future(self._commit(batch))
+
+    async def _commit(self, batch: List[Tuple[Any, asyncio.Future]]):
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.store.insert_many, [row for row, _ in batch])
+        except Exception as e:
+            logger.error(f"❌ Failed to commit {len(batch)} {self.name} rows: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            METRIC_COMMIT_LATENCY.observe(time.perf_counter() - started, self.name)
+            METRIC_COMMIT_BATCH.observe(len(batch), self.name)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            self._commit_task = None
+            # Накопленное за время фиксации уходит следующей пачкой без ожидания
+            self._start_commit()
+
+    async def flush(self):
+        """Фиксация всего накопленного (при остановке)"""
+        self._start_commit()
+        while self._commit_task is not None:
+            await asyncio.gather(self._commit_task, return_exceptions=True)
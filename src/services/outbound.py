@@ -0,0 +1,169 @@
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from utils.metrics import OUTBOUND_LATENCY, OUTBOUND_SLO_MISSES, metrics
+
+T = TypeVar("T")
+
+NORMAL = "normal"
+PRIORITY = "priority"
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, запас до burst (rate <= 0 — без ограничения)"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def debit(self):
+        """Списание без ожидания: баланс может уйти в минус, и обычные отправки подождут"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= 1
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OutboundDispatcher:
+    """
+    Исходящие сообщения MAX API в две полосы.
+
+    Обычные отправки проходят через очередь, пул из workers отправителей и
+    общий ограничитель частоты. Приоритетные (срочные рекомендации,
+    критические показатели) отправляются сразу из вызывающей задачи: без
+    очереди и ожидания токена, токен только списывается, поэтому суммарная
+    частота остается в пределах лимита. Отправителей меньше, чем соединений
+    в пуле HTTP-клиента, так что приоритетной отправке всегда есть свободное
+    соединение.
+
+    Задержка от постановки до доставки и промахи мимо SLO считаются
+    отдельно по полосам. Отправка из очереди выполняется в контексте
+    (contextvars) вызывающего, поэтому спан запроса к API попадает в трейс
+    обновления, которое его отправило.
+    """
+
+    def __init__(self, rate: float = 30.0, burst: int = 30, workers: int = 16, queue_size: int = 10000,
+                 priority_slo: float = 0.5, normal_slo: float = 5.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.slo = {PRIORITY: priority_slo, NORMAL: normal_slo}
+        self.sent = {PRIORITY: 0, NORMAL: 0}
+        self.failed = {PRIORITY: 0, NORMAL: 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+        metrics.gauge(
+            "healthcompass_outbound_queue_depth",
+            "Outbound messages waiting in the normal lane",
+            lambda: self._queue.qsize() if self._queue is not None else 0
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        """Запуск отправителей в текущем event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.queue_size)
+        # Пустой контекст: отправители не удерживают спаны запроса, который их запустил
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"outbound-{n}", context=contextvars.Context())
+            for n in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Дожидается отправки очереди и останавливает отправителей"""
+        if not self.running:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, send: Callable[[], Awaitable[T]], priority: bool = False) -> T:
+        """
+        Отправка через полосу и ожидание ответа API.
+
+        Raises:
+            Exception: исключение, выброшенное send
+        """
+        enqueued_at = time.perf_counter()
+        if priority:
+            self.bucket.debit()
+            try:
+                result = await send()
+            except Exception:
+                self.failed[PRIORITY] += 1
+                raise
+            finally:
+                self._observe(PRIORITY, enqueued_at)
+            self.sent[PRIORITY] += 1
+            return result
+
+        if not self.running:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        context = contextvars.copy_context()
+        # При заполненной очереди put ждет: обратное давление на обработчики
+        await self._queue.put((send, context, future, enqueued_at))
+        return await future
+
+    async def _worker(self):
+        queue = self._queue
+        while True:
+            send, context, future, enqueued_at = await queue.get()
+            try:
+                await self.bucket.acquire()
+                result = await asyncio.create_task(send(), context=context)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                queue.task_done()
+                raise
+            except Exception as e:
+                self.failed[NORMAL] += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.sent[NORMAL] += 1
+                if not future.done():
+                    future.set_result(result)
+            self._observe(NORMAL, enqueued_at)
+            queue.task_done()
+
+    def _observe(self, lane: str, enqueued_at: float):
+        elapsed = time.perf_counter() - enqueued_at
+        OUTBOUND_LATENCY.observe(elapsed, lane)
+        if elapsed > self.slo[lane]:
+            OUTBOUND_SLO_MISSES.inc(lane)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "tokens": round(self.bucket.tokens, 2),
+            "sent": dict(self.sent),
+            "failed": dict(self.failed)
+        }
@@ -0,0 +1,443 @@
+"""
+Популяционная аналитика по журналу событий дневника здоровья (офлайн).
+
+Задание читает каталог EVENT_LOG_DIR, а не память работающего сервиса:
+профили собираются в компактные массивы numpy (по числу пользователей),
+а показатели обрабатываются частями — диапазонами строк снимка и
+сегментами журнала — в пуле процессов. Каждая часть сводится векторно в
+частичные суммы, которые затем объединяются, поэтому память на показатели
+ограничена размером части и не зависит от их общего числа.
+
+Таблицы:
+    hypertension_prevalence  распространенность гипертонии по возрасту и полу
+                             (диагноз или среднее давление >= 140/90)
+    obesity_weight_trend     средний вес по месяцам у пользователей с фактором
+                             риска obesity
+
+    cd src
+    python -m services.population_analytics --event-log ./events --out ./analytics --workers 4
+"""
+import argparse
+import csv
+import json
+import logging
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.event_log import EventLog, decode_event, scan_records
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только этому офлайн-заданию
+    np = None
+
+logger = logging.getLogger(__name__)
+
+AGE_BAND_EDGES = (18, 30, 40, 50, 60, 70)
+AGE_BAND_LABELS = ("<18", "18-29", "30-39", "40-49", "50-59", "60-69", "70+")
+GENDERS = ("male", "female")
+HYPERTENSION_CONDITION = "hypertension"
+OBESITY_RISK = "obesity"
+SYSTOLIC_HIGH = 140
+DIASTOLIC_HIGH = 90
+
+_METRIC_PREFIX = b'["metric_recorded"'
+_SNAPSHOT_METRICS_PREFIX = b'{"m"'
+
+
+# -------------------------------
+# Профили
+# -------------------------------
+class ProfileTable:
+    """Профили в виде массивов, отсортированных по user_id"""
+
+    def __init__(self, user_ids, age, gender, obese, diagnosed):
+        self.user_ids = user_ids
+        self.age = age
+        self.gender = gender
+        self.obese = obese
+        self.diagnosed = diagnosed
+        self.age_band = np.digitize(age, AGE_BAND_EDGES).astype(np.int8)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def lookup(self, user_ids) -> Tuple[Any, Any]:
+        """Индексы пользователей в таблице и маска найденных"""
+        if not len(self.user_ids):
+            return np.zeros(len(user_ids), dtype=np.int64), np.zeros(len(user_ids), dtype=bool)
+        index = np.searchsorted(self.user_ids, user_ids)
+        index[index >= len(self.user_ids)] = 0
+        return index, self.user_ids[index] == user_ids
+
+
+def _profile_row(data: Dict[str, Any]) -> List[Any]:
+    return [
+        data["age"],
+        GENDERS.index(data["gender"]),
+        OBESITY_RISK in data.get("risk_factors", []),
+        any(c["condition_id"] == HYPERTENSION_CONDITION for c in data.get("conditions", []))
+    ]
+
+
+def _open_log(log_dir: str) -> EventLog:
+    # EventLog создает каталог: опечатка в пути дала бы пустую популяцию вместо ошибки
+    if not os.path.isdir(log_dir):
+        raise FileNotFoundError(f"Event log directory not found: {log_dir}")
+    return EventLog(log_dir)
+
+
+def _latest_snapshot(log: EventLog) -> Tuple[int, Optional[str]]:
+    snapshots = log.snapshots()
+    if not snapshots:
+        return 0, None
+    seq, path = snapshots[-1]
+    return seq, path
+
+
+def load_profiles(log_dir: str) -> ProfileTable:
+    """Профили из последнего снимка и событий профиля после него"""
+    log = _open_log(log_dir)
+    snapshot_seq, snapshot_path = _latest_snapshot(log)
+    rows: Dict[int, List[Any]] = {}
+
+    if snapshot_path:
+        with open(snapshot_path, "rb") as f:
+            f.readline()
+            for line in f:
+                if line.startswith(_SNAPSHOT_METRICS_PREFIX):
+                    continue
+                profile = json.loads(line)["p"]
+                rows[profile["user_id"]] = _profile_row(profile)
+
+    for _, path in log.segments():
+        if not os.path.getsize(path):
+            continue
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for seq, payload, _ in scan_records(data):
+                # Показатели — основная масса событий: пропускаются без разбора JSON
+                if seq <= snapshot_seq or payload.startswith(_METRIC_PREFIX):
+                    continue
+                event_type, user_id, _, event_data = decode_event(payload)
+                if event_type == "profile_created":
+                    rows[user_id] = _profile_row(event_data)
+                    continue
+                row = rows.get(user_id)
+                if row is None:
+                    continue
+                if event_type == "profile_updated":
+                    if "age" in event_data:
+                        row[0] = event_data["age"]
+                    if "gender" in event_data:
+                        row[1] = GENDERS.index(event_data["gender"])
+                    if "risk_factors" in event_data:
+                        row[2] = OBESITY_RISK in event_data["risk_factors"]
+                    if "conditions" in event_data:
+                        row[3] = any(c["condition_id"] == HYPERTENSION_CONDITION for c in event_data["conditions"])
+                elif event_type == "condition_added" and event_data["condition_id"] == HYPERTENSION_CONDITION:
+                    row[3] = True
+
+    user_ids = np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+    ordered = [rows[user_id] for user_id in user_ids.tolist()]
+    return ProfileTable(
+        user_ids,
+        np.fromiter((row[0] for row in ordered), dtype=np.int16, count=len(ordered)),
+        np.fromiter((row[1] for row in ordered), dtype=np.int8, count=len(ordered)),
+        np.fromiter((row[2] for row in ordered), dtype=bool, count=len(ordered)),
+        np.fromiter((row[3] for row in ordered), dtype=bool, count=len(ordered))
+    )
+
+
+# -------------------------------
+# Части показателей
+# -------------------------------
+Unit = Tuple[str, str, int, int]
+
+
+def plan_units(log_dir: str, chunk_bytes: int = 16 * 1024 * 1024) -> List[Unit]:
+    """
+    Части для воркеров: ("snapshot", путь, начало, конец) — диапазоны байт
+    снимка (строка относится к части, в которой начинается) и
+    ("segment", путь, seq снимка, 0) — сегменты журнала целиком.
+    """
+    log = _open_log(log_dir)
+    snapshot_seq, snapshot_path = _latest_snapshot(log)
+    units: List[Unit] = []
+    if snapshot_path:
+        size = os.path.getsize(snapshot_path)
+        for start in range(0, size, chunk_bytes):
+            units.append(("snapshot", snapshot_path, start, min(size, start + chunk_bytes)))
+
+    segments = log.segments()
+    for i, (_, path) in enumerate(segments):
+        if i + 1 < len(segments) and segments[i + 1][0] <= snapshot_seq + 1:
+            continue
+        units.append(("segment", path, snapshot_seq, 0))
+    return units
+
+
+def _iter_snapshot_rows(path: str, start: int, end: int) -> Iterator[Tuple[int, str, Dict[str, Any], float]]:
+    with open(path, "rb") as f:
+        # Строка относится к части, в которой начинается: с начала файла
+        # пропускается заголовок снимка, иначе — хвост строки предыдущей части
+        f.seek(max(0, start - 1))
+        f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.startswith(_SNAPSHOT_METRICS_PREFIX):
+                continue
+            record = json.loads(line)
+            user_id = record["m"]
+            for metric_type, value, ts, _ in record["r"]:
+                yield user_id, metric_type, value, ts
+
+
+def _iter_segment_rows(path: str, snapshot_seq: int) -> Iterator[Tuple[int, str, Dict[str, Any], float]]:
+    if not os.path.getsize(path):
+        return
+    # mmap: страницы сегмента не копируются в память процесса целиком
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for seq, payload, _ in scan_records(data):
+            if seq <= snapshot_seq or not payload.startswith(_METRIC_PREFIX):
+                continue
+            _, user_id, ts, event_data = decode_event(payload)
+            yield user_id, event_data["type"], event_data["value"], ts
+
+
+_profiles: Optional[ProfileTable] = None
+
+
+def _init_worker(profiles: ProfileTable):
+    global _profiles
+    _profiles = profiles
+
+
+class CohortAccumulator:
+    """
+    Суммы давления по пользователям (плотные массивы по таблице профилей) и
+    суммы веса по (месяц, возрастная группа, пол) среди пользователей с ожирением.
+    """
+
+    def __init__(self, profiles: ProfileTable):
+        self.profiles = profiles
+        self.systolic = np.zeros(len(profiles))
+        self.diastolic = np.zeros(len(profiles))
+        self.pressure_count = np.zeros(len(profiles), dtype=np.int64)
+        self.weight: Dict[int, List[float]] = {}
+        self.readings = 0
+
+    def add_pressure(self, user_ids: List[int], systolic: List[float], diastolic: List[float]):
+        index, found = self.profiles.lookup(np.array(user_ids, dtype=np.int64))
+        index = index[found]
+        np.add.at(self.systolic, index, np.array(systolic, dtype=np.float64)[found])
+        np.add.at(self.diastolic, index, np.array(diastolic, dtype=np.float64)[found])
+        np.add.at(self.pressure_count, index, 1)
+
+    def add_weight(self, user_ids: List[int], weights: List[float], timestamps: List[float]):
+        profiles = self.profiles
+        index, found = profiles.lookup(np.array(user_ids, dtype=np.int64))
+        selected = found & profiles.obese[index]
+        index = index[selected]
+        months = np.array(timestamps, dtype=np.float64)[selected].astype("datetime64[s]").astype("datetime64[M]")
+        keys = (months.astype(np.int64) * len(AGE_BAND_LABELS) + profiles.age_band[index]) * len(GENDERS) \
+            + profiles.gender[index]
+        cohort_keys, inverse = np.unique(keys, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.array(weights, dtype=np.float64)[selected],
+                             minlength=len(cohort_keys))
+        counts = np.bincount(inverse, minlength=len(cohort_keys))
+        self._merge_weight(cohort_keys.tolist(), totals.tolist(), counts.tolist())
+
+    def _merge_weight(self, keys: List[int], totals: List[float], counts: List[int]):
+        for key, total, count in zip(keys, totals, counts):
+            entry = self.weight.setdefault(key, [0.0, 0])
+            entry[0] += total
+            entry[1] += count
+
+    def partial(self) -> Dict[str, Any]:
+        """Ненулевые суммы для передачи из воркера"""
+        users = np.flatnonzero(self.pressure_count)
+        return {
+            "readings": self.readings,
+            "pressure": (users, self.systolic[users], self.diastolic[users], self.pressure_count[users]),
+            "weight": self.weight
+        }
+
+    def merge(self, partial: Dict[str, Any]):
+        self.readings += partial["readings"]
+        users, systolic, diastolic, counts = partial["pressure"]
+        self.systolic[users] += systolic
+        self.diastolic[users] += diastolic
+        self.pressure_count[users] += counts
+        weight = partial["weight"]
+        self._merge_weight(list(weight), [entry[0] for entry in weight.values()],
+                           [entry[1] for entry in weight.values()])
+
+
+def aggregate_unit(unit: Unit, profiles: Optional[ProfileTable] = None,
+                   batch_rows: int = 65536) -> Dict[str, Any]:
+    """
+    Частичные агрегаты одной части. Строки сводятся пачками по batch_rows,
+    поэтому память воркера не зависит от размера сегмента.
+    """
+    accumulator = CohortAccumulator(profiles or _profiles)
+    kind, path, a, b = unit
+    rows = _iter_snapshot_rows(path, a, b) if kind == "snapshot" else _iter_segment_rows(path, a)
+
+    pressure: Tuple[List[int], List[float], List[float]] = ([], [], [])
+    weight: Tuple[List[int], List[float], List[float]] = ([], [], [])
+    for user_id, metric_type, value, ts in rows:
+        if metric_type == "pressure":
+            pressure[0].append(user_id)
+            pressure[1].append(value["systolic"])
+            pressure[2].append(value["diastolic"])
+            if len(pressure[0]) >= batch_rows:
+                accumulator.add_pressure(*pressure)
+                accumulator.readings += len(pressure[0])
+                pressure = ([], [], [])
+        elif metric_type == "weight":
+            weight[0].append(user_id)
+            weight[1].append(value["value"])
+            weight[2].append(ts)
+            if len(weight[0]) >= batch_rows:
+                accumulator.add_weight(*weight)
+                accumulator.readings += len(weight[0])
+                weight = ([], [], [])
+
+    accumulator.add_pressure(*pressure)
+    accumulator.add_weight(*weight)
+    accumulator.readings += len(pressure[0]) + len(weight[0])
+    return accumulator.partial()
+
+
+# -------------------------------
+# Сборка таблиц
+# -------------------------------
+def run_analytics(log_dir: str, workers: int = 0, chunk_bytes: int = 16 * 1024 * 1024) -> Dict[str, Dict[str, list]]:
+    """
+    Args:
+        workers: число процессов (0 — по числу ядер, 1 — в текущем процессе)
+
+    Returns:
+        Dict[str, Dict[str, list]]: таблицы в виде колонок
+
+    Raises:
+        RuntimeError: не установлен numpy
+        FileNotFoundError: каталога журнала нет
+    """
+    if np is None:
+        raise RuntimeError("Population analytics requires the 'numpy' package")
+
+    started = time.perf_counter()
+    profiles = load_profiles(log_dir)
+    units = plan_units(log_dir, chunk_bytes)
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"📊 Analytics: {len(profiles)} profiles, {len(units)} units, {workers} workers")
+
+    totals = CohortAccumulator(profiles)
+    if workers == 1:
+        for unit in units:
+            totals.merge(aggregate_unit(unit, profiles))
+    else:
+        # Таблица профилей передается воркерам один раз при старте
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(profiles,)) as pool:
+            for partial in pool.map(aggregate_unit, units):
+                totals.merge(partial)
+
+    tables = {
+        "hypertension_prevalence": _prevalence_table(
+            profiles, totals.systolic, totals.diastolic, totals.pressure_count
+        ),
+        "obesity_weight_trend": _weight_trend_table(totals.weight)
+    }
+    logger.info(f"✅ Analytics done: {totals.readings} readings in {time.perf_counter() - started:.2f}s")
+    return tables
+
+
+def _prevalence_table(profiles: ProfileTable, systolic_sum, diastolic_sum, pressure_count) -> Dict[str, list]:
+    with_readings = pressure_count > 0
+    safe_count = np.maximum(pressure_count, 1)
+    measured_high = with_readings & (
+        (systolic_sum / safe_count >= SYSTOLIC_HIGH) | (diastolic_sum / safe_count >= DIASTOLIC_HIGH)
+    )
+    hypertensive = profiles.diagnosed | measured_high
+
+    cohort = profiles.age_band.astype(np.int64) * len(GENDERS) + profiles.gender
+    size = len(AGE_BAND_LABELS) * len(GENDERS)
+    users = np.bincount(cohort, minlength=size)
+    columns = {
+        "users": users,
+        "with_readings": np.bincount(cohort, weights=with_readings, minlength=size).astype(np.int64),
+        "diagnosed": np.bincount(cohort, weights=profiles.diagnosed, minlength=size).astype(np.int64),
+        "measured_high": np.bincount(cohort, weights=measured_high, minlength=size).astype(np.int64),
+        "hypertensive": np.bincount(cohort, weights=hypertensive, minlength=size).astype(np.int64)
+    }
+
+    table: Dict[str, list] = {"age_band": [], "gender": [], **{name: [] for name in columns}, "prevalence_pct": []}
+    for key in np.flatnonzero(users).tolist():
+        table["age_band"].append(AGE_BAND_LABELS[key // len(GENDERS)])
+        table["gender"].append(GENDERS[key % len(GENDERS)])
+        for name, column in columns.items():
+            table[name].append(int(column[key]))
+        table["prevalence_pct"].append(round(100 * columns["hypertensive"][key] / users[key], 2))
+    return table
+
+
+def _weight_trend_table(weight_totals: Dict[int, List[float]]) -> Dict[str, list]:
+    table: Dict[str, list] = {"month": [], "age_band": [], "gender": [], "readings": [], "mean_weight": []}
+    for key in sorted(weight_totals):
+        total, count = weight_totals[key]
+        month, rest = divmod(key, len(AGE_BAND_LABELS) * len(GENDERS))
+        band, gender = divmod(rest, len(GENDERS))
+        table["month"].append(str(np.datetime64(month, "M")))
+        table["age_band"].append(AGE_BAND_LABELS[band])
+        table["gender"].append(GENDERS[gender])
+        table["readings"].append(count)
+        table["mean_weight"].append(round(total / count, 2))
+    return table
+
+
+def write_tables(tables: Dict[str, Dict[str, list]], out_dir: str, fmt: str = "csv") -> List[str]:
+    """Запись таблиц в CSV или Parquet (требуется pyarrow)"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name, columns in tables.items():
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table(columns), path)
+        else:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(zip(*columns.values()))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Population-level cohort statistics from the health diary log")
+    parser.add_argument("--event-log", required=True, help="Каталог журнала событий (EVENT_LOG_DIR)")
+    parser.add_argument("--out", required=True, help="Каталог для таблиц")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--workers", type=int, default=0, help="Процессов (0 — по числу ядер)")
+    parser.add_argument("--chunk-mb", type=int, default=16, help="Размер части снимка, МБ")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        tables = run_analytics(args.event_log, args.workers, args.chunk_mb * 1024 * 1024)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    for path in write_tables(tables, args.out, args.format):
+        print(f"Table written: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.health_models import UserProfile
+from utils.metrics import CACHE_REQUESTS
+
+
+class InvalidationBus:
+    """
+    Pub/sub для инвалидации кэшей между воркерами.
+
+    Локальная заглушка: подписчики в одном процессе получают сообщения
+    синхронно. В продакшене заменяется на Redis/NATS с тем же интерфейсом.
+
+    Методы объектов хранятся по слабой ссылке: подписка не удерживает кэш
+    в памяти и снимается, когда объект собран сборщиком мусора.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Tuple[str, Callable[[], Optional[Callable[[int], None]]]]] = []
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, subscriber_id: str, callback: Callable[[int], None]):
+        if hasattr(callback, "__self__"):
+            ref = weakref.WeakMethod(callback, lambda _: self.unsubscribe(subscriber_id))
+        else:
+            ref = lambda: callback
+        self._subscribers.append((subscriber_id, ref))
+
+    def unsubscribe(self, subscriber_id: str):
+        self._subscribers = [(sid, ref) for sid, ref in self._subscribers if sid != subscriber_id]
+
+    def publish(self, user_id: int, origin: str):
+        for subscriber_id, ref in list(self._subscribers):
+            callback = ref()
+            if callback is not None and subscriber_id != origin:
+                callback(user_id)
+
+
+# Общая шина процесса: все экземпляры HealthService инвалидируют кэши друг друга
+profile_invalidation_bus = InvalidationBus()
+
+
+class ProfileCache:
+    """Ограниченный LRU-кэш профилей с TTL"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, name: str = "profile",
+                 bus: Optional[InvalidationBus] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.name = name
+        self.cache_id = uuid.uuid4().hex
+        self.bus = bus
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, UserProfile]]" = OrderedDict()
+
+        if bus is not None:
+            bus.subscribe(self.cache_id, self._on_remote_invalidation)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[UserProfile]:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, profile = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                CACHE_REQUESTS.inc(self.name, "hit")
+                return profile
+            del self._entries[user_id]
+
+        self.misses += 1
+        CACHE_REQUESTS.inc(self.name, "miss")
+        return None
+
+    def put(self, profile: UserProfile):
+        self._entries[profile.user_id] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(profile.user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int, broadcast: bool = True):
+        """Удаляет профиль из кэша и (по умолчанию) оповещает остальные воркеры"""
+        self._entries.pop(user_id, None)
+        if broadcast and self.bus is not None:
+            self.bus.publish(user_id, origin=self.cache_id)
+
+    def clear(self):
+        self._entries.clear()
+
+    def close(self):
+        if self.bus is not None:
+            self.bus.unsubscribe(self.cache_id)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def _on_remote_invalidation(self, user_id: int):
+        self._entries.pop(user_id, None)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from models.health_models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Предельная пауза между повторами неудавшегося сброса
+MAX_RETRY_DELAY_S = 5.0
+
+
+class InMemoryProfileStore:
+    """
+    Хранилище профилей в памяти (заглушка БД).
+
+    Как и настоящая БД, хранит и отдает копии, поэтому изменения
+    профиля видны другим только после сохранения.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[int, UserProfile] = {}
+        self.reads = 0
+        self.writes = 0
+
+    async def get(self, user_id: int) -> Optional[UserProfile]:
+        self.reads += 1
+        profile = self.profiles.get(user_id)
+        return profile.model_copy(deep=True) if profile else None
+
+    async def save_many(self, profiles: List[UserProfile]):
+        """Сохранение пачки профилей одной транзакцией"""
+        self.writes += 1
+        for profile in profiles:
+            self.profiles[profile.user_id] = profile.model_copy(deep=True)
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись профилей пачками.
+
+    Изменения одного пользователя схлопываются, сброс выполняется по
+    размеру пачки или по таймеру. До сброса профиль читается из буфера.
+    """
+
+    def __init__(self, store: InMemoryProfileStore, max_batch: int = 100, flush_interval: float = 0.05,
+                 on_flush: Optional[Callable[[List[int]], None]] = None):
+        self.store = store
+        # Вызывается с user_id сброшенных профилей (для повторной инвалидации кэшей)
+        self.on_flush = on_flush
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.pending: Dict[int, UserProfile] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._retry_delay = flush_interval
+
+    def get(self, user_id: int) -> Optional[UserProfile]:
+        return self.pending.get(user_id)
+
+    async def add(self, profile: UserProfile):
+        self.pending[profile.user_id] = profile
+        if len(self.pending) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.flush_interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._timer = None
+        self._flush_task = asyncio.ensure_future(self._flush_in_background())
+
+    async def _flush_in_background(self):
+        try:
+            await self.flush()
+        except Exception:
+            # Уже залогировано; профили остались в буфере, повтор с растущей паузой
+            self._retry_delay = min(self._retry_delay * 2, MAX_RETRY_DELAY_S)
+            if self.pending and self._timer is None:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(self._retry_delay, self._schedule_flush)
+        else:
+            self._retry_delay = self.flush_interval
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        try:
+            await self.store.save_many(list(batch.values()))
+        except Exception as e:
+            logger.error(f"❌ Failed to flush {len(batch)} profiles: {e}")
+            # Возвращаем в буфер, не затирая более свежие изменения
+            for user_id, profile in batch.items():
+                self.pending.setdefault(user_id, profile)
+            raise
+
+        if self.on_flush:
+            self.on_flush(list(batch))
@@ -1,88 +1,196 @@
+import json
+import logging
+import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from config import settings
 from models.health_models import UserProfile, ScreeningRecommendation, Gender, RiskFactor
+from services.catalog import get_reference_catalog
+from utils.tracing import tracer
 
+logger = logging.getLogger(__name__)
 
-class ScreeningService:
-    def __init__(self):
-        self.recommendations = self._load_recommendations()
-
-    def _load_recommendations(self) -> List[ScreeningRecommendation]:
-        return [
-            ScreeningRecommendation(
-                id="blood_pressure",
-                name="Измерение артериального давления",
-                description="Контроль артериального давления",
-                frequency_years=1,
-                start_age=18
-            ),
-            ScreeningRecommendation(
-                id="blood_sugar_40",
-                name="Анализ крови на сахар",
-                description="Контроль уровня глюкозы для выявления диабета",
-                frequency_years=3,
-                start_age=40,
-                risk_factors_required=[RiskFactor.OBESITY, RiskFactor.FAMILY_HISTORY]
-            ),
-            ScreeningRecommendation(
-                id="cholesterol_35",
-                name="Анализ на холестерин",
-                description="Контроль липидного профиля",
-                frequency_years=5,
-                start_age=35
-            ),
-            ScreeningRecommendation(
-                id="psa_men_45",
-                name="Анализ ПСА",
-                description="Скрининг рака простаты",
-                frequency_years=2,
-                start_age=45,
-                gender_specific=Gender.MALE
-            ),
-            ScreeningRecommendation(
-                id="mammography_40",
-                name="Маммография",
-                description="Скрининг рака молочной железы",
-                frequency_years=2,
-                start_age=40,
-                gender_specific=Gender.FEMALE
-            ),
-            ScreeningRecommendation(
-                id="ct_lungs_smokers",
-                name="Низкодозовая КТ легких",
-                description="Скрининг рака легких для курильщиков",
-                frequency_years=1,
-                start_age=40,
-                risk_factors_required=[RiskFactor.SMOKING]
-            ),
-            ScreeningRecommendation(
-                id="colonoscopy_50",
-                name="Колоноскопия",
-                description="Скрининг рака толстой кишки",
-                frequency_years=10,
-                start_age=50
-            )
+# Каталог по умолчанию поставляется вместе с кодом
+BUNDLED_CATALOGUE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "screening_catalogue.json"
+)
+
+# Все, от чего зависит календарь: пол, возраст, факторы риска, заболевания
+Cohort = Tuple[Optional[Gender], int, FrozenSet[RiskFactor], FrozenSet[str]]
+
+
+def cohort_key(profile: UserProfile) -> Cohort:
+    return (
+        profile.gender,
+        profile.age,
+        frozenset(profile.risk_factors),
+        frozenset(cond.condition_id for cond in profile.conditions)
+    )
+
+
+def rule_applies(rec: ScreeningRecommendation, cohort: Cohort) -> bool:
+    gender, age, risk_factors, conditions = cohort
+    if age < rec.start_age or (rec.end_age and age > rec.end_age):
+        return False
+    if rec.gender_specific and rec.gender_specific != gender:
+        return False
+    if rec.risk_factors_required and risk_factors.isdisjoint(rec.risk_factors_required):
+        return False
+    if rec.conditions_required and conditions.isdisjoint(rec.conditions_required):
+        return False
+    return True
+
+
+class ScreeningCatalogue:
+    """Версия каталога правил обследований и ее источник (файл или mmap-каталог)"""
+
+    def __init__(self, version: Any, rules: List[ScreeningRecommendation], path: Optional[str] = None,
+                 mtime: Optional[float] = None):
+        self.version = version
+        self.rules = rules
+        self.path = path
+        self.mtime = mtime
+        self.by_id = {rec.id: rec for rec in rules}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ScreeningCatalogue":
+        """
+        Raises:
+            OSError: файл недоступен
+            ValueError: некорректный JSON, нет версии или правила не проходят валидацию
+        """
+        mtime = os.stat(path).st_mtime
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if "version" not in data:
+            raise ValueError(f"Screening catalogue {path} has no version")
+        rules = [ScreeningRecommendation(**rule) for rule in data.get("rules", [])]
+        if len({rec.id for rec in rules}) != len(rules):
+            raise ValueError(f"Duplicate rule ids in screening catalogue {path}")
+        return cls(data["version"], rules, path, mtime)
+
+
+class CatalogueDiff(NamedTuple):
+    old_version: Any
+    new_version: Any
+    added: List[ScreeningRecommendation]
+    removed: List[ScreeningRecommendation]
+    # (старая, новая) версии правила
+    changed: List[Tuple[ScreeningRecommendation, ScreeningRecommendation]]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def touched_rules(self) -> List[ScreeningRecommendation]:
+        """Все версии правил, чья аудитория могла получить другой календарь"""
+        rules = self.added + self.removed
+        for old, new in self.changed:
+            rules.extend((old, new))
+        return rules
+
+    def affects(self, cohort: Cohort) -> bool:
+        return any(rule_applies(rec, cohort) for rec in self.touched_rules())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "old_version": self.old_version,
+            "new_version": self.new_version,
+            "added": [rec.id for rec in self.added],
+            "removed": [rec.id for rec in self.removed],
+            "changed": [new.id for _, new in self.changed]
+        }
+
+
+def diff_catalogues(old: ScreeningCatalogue, new: ScreeningCatalogue) -> CatalogueDiff:
+    return CatalogueDiff(
+        old.version,
+        new.version,
+        added=[rec for rule_id, rec in new.by_id.items() if rule_id not in old.by_id],
+        removed=[rec for rule_id, rec in old.by_id.items() if rule_id not in new.by_id],
+        changed=[
+            (old.by_id[rule_id], rec) for rule_id, rec in new.by_id.items()
+            if rule_id in old.by_id and old.by_id[rule_id] != rec
         ]
+    )
+
+
+_catalogue: Optional[ScreeningCatalogue] = None
+
+
+def _load_catalogue() -> ScreeningCatalogue:
+    if settings.screening_catalogue_path:
+        return ScreeningCatalogue.from_file(settings.screening_catalogue_path)
+    catalog = get_reference_catalog()
+    if catalog is not None and "screening" in catalog:
+        version = catalog.json("screening.v") if "screening.v" in catalog else None
+        return ScreeningCatalogue(version, [ScreeningRecommendation(**rec) for rec in catalog.records("screening").values()])
+    return ScreeningCatalogue.from_file(BUNDLED_CATALOGUE_PATH)
+
+
+def get_screening_catalogue() -> ScreeningCatalogue:
+    """Текущая версия каталога, общая для всех экземпляров ScreeningService процесса"""
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = _load_catalogue()
+        logger.info(f"✅ Screening catalogue v{_catalogue.version} loaded: {len(_catalogue.rules)} rules")
+    return _catalogue
+
+
+def reload_screening_catalogue(force: bool = False) -> Optional[CatalogueDiff]:
+    """
+    Перечитывает файл каталога, если он изменился (force — без проверки mtime).
+
+    Returns:
+        Optional[CatalogueDiff]: изменения или None, если каталог прежний
+
+    Raises:
+        OSError, ValueError: файл недоступен или некорректен; действует прежняя версия
+    """
+    global _catalogue
+    current = get_screening_catalogue()
+    if current.path is None:
+        # Каталог из mmap-файла меняется только пересборкой и перезапуском
+        return None
+    mtime = os.stat(current.path).st_mtime
+    if not force and mtime == current.mtime:
+        return None
+    # Некорректный файл сообщается один раз и перечитывается после следующего изменения
+    current.mtime = mtime
+
+    new = ScreeningCatalogue.from_file(current.path)
+    diff = diff_catalogues(current, new)
+    if diff.empty:
+        return None
+    if new.version == current.version:
+        raise ValueError(f"Screening catalogue rules changed without a version bump (v{new.version})")
+    _catalogue = new
+    logger.info(
+        f"🔄 Screening catalogue v{current.version} -> v{new.version}: +{len(diff.added)} "
+        f"-{len(diff.removed)} ~{len(diff.changed)} rules"
+    )
+    return diff
+
+
+class ScreeningService:
+    @property
+    def catalogue(self) -> ScreeningCatalogue:
+        # Каталог загружается при первом обращении, а не при создании сервиса
+        return get_screening_catalogue()
+
+    @property
+    def recommendations(self) -> List[ScreeningRecommendation]:
+        return self.catalogue.rules
 
     def get_personalized_schedule(self, profile: UserProfile) -> List[Dict[str, Any]]:
+        return self.schedule_for_cohort(cohort_key(profile))
+
+    def schedule_for_cohort(self, cohort: Cohort) -> List[Dict[str, Any]]:
         schedule = []
         current_year = datetime.now().year
 
         for rec in self.recommendations:
-            if profile.age < rec.start_age or (rec.end_age and profile.age > rec.end_age):
-                continue
-
-            if rec.gender_specific and rec.gender_specific != profile.gender:
-                continue
-
-            if rec.risk_factors_required and not any(
-                    factor in profile.risk_factors for factor in rec.risk_factors_required
-            ):
-                continue
-
-            if rec.conditions_required and not any(
-                    cond.condition_id in rec.conditions_required for cond in profile.conditions
-            ):
+            if not rule_applies(rec, cohort):
                 continue
 
             schedule.append({
@@ -94,8 +202,14 @@ class ScreeningService:
         return sorted(schedule, key=lambda x: x["priority"])
 
     def format_schedule_message(self, profile: UserProfile) -> str:
-        schedule = self.get_personalized_schedule(profile)
+        with tracer.start_span("screening_service.format_schedule"):
+            return self._format_schedule_message(profile)
+
+    def _format_schedule_message(self, profile: UserProfile) -> str:
+        return self.format_schedule(self.get_personalized_schedule(profile))
 
+    def format_schedule(self, schedule: List[Dict[str, Any]]) -> str:
+        """Текст сообщения по уже рассчитанному календарю"""
         if not schedule:
             return "🎉 Отлично! По вашим данным все плановые обследования пройдены."
 
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from models.health_models import UserProfile
+from services.profile_cache import InvalidationBus
+from services.screening_service import CatalogueDiff, Cohort, cohort_key
+from utils.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class ScreeningView:
+    """Календарь обследований пользователя по версии профиля (updated_at) и версии каталога"""
+    __slots__ = ("user_id", "profile_updated_at", "cohort", "catalogue_version", "schedule", "message",
+                 "computed_at")
+
+    def __init__(self, user_id: int, profile_updated_at: datetime, cohort: Cohort, catalogue_version: Any,
+                 schedule: List[Dict[str, Any]], message: str):
+        self.user_id = user_id
+        self.profile_updated_at = profile_updated_at
+        self.cohort = cohort
+        self.catalogue_version = catalogue_version
+        self.schedule = schedule
+        self.message = message
+        self.computed_at = datetime.now()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "profile_updated_at": self.profile_updated_at.isoformat(),
+            "catalogue_version": self.catalogue_version,
+            "computed_at": self.computed_at.isoformat(),
+            "schedule": [
+                {
+                    **item["recommendation"].model_dump(mode="json"),
+                    "next_due": item["next_due"],
+                    "priority": item["priority"]
+                }
+                for item in self.schedule
+            ]
+        }
+
+
+class ScreeningViews:
+    """
+    Материализованные календари обследований.
+
+    После каждого сохранения профиля календарь и текст сообщения
+    пересчитываются в фоне (изменения одного пользователя схлопываются), и
+    чтение сводится к одной выборке из словаря. Если пересчет еще не
+    выполнен, get считает календарь сразу из ожидающего профиля, поэтому
+    пользователь видит свои изменения без задержки.
+
+    Профили, сохраненные другими воркерами, приходят через шину инвалидации:
+    их календарь удаляется и пересчитывается при следующем чтении. При смене
+    версии каталога apply_catalogue_diff пересчитывает только затронутые
+    когорты; календарь, построенный по другой версии, пересчитывается при
+    чтении.
+    """
+
+    def __init__(self, screening_service, bus: Optional[InvalidationBus] = None,
+                 subscriber_id: Optional[str] = None):
+        self.screening_service = screening_service
+        self.views: Dict[int, ScreeningView] = {}
+        self.pending: Dict[int, UserProfile] = {}
+        self.recomputed = 0
+        self._task: Optional[asyncio.Task] = None
+        self.bus = bus
+        self.subscriber_id = subscriber_id or uuid.uuid4().hex
+
+        if bus is not None:
+            bus.subscribe(self.subscriber_id, self.discard)
+
+    def __len__(self) -> int:
+        return len(self.views)
+
+    def compute(self, profile: UserProfile) -> ScreeningView:
+        """Расчет и сохранение календаря по профилю"""
+        cohort = cohort_key(profile)
+        version = self.screening_service.catalogue.version
+        schedule = self.screening_service.schedule_for_cohort(cohort)
+        view = ScreeningView(profile.user_id, profile.updated_at, cohort, version, schedule,
+                             self.screening_service.format_schedule(schedule))
+        self.views[profile.user_id] = view
+        self.recomputed += 1
+        return view
+
+    def apply_catalogue_diff(self, diff: CatalogueDiff) -> Dict[str, int]:
+        """
+        Пересчет календарей после смены версии каталога.
+
+        Календарь зависит только от когорты (пол, возраст, факторы риска,
+        заболевания), поэтому правила проверяются один раз на когорту, а
+        календарь затронутой когорты строится один раз и общий для всех ее
+        пользователей. Остальным календарям присваивается новая версия.
+        """
+        cohorts: Dict[Cohort, List[ScreeningView]] = defaultdict(list)
+        for view in self.views.values():
+            cohorts[view.cohort].append(view)
+
+        affected_cohorts = users = 0
+        for cohort, views in cohorts.items():
+            if diff.affects(cohort):
+                affected_cohorts += 1
+                users += len(views)
+                schedule = self.screening_service.schedule_for_cohort(cohort)
+                message = self.screening_service.format_schedule(schedule)
+                for view in views:
+                    self.views[view.user_id] = ScreeningView(view.user_id, view.profile_updated_at, cohort,
+                                                             diff.new_version, schedule, message)
+                self.recomputed += len(views)
+            else:
+                for view in views:
+                    view.catalogue_version = diff.new_version
+
+        return {
+            "cohorts": len(cohorts),
+            "cohorts_affected": affected_cohorts,
+            "users": len(self.views),
+            "users_recomputed": users
+        }
+
+    def schedule(self, profile: UserProfile):
+        """Постановка пересчета после изменения профиля"""
+        self.pending[profile.user_id] = profile
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        while self.pending:
+            # Запрос, изменивший профиль, завершается раньше пересчета
+            await asyncio.sleep(0)
+            batch, self.pending = self.pending, {}
+            for profile in batch.values():
+                try:
+                    self.compute(profile)
+                except Exception as e:
+                    self.views.pop(profile.user_id, None)
+                    logger.error(f"❌ Failed to compute screening view for user {profile.user_id}: {e}")
+
+    def get(self, user_id: int) -> Optional[ScreeningView]:
+        """Актуальный календарь или None, если его нужно построить по профилю"""
+        profile = self.pending.pop(user_id, None)
+        if profile is not None:
+            CACHE_REQUESTS.inc("screening_view", "miss")
+            return self.compute(profile)
+        view = self.views.get(user_id)
+        if view is not None and view.catalogue_version != self.screening_service.catalogue.version:
+            # Каталог сменился, а пересчет шел в другом экземпляре сервиса
+            view = None
+        CACHE_REQUESTS.inc("screening_view", "hit" if view is not None else "miss")
+        return view
+
+    def discard(self, user_id: int):
+        self.views.pop(user_id, None)
+
+    def close(self):
+        if self.bus is not None:
+            self.bus.unsubscribe(self.subscriber_id)
+
+    async def wait(self):
+        """Ожидание фонового пересчета (при остановке и в бенчмарках)"""
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
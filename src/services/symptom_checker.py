@@ -1,13 +1,28 @@
 from typing import Dict, Any, Optional
 from datetime import datetime
 from models.health_models import SymptomSession
+from services.catalog import get_reference_catalog
 
 
 class SymptomChecker:
     def __init__(self):
-        self.symptom_rules = self._load_symptom_rules()
+        self._symptom_rules = None
+
+    @property
+    def symptom_rules(self) -> Dict[str, Any]:
+        # Правила загружаются при первом обращении, а не при создании сервиса
+        if self._symptom_rules is None:
+            self._symptom_rules = self._load_symptom_rules()
+        return self._symptom_rules
 
     def _load_symptom_rules(self) -> Dict[str, Any]:
+        catalog = get_reference_catalog()
+        if catalog is not None and "symptom_rules" in catalog:
+            # Правило декодируется из общего mmap при обращении к нему
+            return catalog.records("symptom_rules")
+        return self._builtin_symptom_rules()
+
+    def _builtin_symptom_rules(self) -> Dict[str, Any]:
         return {
             "headache": {
                 "questions": [
@@ -0,0 +1,130 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from models.max_models import Update
+from utils.metrics import WEBHOOK_DUPLICATES
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update: Update) -> Optional[str]:
+    """
+    Ключ идемпотентности обновления: (update_type, timestamp, mid / callback_id).
+
+    Для обновлений без сообщения и callback (bot_started и т.п.) используется
+    пользователь или чат. None — обновление нельзя отличить от других.
+    """
+    if update.callback is not None:
+        ref = update.callback.callback_id
+    elif update.message is not None:
+        ref = update.message.body.mid
+    elif update.user is not None:
+        ref = f"user:{update.user.user_id}"
+    elif update.chat_id is not None:
+        ref = f"chat:{update.chat_id}"
+    else:
+        return None
+    return f"{update.update_type}:{update.timestamp}:{ref}"
+
+
+class InMemoryDedupStore:
+    """
+    Окно дедупликации в памяти процесса с TTL и ограничением размера
+    (при переполнении вытесняются самые старые ключи).
+
+    Точное множество, а не bloom-фильтр: ложное срабатывание означало бы
+    потерю настоящего обновления пользователя.
+    """
+
+    def __init__(self, window_seconds: float = 600.0, max_size: int = 100000):
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._keys: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def claim(self, key: str) -> bool:
+        """Запоминает ключ; False, если он уже есть в окне"""
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        expires_at = self._keys.get(key)
+        if expires_at is not None:
+            return False
+
+        self._keys[key] = now + self.window_seconds
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+        return True
+
+    async def release(self, key: str):
+        self._keys.pop(key, None)
+
+    def _evict_expired(self, now: float):
+        # Ключи добавляются в порядке времени, поэтому истекшие всегда в начале
+        while self._keys:
+            key, expires_at = next(iter(self._keys.items()))
+            if expires_at > now:
+                break
+            del self._keys[key]
+
+
+class RedisDedupStore:
+    """
+    Общее для всех воркеров окно дедупликации в Redis (SET NX EX).
+
+    Требует пакет redis (redis.asyncio).
+    """
+
+    def __init__(self, url: str, window_seconds: float = 600.0, prefix: str = "healthcompass:update:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("Redis dedup backend requires the 'redis' package") from e
+
+        self.client = redis.from_url(url)
+        self.window_seconds = window_seconds
+        self.prefix = prefix
+
+    async def claim(self, key: str) -> bool:
+        return bool(await self.client.set(self.prefix + key, 1, nx=True, ex=max(1, int(self.window_seconds))))
+
+    async def release(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+class UpdateDeduplicator:
+    """
+    Пропуск повторных доставок webhook.
+
+    Обновление помечается при получении, до запуска обработчиков, поэтому
+    повтор, пришедший во время обработки оригинала, тоже отбрасывается.
+    Если обработка упала, отметка снимается, и повтор MAX будет обработан.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.duplicates = 0
+
+    async def claim(self, key: str, update_type: str) -> bool:
+        """Отмечает обновление; False, если это повторная доставка"""
+        try:
+            is_new = await self.store.claim(key)
+        except Exception as e:
+            # Недоступное хранилище не должно останавливать обработку
+            logger.error(f"❌ Dedup store unavailable: {e}")
+            return True
+
+        if not is_new:
+            self.duplicates += 1
+            WEBHOOK_DUPLICATES.inc(update_type)
+        return is_new
+
+    async def release(self, key: str):
+        try:
+            await self.store.release(key)
+        except Exception as e:
+            logger.error(f"❌ Failed to release dedup key {key}: {e}")
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from models.max_models import Update
+from services.max_api import MaxApiService
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_S = 30.0
+# Попыток обработать обновление, прежде чем оно будет отброшено
+UPDATE_ATTEMPTS = 3
+
+
+class UpdatePoller:
+    """
+    Получение обновлений через long polling (GET /updates) вместо webhook.
+
+    Пачки передаются в тот же конвейер, что и webhook (submit_update):
+    обновления пачки ставятся в очереди по одному, в порядке получения, и
+    только затем ожидаются. Следующая пачка запрашивается, пока
+    обрабатывается текущая; маркер сохраняется в файл только после
+    обработки всей пачки, поэтому после перезапуска необработанные
+    обновления будут получены повторно. Упавшие обновления повторяются с
+    паузой (как повторная доставка webhook), ошибка сохранения маркера —
+    при следующей пачке.
+    """
+
+    def __init__(self, max_api: MaxApiService, submit: Callable[[Update], Awaitable[Optional[Awaitable[Any]]]],
+                 limit: int = 100, timeout: int = 30, marker_path: Optional[str] = None,
+                 types: Optional[List[str]] = None, retry_delay: float = 1.0):
+        self.max_api = max_api
+        self.submit = submit
+        self.limit = limit
+        self.timeout = timeout
+        self.marker_path = marker_path
+        self.types = types
+        self.retry_delay = retry_delay
+        self.marker: Optional[int] = self._load_marker()
+        self._saved_marker = self.marker
+        self.batches = 0
+        self.received = 0
+        self.failed = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _load_marker(self) -> Optional[int]:
+        if not self.marker_path or not os.path.exists(self.marker_path):
+            return None
+        try:
+            with open(self.marker_path, encoding="utf-8") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Failed to read polling marker {self.marker_path}: {e}")
+            return None
+
+    def _save_marker(self):
+        tmp_path = f"{self.marker_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(self.marker))
+        os.replace(tmp_path, self.marker_path)
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(), name="update-poller")
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run(self):
+        logger.info(f"✅ Long polling started (limit={self.limit}, timeout={self.timeout}s, marker={self.marker})")
+        backoff = 1.0
+        # Следующий запрос идет с маркером полученной пачки, не дожидаясь ее обработки
+        fetch_marker = self.marker
+        pending: Optional[asyncio.Task] = None
+        try:
+            while True:
+                try:
+                    response = await self.max_api.get_updates(fetch_marker, self.limit, self.timeout, self.types)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Failed to fetch updates: {e}; retry in {backoff:.0f}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF_S)
+                    continue
+                backoff = 1.0
+
+                updates = self._parse(response.get("updates") or [])
+                next_marker = response.get("marker", fetch_marker)
+                fetch_marker = next_marker
+
+                # Пачки обрабатываются по очереди: порядок обновлений пользователя сохраняется
+                if pending is not None:
+                    try:
+                        await pending
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.error(f"❌ Failed to process polled batch: {e}")
+                pending = asyncio.create_task(self._process_batch(updates, next_marker))
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    def _parse(self, raw_updates: List[Dict[str, Any]]) -> List[Update]:
+        updates = []
+        for raw in raw_updates:
+            try:
+                updates.append(Update(**raw))
+            except ValidationError as e:
+                self.failed += 1
+                logger.error(f"❌ Skipping malformed update: {e}")
+        return updates
+
+    async def _process_batch(self, updates: List[Update], next_marker: Optional[int]):
+        if updates:
+            self.batches += 1
+            self.received += len(updates)
+            failed = await self._process_updates(updates)
+            for attempt in range(1, UPDATE_ATTEMPTS):
+                if not failed:
+                    break
+                await asyncio.sleep(self.retry_delay * attempt)
+                failed = await self._process_updates(failed)
+            for update in failed:
+                self.dropped += 1
+                logger.error(f"❌ Dropping polled update {update.update_type} after {UPDATE_ATTEMPTS} attempts")
+
+        if next_marker is not None:
+            self.marker = next_marker
+        if self.marker_path and self.marker is not None and self.marker != self._saved_marker:
+            try:
+                await asyncio.to_thread(self._save_marker)
+            except OSError as e:
+                # Маркер в памяти актуален; запись повторится после следующей пачки
+                logger.error(f"❌ Failed to save polling marker {self.marker_path}: {e}")
+            else:
+                self._saved_marker = self.marker
+
+    async def _process_updates(self, updates: List[Update]) -> List[Update]:
+        """
+        Returns:
+            List[Update]: обновления, обработка которых завершилась ошибкой
+        """
+        # Постановка в очереди строго по порядку, до ожидания результатов
+        tasks = []
+        failed = []
+        for update in updates:
+            try:
+                tasks.append((update, await self.submit(update)))
+            except Exception as e:
+                self.failed += 1
+                failed.append(update)
+                logger.error(f"💥 Error submitting polled update {update.update_type}: {e}")
+        results = await asyncio.gather(*(task for _, task in tasks if task is not None), return_exceptions=True)
+        for update, result in zip([update for update, task in tasks if task is not None], results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                failed.append(update)
+                logger.error(f"💥 Error processing polled update {update.update_type}: {result}")
+        return failed
@@ -5,7 +5,9 @@ from .validators import (
     validate_temperature,
     validate_weight,
     validate_medical_condition,
-    validate_user_profile
+    validate_user_profile,
+    validate_health_metric,
+    validate_metrics_batch
 )
 
 __all__ = [
@@ -15,5 +17,7 @@ __all__ = [
     "validate_temperature",
     "validate_weight",
     "validate_medical_condition",
-    "validate_user_profile"
+    "validate_user_profile",
+    "validate_health_metric",
+    "validate_metrics_batch"
 ]
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+HTTP-кэширование и сжатие ответов.
+
+Условные GET по ETag/Last-Modified (304 без сериализации тела), долгое
+immutable-кэширование версионированной статики и сжатие текстовых ответов
+(brotli, если установлен пакет brotli, иначе gzip).
+"""
+import gzip
+import hashlib
+import re
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Типы, которые имеет смысл сжимать (картинки и шрифты уже сжаты)
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+# Имя файла с хэшем содержимого: script.3f9a1c2e.js
+_HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+
+def http_date(moment: datetime) -> str:
+    """Дата в формате HTTP (наивное время считается локальным)"""
+    return format_datetime(moment.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def version_etag(*parts: Any) -> str:
+    """Слабый ETag из идентификатора и версии ресурса"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request_headers: Headers, etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """
+    Проверка условного запроса: If-None-Match (слабое сравнение) имеет
+    приоритет над If-Modified-Since, как требует RFC 9110.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        tags = [_strip_weak(tag) for tag in if_none_match.split(",")]
+        return "*" in tags or _strip_weak(etag) in tags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+    return False
+
+
+def conditional_json(request: Request, build: Callable[[], Any], etag: str,
+                     last_modified: Optional[datetime] = None) -> Response:
+    """
+    JSON-ответ с валидаторами кэша; на совпавший условный запрос — 304,
+    и build (сериализация) не вызывается.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    Статика с Cache-Control: версионированные адреса (?v=... или хэш в имени
+    файла) кэшируются на max_age как immutable, остальные — с обязательной
+    перепроверкой по ETag.
+
+    ETag отдается в кавычках, а условные запросы сравниваются слабо: после
+    сжатия ETag становится слабым, и клиент присылает его в виде W/"...".
+    """
+
+    def __init__(self, *args, max_age: int = 31536000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, method=scope["method"])
+        etag = response.headers["etag"]
+        if not etag.startswith(('"', 'W/"')):
+            response.headers["etag"] = etag = f'"{etag}"'
+        query = scope.get("query_string", b"")
+        versioned = b"v=" in query or _HASHED_NAME_RE.search(str(full_path)) is not None
+        response.headers["Cache-Control"] = (
+            f"public, max-age={self.max_age}, immutable" if versioned else "public, no-cache"
+        )
+        if is_not_modified(Headers(scope=scope), etag, datetime.fromtimestamp(stat_result.st_mtime)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _accepted_encoding(request_headers: Headers) -> Optional[str]:
+    accept = request_headers.get("accept-encoding", "")
+    codings = {}
+    for item in accept.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        codings[name.strip().lower()] = quality
+    if brotli is not None and codings.get("br", 0) > 0:
+        return "br"
+    if codings.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class PrerenderedPage:
+    """
+    Страница, одинаковая для всех пользователей: тело и его сжатые варианты
+    готовятся один раз (с максимальной степенью сжатия), ETag — хэш
+    содержимого. Ответ не проходит через шаблонизатор и middleware сжатия.
+    """
+
+    def __init__(self, body: bytes, version: Any = None):
+        self.body = body
+        self.version = version
+        self.etag = version_etag(hashlib.sha256(body).hexdigest()[:32])
+        self.variants: Dict[str, bytes] = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+
+    def response(self, request_headers: Headers) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "public, no-cache", "Vary": "Accept-Encoding"}
+        if is_not_modified(request_headers, self.etag, None):
+            return Response(status_code=304, headers=headers)
+        encoding = _accepted_encoding(request_headers)
+        if encoding in self.variants:
+            headers["Content-Encoding"] = encoding
+            return HTMLResponse(self.variants[encoding], headers=headers)
+        return HTMLResponse(self.body, headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware: сжатие JSON, HTML, CSS и JS.
+
+    Тело ответа собирается целиком и сжимается один раз, поэтому сжимаются
+    только ответы с Content-Length не больше maximum_size: потоковые и
+    крупные ответы проходят без буферизации. Для ответов с ETag
+    (статика) результат кэшируется по (путь, ETag, кодировка), поэтому неизменный
+    файл сжимается только при первом запросе. Сжатый ответ получает слабый
+    ETag и Vary: Accept-Encoding.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, maximum_size: int = 1048576, gzip_level: int = 6,
+                 brotli_quality: int = 5, cache_size: int = 256):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.maximum_size = maximum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _accepted_encoding(Headers(scope=scope))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state: Dict[str, Any] = {"start": None, "chunks": [], "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                content_length = headers.get("content-length", "")
+                if (message["status"] < 200 or message["status"] in (204, 304)
+                        or "content-encoding" in headers
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or not content_length.isdigit() or int(content_length) > self.maximum_size):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    state["start"] = message
+                return
+            if state["passthrough"] or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            state["chunks"].append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_compressed(send, state["start"], b"".join(state["chunks"]), encoding, scope["path"])
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_compressed(self, send, start: Dict[str, Any], body: bytes, encoding: str, path: str):
+        headers = MutableHeaders(raw=start["headers"])
+        if len(body) < self.minimum_size:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = headers.get("etag")
+        key = (path, etag, encoding) if etag else None
+        compressed = self._cache.get(key) if key else None
+        if compressed is None:
+            compressed = self._compress(body, encoding)
+            if key:
+                self._cache[key] = compressed
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        elif key:
+            self._cache.move_to_end(key)
+
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(compressed))
+        headers.add_vary_header("Accept-Encoding")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        await send(start)
+        await send({"type": "http.response.body", "body": compressed})
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
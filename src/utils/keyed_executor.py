@@ -0,0 +1,150 @@
+# app/utils/keyed_executor.py
+"""
+Исполнитель с упорядочиванием по ключу.
+
+Задачи распределяются по шардам по хэшу ключа (user_id): у каждого шарда
+своя очередь и один обработчик, поэтому задачи одного пользователя
+выполняются строго в порядке поступления, а разные шарды — параллельно.
+Медленная задача задерживает только пользователей своего шарда.
+
+Задача выполняется в контексте (contextvars) того, кто ее поставил, —
+текущий спан трассировки и решение о сэмплировании берутся из запроса, а
+не из контекста, в котором были созданы обработчики шардов.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+KEYED_QUEUE_WAIT = metrics.histogram(
+    "healthcompass_keyed_queue_wait_seconds",
+    "Time a task waited in its shard queue",
+    ("executor", "shard")
+)
+
+
+class KeyedExecutor:
+    def __init__(self, shards: int = 16, queue_size: int = 1000, name: str = "default"):
+        if shards < 1:
+            raise ValueError("shards must be positive")
+        self.shards = shards
+        self.queue_size = queue_size
+        self.name = name
+        self.processed = [0] * shards
+        self.failed = [0] * shards
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+
+        metrics.gauge(
+            f"healthcompass_{name}_shard_queue_depth",
+            f"Tasks waiting per shard of the {name} keyed executor",
+            lambda: {(str(shard),): queue.qsize() for shard, queue in enumerate(self._queues)},
+            ("shard",)
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def shard_for(self, key: Hashable) -> int:
+        return hash(key) % self.shards
+
+    def start(self):
+        """
+        Запуск обработчиков шардов в текущем event loop (из lifespan).
+
+        Обработчики получают пустой контекст: даже при ленивом запуске из
+        запроса они не удерживают его спаны.
+        """
+        if self.running:
+            return
+        self._queues = [asyncio.Queue(self.queue_size) for _ in range(self.shards)]
+        self._workers = [
+            asyncio.create_task(self._worker(shard), name=f"{self.name}-shard-{shard}",
+                                context=contextvars.Context())
+            for shard in range(self.shards)
+        ]
+
+    async def stop(self):
+        """Дожидается задач в очередях и останавливает обработчики"""
+        if not self.running:
+            return
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ставит fn в очередь шарда ключа и ждет результата.
+
+        Задача выполняется, даже если вызывающий перестал ждать (например,
+        клиент закрыл соединение), чтобы не нарушать порядок ключа.
+
+        Raises:
+            Exception: исключение, выброшенное fn
+        """
+        return await (await self.submit(key, fn))
+
+    async def submit(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> "asyncio.Future[T]":
+        """
+        Ставит fn в очередь шарда ключа, не дожидаясь выполнения.
+
+        Задачи одного ключа выполняются в порядке вызовов submit, поэтому
+        пачку обновлений нужно ставить последовательно, а ждать — потом.
+
+        Returns:
+            asyncio.Future: результат или исключение fn
+        """
+        if not self.running:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        context = contextvars.copy_context()
+        # При заполненной очереди put ждет: обратное давление на webhook
+        await self._queues[self.shard_for(key)].put((fn, context, future, time.perf_counter()))
+        return future
+
+    async def _worker(self, shard: int):
+        queue = self._queues[shard]
+        shard_label = str(shard)
+        while True:
+            fn, context, future, enqueued_at = await queue.get()
+            KEYED_QUEUE_WAIT.observe(time.perf_counter() - enqueued_at, self.name, shard_label)
+            try:
+                # Отмена обработчика отменяет и ожидаемую задачу
+                result = await asyncio.create_task(fn(), context=context)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                queue.task_done()
+                raise
+            except Exception as e:
+                self.failed[shard] += 1
+                if not future.done():
+                    future.set_exception(e)
+                else:
+                    logger.error(f"❌ {self.name} task failed after caller left: {e}")
+            else:
+                if not future.done():
+                    future.set_result(result)
+            self.processed[shard] += 1
+            queue.task_done()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "shard": shard,
+                "queued": self._queues[shard].qsize() if self._queues else 0,
+                "processed": self.processed[shard],
+                "failed": self.failed[shard]
+            }
+            for shard in range(self.shards)
+        ]
@@ -0,0 +1,337 @@
+# app/utils/metrics.py
+"""
+Встроенные метрики в формате Prometheus (text exposition 0.0.4).
+
+Пока реестр выключен, все операции записи сводятся к одной проверке флага,
+а таймеры возвращают общий no-op объект, поэтому инструментирование горячих
+путей ничего не стоит. Значения gauge для размеров очередей и хранилищ
+вычисляются через callback в момент чтения /metrics.
+"""
+import re
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PAYLOAD_SUFFIX_RE = re.compile(r'(_\d+)+$')
+_PATH_ID_RE = re.compile(r'/\d+')
+
+LabelValues = Tuple[str, ...]
+GaugeValue = Union[float, Dict[LabelValues, float]]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: "Histogram", labels: LabelValues):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+        return False
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self):
+        pass
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        if not self._registry.enabled:
+            return
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+    def clear(self):
+        self._values.clear()
+
+
+class Gauge(_Metric):
+    """Gauge со значением из callback: fn() -> число или {метки: число}"""
+    type = "gauge"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 fn: Callable[[], GaugeValue], labelnames: Sequence[str] = ()):
+        super().__init__(registry, name, documentation, labelnames)
+        self._fn = fn
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        try:
+            value = self._fn()
+        except Exception:
+            # Сломанный callback не должен ронять весь /metrics
+            return lines
+
+        if isinstance(value, dict):
+            items = sorted(value.items())
+        else:
+            items = [((), value)]
+
+        for labels, item in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(item)}")
+        return lines
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счетчики по корзинам (+Inf последняя), сумма, количество]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        if not self._registry.enabled:
+            return
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def time(self, *labels: str):
+        """Контекстный менеджер, измеряющий длительность блока в секундах"""
+        if not self._registry.enabled:
+            return _NOOP_TIMER
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def collect(self) -> List[str]:
+        lines = self._header()
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+    def clear(self):
+        self._values.clear()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, fn: Callable[[], GaugeValue],
+              labelnames: Sequence[str] = ()) -> Gauge:
+        """Регистрирует (или заменяет) gauge, значение которого читается при экспорте"""
+        return self._register(Gauge(self, name, documentation, fn, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+def normalize_payload(payload: str) -> str:
+    """symptom_answer_0_1 -> symptom_answer: ограничивает кардинальность меток"""
+    return _PAYLOAD_SUFFIX_RE.sub("", payload) or "empty"
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """/chats/123 -> /chats/{id}"""
+    return _PATH_ID_RE.sub("/{id}", endpoint)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: латентность HTTP-запросов по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                scope.get("method", ""),
+                _route_template(scope),
+                str(status["code"])
+            )
+
+
+def _route_template(scope: Dict[str, Any]) -> str:
+    """Шаблон сработавшего маршрута (/api/profile/{user_id}): значения параметров в метку не попадают"""
+    # FastAPI кладет маршрут в scope после сопоставления
+    path_format = getattr(scope.get("route"), "path_format", None)
+    if path_format:
+        return path_format
+    if "app_root_path" in scope:
+        # Mount (статика): префикс монтирования вместо пути файла
+        return scope.get("root_path", "") + "/{path}"
+    return "unmatched"
+
+
+# -------------------------------
+# Метрики приложения
+# -------------------------------
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_LATENCY = metrics.histogram(
+    "healthcompass_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status")
+)
+CALLBACK_LATENCY = metrics.histogram(
+    "healthcompass_callback_duration_seconds",
+    "Callback handling latency by normalized payload",
+    ("payload",)
+)
+MAX_API_LATENCY = metrics.histogram(
+    "healthcompass_max_api_request_duration_seconds",
+    "MAX API call latency by endpoint",
+    ("method", "endpoint")
+)
+MAX_API_ERRORS = metrics.counter(
+    "healthcompass_max_api_errors_total",
+    "MAX API call errors by endpoint",
+    ("method", "endpoint", "error")
+)
+CACHE_REQUESTS = metrics.counter(
+    "healthcompass_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss)",
+    ("cache", "result")
+)
+WEBHOOK_DUPLICATES = metrics.counter(
+    "healthcompass_webhook_duplicates_total",
+    "Webhook redeliveries skipped by the dedup window",
+    ("update_type",)
+)
+METRIC_COMMIT_LATENCY = metrics.histogram(
+    "healthcompass_group_commit_duration_seconds",
+    "Time to commit one group-commit batch",
+    ("writer",)
+)
+METRIC_COMMIT_BATCH = metrics.histogram(
+    "healthcompass_group_commit_batch_size",
+    "Rows per group-commit batch",
+    ("writer",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+OUTBOUND_LATENCY = metrics.histogram(
+    "healthcompass_outbound_delivery_seconds",
+    "Time from submitting an outbound message to the MAX API response",
+    ("lane",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+OUTBOUND_SLO_MISSES = metrics.counter(
+    "healthcompass_outbound_slo_misses_total",
+    "Outbound messages delivered slower than their lane SLO",
+    ("lane",)
+)
+METRIC_ANOMALIES = metrics.counter(
+    "healthcompass_metric_anomalies_total",
+    "Health metric readings flagged by the anomaly detector",
+    ("metric_type", "kind")
+)
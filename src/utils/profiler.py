@@ -0,0 +1,165 @@
+# app/utils/profiler.py
+"""
+Сэмплирующий профайлер для диагностики в продакшене.
+
+Фоновый поток периодически снимает стек потока event loop через
+sys._current_frames() и агрегирует его в формат collapsed stacks
+(совместим с flamegraph.pl / speedscope). Параллельно watchdog следит
+за heartbeat event loop и фиксирует стек, если корутина блокирует цикл
+дольше порога.
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}"
+
+
+def _collapse(frame) -> str:
+    """Стек от внешнего кадра к внутреннему в виде 'a;b;c'"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+
+    def run(self, duration: float) -> Counter:
+        """Блокирующий сбор сэмплов; вызывается вне event loop"""
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_collapse(frame)] += 1
+                self.sample_count += 1
+            time.sleep(self.interval)
+        return self.samples
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class LoopBlockMonitor:
+    """
+    Детектор блокировок event loop.
+
+    Корутина в цикле обновляет heartbeat; поток-наблюдатель, заметив, что
+    heartbeat не обновлялся дольше threshold, снимает стек потока цикла —
+    это и есть код, удерживающий цикл.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, thread_id: int, threshold: float = 0.1):
+        self.loop = loop
+        self.thread_id = thread_id
+        self.threshold = threshold
+        self.warnings: List[Dict[str, Any]] = []
+        self._heartbeat = time.perf_counter()
+        self._stop = threading.Event()
+        self._beat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def _beat(self):
+        interval = self.threshold / 4
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(interval)
+
+    def _watch(self):
+        reported_for = None
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._heartbeat
+            blocked = time.perf_counter() - beat
+            if blocked < self.threshold:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = _collapse(frame) if frame is not None else ""
+            if reported_for == beat and self.warnings:
+                # Та же блокировка продолжается: обновляем длительность
+                self.warnings[-1]["blocked_ms"] = round(blocked * 1000, 1)
+                continue
+            reported_for = beat
+            self.warnings.append({"blocked_ms": round(blocked * 1000, 1), "stack": stack})
+
+    def start(self):
+        self._beat_task = self.loop.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-block-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._beat_task:
+            self._beat_task.cancel()
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+
+
+def dump_tasks(limit: int = 10) -> List[Dict[str, Any]]:
+    """Снимок всех задач asyncio текущего цикла со стеками"""
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coro": getattr(coro, "__qualname__", repr(coro)),
+            "done": task.done(),
+            "stack": [_frame_label(frame) for frame in task.get_stack(limit=limit)]
+        })
+    return tasks
+
+
+_profile_lock = asyncio.Lock()
+
+
+async def profile_event_loop(duration: float, interval: float = 0.005,
+                             slow_threshold: float = 0.1) -> Dict[str, Any]:
+    """
+    Профилирует поток event loop в течение duration секунд.
+
+    Сэмплирование идет в отдельном потоке, поэтому цикл продолжает
+    обслуживать запросы. Одновременно выполняется только один профиль.
+
+    Returns:
+        Dict[str, Any]: collapsed stacks, дамп задач и предупреждения о блокировках
+
+    Raises:
+        RuntimeError: если профилирование уже выполняется
+    """
+    if _profile_lock.locked():
+        raise RuntimeError("Profiling already in progress")
+
+    async with _profile_lock:
+        loop = asyncio.get_running_loop()
+        thread_id = threading.get_ident()
+        profiler = SamplingProfiler(thread_id, interval)
+        monitor = LoopBlockMonitor(loop, thread_id, slow_threshold)
+
+        tasks = dump_tasks()
+        monitor.start()
+        try:
+            await asyncio.to_thread(profiler.run, duration)
+        finally:
+            monitor.stop()
+
+        return {
+            "duration_s": duration,
+            "interval_ms": interval * 1000,
+            "samples": profiler.sample_count,
+            "collapsed": profiler.collapsed(),
+            "tasks": tasks,
+            "slow_callbacks": monitor.warnings
+        }
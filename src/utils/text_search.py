@@ -0,0 +1,268 @@
+# app/utils/text_search.py
+"""
+Полнотекстовый поиск: токенизация, стемминг русского языка (Snowball),
+инвертированный индекс с ранжированием BM25 и поиском по префиксу.
+"""
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-я]+")
+
+STOP_WORDS = frozenset({
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она", "так",
+    "его", "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "ее", "мне", "было", "вот",
+    "от", "меня", "еще", "нет", "о", "из", "ему", "для", "при", "это", "мы", "их", "без", "или"
+})
+
+_VOWELS = frozenset("аеиоуыэюя")
+
+
+def _endings(*groups: Tuple[Tuple[str, ...], bool]) -> Dict[str, List[Tuple[str, bool]]]:
+    """Окончания (с флагом "после а/я"), сгруппированные по последней букве, от длинных к коротким"""
+    by_last: Dict[str, List[Tuple[str, bool]]] = {}
+    for endings, after_a in groups:
+        for ending in endings:
+            by_last.setdefault(ending[-1], []).append((ending, after_a))
+    for candidates in by_last.values():
+        candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    return by_last
+
+
+_PERFECTIVE_GERUND = _endings((("в", "вши", "вшись"), True), (("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"), False))
+_REFLEXIVE = _endings((("ся", "сь"), False))
+_ADJECTIVE = _endings((("ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+                        "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею"), False))
+_PARTICIPLE = _endings((("ем", "нн", "вш", "ющ", "щ"), True), (("ивш", "ывш", "ующ"), False))
+_VERB = _endings(
+    (("ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно"), True),
+    (("ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им", "ым", "ен",
+      "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю"), False)
+)
+_NOUN = _endings((("а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой",
+                   "ий", "й", "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь",
+                   "ию", "ью", "ю", "ия", "ья", "я"), False))
+_SUPERLATIVE = _endings((("ейш", "ейше"), False))
+_DERIVATIONAL = _endings((("ост", "ость"), False))
+
+
+def _regions(word: str) -> Tuple[int, int]:
+    """Начала областей RV и R2 алгоритма Snowball"""
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+
+    def after_consonant_vowel(start: int) -> int:
+        for i in range(max(start, 1), len(word)):
+            if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_consonant_vowel(1)
+    return rv, after_consonant_vowel(r1 + 1)
+
+
+def _strip(word: str, start: int, endings: Dict[str, List[Tuple[str, bool]]]) -> Optional[str]:
+    """Удаляет самое длинное подходящее окончание из области [start:]; None, если его нет"""
+    if not word:
+        return None
+    for ending, after_a in endings.get(word[-1], ()):
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in "ая"):
+            continue
+        return word[:cut]
+    return None
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Основа русского слова (Snowball Russian); латиница и числа возвращаются как есть"""
+    word = word.lower().replace("ё", "е")
+    if not word or word[0] not in "абвгдежзийклмнопрстуфхцчшщъыьэюя":
+        return word
+
+    rv, r2 = _regions(word)
+
+    stripped = _strip(word, rv, _PERFECTIVE_GERUND)
+    if stripped is None:
+        reflexive = _strip(word, rv, _REFLEXIVE)
+        if reflexive is not None:
+            word = reflexive
+        stripped = _strip(word, rv, _ADJECTIVE)
+        if stripped is not None:
+            participle = _strip(stripped, rv, _PARTICIPLE)
+            if participle is not None:
+                stripped = participle
+        else:
+            stripped = _strip(word, rv, _VERB)
+            if stripped is None:
+                stripped = _strip(word, rv, _NOUN)
+    if stripped is not None:
+        word = stripped
+
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    derivational = _strip(word, max(r2, rv), _DERIVATIONAL)
+    if derivational is not None:
+        word = derivational
+
+    superlative = _strip(word, rv, _SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif superlative is None and word.endswith("ь") and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста в нижнем регистре без стоп-слов"""
+    return [token for token in _TOKEN_RE.findall(text.lower().replace("ё", "е")) if token not in STOP_WORDS]
+
+
+def analyze(text: str) -> List[str]:
+    return [stem(token) for token in tokenize(text)]
+
+
+def _merge(left: Dict[str, float], right: Dict[str, float], combine) -> Dict[str, float]:
+    if len(left) < len(right):
+        left, right = right, left
+    for key, value in right.items():
+        current = left.get(key)
+        left[key] = value if current is None else combine(current, value)
+    return left
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс документов из нескольких полей.
+
+    Частота термина в документе взвешивается по полю (BM25F в упрощенном
+    виде), документы ранжируются по BM25. Каждое слово запроса сопоставляется
+    с термином по основе и по префиксу (с понижающим весом), поэтому "сахар"
+    находит "сахарный", а недописанное "гиперт" — "гипертония". Документы
+    добавляются, заменяются и удаляются без перестроения индекса.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75,
+                 prefix_weight: float = 0.5, min_prefix: int = 3, max_expansions: int = 50):
+        self.field_weights = field_weights or {}
+        self.k1 = k1
+        self.b = b
+        self.prefix_weight = prefix_weight
+        self.min_prefix = min_prefix
+        self.max_expansions = max_expansions
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self.total_length = 0.0
+        # Отсортированный словарь для поиска по префиксу
+        self.vocabulary: List[str] = []
+        # Нормировка BM25 по длине документа; сбрасывается при изменении индекса
+        self._norms: Optional[Dict[str, float]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, fields: Dict[str, Union[str, Iterable[str]]]):
+        """Индексирует документ; документ с тем же id заменяется"""
+        self.remove(doc_id)
+
+        terms: Dict[str, float] = {}
+        length = 0.0
+        for field, value in fields.items():
+            if not value:
+                continue
+            weight = self.field_weights.get(field, 1.0)
+            for text in ([value] if isinstance(value, str) else value):
+                for term in analyze(text):
+                    terms[term] = terms.get(term, 0.0) + weight
+                    length += weight
+
+        for term, frequency in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                insort(self.vocabulary, term)
+            posting[doc_id] = frequency
+
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        self._norms = None
+
+    def remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        self._norms = None
+        for term in terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+
+    def expand(self, token: str) -> Dict[str, float]:
+        """Термины индекса для слова запроса с весами: основа — 1, продолжения префикса — prefix_weight"""
+        base = stem(token)
+        matches: Dict[str, float] = {}
+        if base in self.postings:
+            matches[base] = 1.0
+        if len(base) >= self.min_prefix:
+            position = bisect_left(self.vocabulary, base)
+            vocabulary = self.vocabulary
+            end = min(len(vocabulary), position + self.max_expansions)
+            while position < end and vocabulary[position].startswith(base):
+                matches.setdefault(vocabulary[position], self.prefix_weight)
+                position += 1
+        return matches
+
+    def _doc_norms(self) -> Dict[str, float]:
+        if self._norms is None:
+            avg_length = self.total_length / len(self.doc_lengths) or 1.0
+            k1, b = self.k1, self.b
+            self._norms = {doc_id: k1 * (1 - b + b * length / avg_length)
+                           for doc_id, length in self.doc_lengths.items()}
+        return self._norms
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Поиск документов по запросу.
+
+        Returns:
+            List[Tuple[str, float]]: id документов и оценка BM25, по убыванию оценки
+        """
+        if not self.doc_lengths:
+            return []
+
+        doc_count = len(self.doc_lengths)
+        norms = self._doc_norms()
+        k1_plus_1 = self.k1 + 1
+
+        scores: Dict[str, float] = {}
+        for token in dict.fromkeys(tokenize(query)):
+            # Для слова запроса документ получает лучший из вариантов его совпадения
+            token_scores: Dict[str, float] = {}
+            for term, boost in self.expand(token).items():
+                posting = self.postings[term]
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                weight = boost * idf * k1_plus_1
+                term_scores = {doc_id: weight * frequency / (frequency + norms[doc_id])
+                               for doc_id, frequency in posting.items()}
+                token_scores = _merge(token_scores, term_scores, max)
+
+            # Слияние обходит меньший из словарей
+            scores = _merge(scores, token_scores, float.__add__)
+
+        return [(doc_id, round(score, 4))
+                for doc_id, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
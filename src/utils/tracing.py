@@ -0,0 +1,297 @@
+# app/utils/tracing.py
+"""
+Легковесная трассировка: webhook -> обработчики -> MAX API.
+
+Формат спанов совместим с OpenTelemetry (trace_id 16 байт, span_id 8 байт,
+время в наносекундах unix epoch, W3C traceparent), поэтому файл экспорта
+можно загрузить в коллектор. Решение о сэмплировании принимается для
+корневого спана и наследуется дочерними; несэмплированные трейсы стоят
+одной проверки contextvar.
+"""
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """
+    Спан несэмплированного или выключенного трейса.
+
+    Корень несэмплированного трейса (bind=True) становится текущим спаном,
+    чтобы дочерние спаны не сэмплировались заново; остальные no-op спаны
+    контекст не трогают.
+    """
+    sampled = False
+    trace_id = None
+    span_id = None
+
+    def __init__(self, bind: bool = False):
+        self._bind = bind
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_status(self, status: str, description: str = None):
+        pass
+
+    def __enter__(self):
+        if self._bind:
+            self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        if self._bind:
+            _current_span.reset(self._token)
+        return False
+
+
+class Span:
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent: Optional["Span"] = None,
+                 parent_span_id: Optional[str] = None, attributes: Dict[str, Any] = None,
+                 start_ns: Optional[int] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent.span_id if parent else parent_span_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_description: Optional[str] = None
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        # Все спаны трейса собираются у корня и экспортируются вместе с ним
+        self.root: "Span" = parent.root if parent else self
+        if self.root is self:
+            self.finished: List["Span"] = []
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_status(self, status: str, description: str = None):
+        self.status = status
+        self.status_description = description
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        self.root.finished.append(self)
+        if self.root is self:
+            self.tracer._finish_trace(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.set_status("ERROR", f"{exc_type.__name__}: {exc}")
+        elif self.status == "UNSET":
+            self.status = "OK"
+        _current_span.reset(self._token)
+        self.end()
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status}
+        }
+        if self.status_description:
+            data["status"]["message"] = self.status_description
+        return data
+
+
+class FileSpanExporter:
+    """Экспорт спанов в JSON Lines (заглушка коллектора для локальной отладки)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def export(self, spans: List[Span]):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        for span in spans:
+            self._file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def shutdown(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class InMemorySpanExporter:
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(spans)
+
+    def shutdown(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0, exporter=None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def configure(self, enabled: bool, sample_rate: float = 1.0, exporter=None):
+        if self.exporter is not None and self.exporter is not exporter:
+            self.exporter.shutdown()
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    def start_span(self, name: str, attributes: Dict[str, Any] = None, traceparent: Optional[str] = None,
+                   start_ns: Optional[int] = None):
+        """
+        Создает спан как дочерний к текущему; без текущего спана — новый трейс.
+
+        Args:
+            name: Имя операции
+            attributes: Атрибуты спана
+            traceparent: Заголовок W3C traceparent входящего запроса (для корня)
+            start_ns: Явное время начала (для ретроспективных спанов)
+
+        Returns:
+            Span или no-op спан, если трейс не сэмплирован
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+
+        parent = _current_span.get()
+        if parent is not None:
+            if not parent.sampled:
+                return _NOOP_SPAN
+            return Span(self, name, parent.trace_id, parent=parent, attributes=attributes, start_ns=start_ns)
+
+        remote = _parse_traceparent(traceparent) if traceparent else None
+        if remote:
+            trace_id, parent_span_id, sampled = remote
+        else:
+            trace_id, parent_span_id = f"{random.getrandbits(128):032x}", None
+            sampled = random.random() < self.sample_rate
+
+        if not sampled:
+            return _NoopSpan(bind=True)
+        return Span(self, name, trace_id, parent_span_id=parent_span_id, attributes=attributes, start_ns=start_ns)
+
+    def record_span(self, name: str, start_ns: int, end_ns: Optional[int] = None,
+                    attributes: Dict[str, Any] = None):
+        """Записывает уже завершившийся участок (например, разбор запроса) как дочерний спан"""
+        parent = _current_span.get()
+        if not self.enabled or parent is None or not parent.sampled:
+            return
+        span = Span(self, name, parent.trace_id, parent=parent, attributes=attributes, start_ns=start_ns)
+        span.status = "OK"
+        span.end(end_ns)
+
+    def _finish_trace(self, root: Span):
+        breakdown = latency_breakdown(root)
+        root.set_attribute("latency.breakdown_ms", breakdown)
+        logger.debug(
+            "⏱ trace %s %s: %s", root.trace_id, root.name,
+            ", ".join(f"{name}={ms:.2f}ms" for name, ms in breakdown.items())
+        )
+        if self.exporter is not None:
+            try:
+                self.exporter.export(root.finished)
+            except Exception as e:
+                logger.error(f"❌ Failed to export spans: {e}")
+
+
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
+
+
+def latency_breakdown(root: Span) -> Dict[str, float]:
+    """
+    Разбивка длительности трейса по операциям.
+
+    Для каждого имени спана — суммарное собственное время (без вложенных
+    спанов), так что сумма значений равна длительности корня.
+    """
+    children_ms: Dict[str, float] = {}
+    for span in root.finished:
+        if span.parent_span_id:
+            children_ms[span.parent_span_id] = children_ms.get(span.parent_span_id, 0.0) + span.duration_ms
+
+    breakdown: Dict[str, float] = {}
+    for span in root.finished:
+        own = max(span.duration_ms - children_ms.get(span.span_id, 0.0), 0.0)
+        breakdown[span.name] = round(breakdown.get(span.name, 0.0) + own, 3)
+    return breakdown
+
+
+def _parse_traceparent(header: str):
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """ASGI middleware: корневой спан на каждый HTTP-запрос"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        span = tracer.start_span(
+            f"{scope.get('method', '')} {scope.get('path', '')}",
+            attributes={"http.method": scope.get("method"), "http.target": scope.get("path")},
+            traceparent=traceparent
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.set_status("ERROR")
+            await send(message)
+
+        with span:
+            await self.app(scope, receive, send_wrapper)
@@ -1,8 +1,28 @@
 # app/utils/validators.py
 import re
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Tuple, Optional, List, Sequence, Callable, NamedTuple
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен: пакетная проверка работает и без него
+    np = None
+
+# Регулярные выражения компилируются один раз при импорте модуля
+_BLOOD_PRESSURE_RE = re.compile(r'^(\d{2,3})/(\d{2,3})$')
+_UNSAFE_CHARS_RE = re.compile(r'[<>{}[\]$&|`]')
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Российские номера: +7XXXXXXXXXX, 8XXXXXXXXXX, +375XXXXXXXXX и т.д.
+_PHONE_RE = re.compile(r'^(\+7|8|\+375|\+374|\+994|\+995|\+996|\+998)[0-9]{7,14}$')
+_PHONE_SEPARATORS_RE = re.compile(r'[\s\-\(\)]')
+
+# Допустимые диапазоны показателей (границы включительно, кроме веса: > 0)
+SYSTOLIC_RANGE = (60, 250)
+DIASTOLIC_RANGE = (40, 150)
+PULSE_RANGE = (30, 200)
+TEMPERATURE_RANGE = (35.0, 42.0)
+WEIGHT_RANGE = (0, 300)
+
 
 def validate_age(age: int) -> Tuple[bool, Optional[str]]:
     """
@@ -40,16 +60,16 @@ def validate_blood_pressure(systolic: int, diastolic: int) -> Tuple[bool, Option
     if not isinstance(systolic, int) or not isinstance(diastolic, int):
         return False, "Давление должно быть целым числом"
 
-    if systolic < 60:
+    if systolic < SYSTOLIC_RANGE[0]:
         return False, "Систолическое давление слишком низкое"
 
-    if systolic > 250:
+    if systolic > SYSTOLIC_RANGE[1]:
         return False, "Систолическое давление слишком высокое"
 
-    if diastolic < 40:
+    if diastolic < DIASTOLIC_RANGE[0]:
         return False, "Диастолическое давление слишком низкое"
 
-    if diastolic > 150:
+    if diastolic > DIASTOLIC_RANGE[1]:
         return False, "Диастолическое давление слишком высокое"
 
     if systolic <= diastolic:
@@ -71,10 +91,10 @@ def validate_pulse(pulse: int) -> Tuple[bool, Optional[str]]:
     if not isinstance(pulse, int):
         return False, "Пульс должен быть целым числом"
 
-    if pulse < 30:
+    if pulse < PULSE_RANGE[0]:
         return False, "Пульс слишком низкий"
 
-    if pulse > 200:
+    if pulse > PULSE_RANGE[1]:
         return False, "Пульс слишком высокий"
 
     return True, None
@@ -93,10 +113,10 @@ def validate_temperature(temperature: float) -> Tuple[bool, Optional[str]]:
     if not isinstance(temperature, (int, float)):
         return False, "Температура должна быть числом"
 
-    if temperature < 35.0:
+    if temperature < TEMPERATURE_RANGE[0]:
         return False, "Температура слишком низкая"
 
-    if temperature > 42.0:
+    if temperature > TEMPERATURE_RANGE[1]:
         return False, "Температура слишком высокая"
 
     return True, None
@@ -115,10 +135,10 @@ def validate_weight(weight: float) -> Tuple[bool, Optional[str]]:
     if not isinstance(weight, (int, float)):
         return False, "Вес должен быть числом"
 
-    if weight <= 0:
+    if weight <= WEIGHT_RANGE[0]:
         return False, "Вес должен быть положительным числом"
 
-    if weight > 300:
+    if weight > WEIGHT_RANGE[1]:
         return False, "Вес слишком большой"
 
     return True, None
@@ -245,8 +265,7 @@ def validate_blood_pressure_string(pressure_str: str) -> Tuple[bool, Optional[Di
     Returns:
         Tuple[bool, Optional[Dict[str, int]]]: (is_valid, parsed_pressure)
     """
-    pattern = r'^(\d{2,3})/(\d{2,3})$'
-    match = re.match(pattern, pressure_str)
+    match = _BLOOD_PRESSURE_RE.match(pressure_str)
 
     if not match:
         return False, None
@@ -276,32 +295,165 @@ def validate_health_metric(metric_type: str, value: Dict[str, Any]) -> Tuple[boo
     Returns:
         Tuple[bool, Optional[str]]: (is_valid, error_message)
     """
-    if metric_type == 'pressure':
-        if 'systolic' not in value or 'diastolic' not in value:
-            return False, "Для давления требуются systolic и diastolic"
-
-        return validate_blood_pressure(value['systolic'], value['diastolic'])
+    spec = METRIC_SPECS.get(metric_type)
+    if spec is None:
+        return False, f"Неизвестный тип метрики: {metric_type}"
 
-    elif metric_type == 'pulse':
-        if 'value' not in value:
-            return False, "Для пульса требуется value"
+    try:
+        args = [value[field.name] for field in spec.fields]
+    except KeyError:
+        return False, spec.missing_message
+
+    return spec.validator(*args)
+
+
+class MetricField(NamedTuple):
+    name: str
+    low: float
+    high: float
+    integer: bool = False
+    low_exclusive: bool = False
+
+
+class MetricSpec(NamedTuple):
+    fields: Tuple[MetricField, ...]
+    validator: Callable[..., Tuple[bool, Optional[str]]]
+    missing_message: str
+    # Первое поле должно быть строго больше второго (систолическое > диастолического)
+    ordered: bool = False
+
+
+# Реестр метрик: поля, диапазоны и поштучный валидатор для каждого типа
+METRIC_SPECS: Dict[str, MetricSpec] = {
+    'pressure': MetricSpec(
+        fields=(
+            MetricField('systolic', *SYSTOLIC_RANGE, integer=True),
+            MetricField('diastolic', *DIASTOLIC_RANGE, integer=True)
+        ),
+        validator=validate_blood_pressure,
+        missing_message="Для давления требуются systolic и diastolic",
+        ordered=True
+    ),
+    'pulse': MetricSpec(
+        fields=(MetricField('value', *PULSE_RANGE, integer=True),),
+        validator=validate_pulse,
+        missing_message="Для пульса требуется value"
+    ),
+    'temperature': MetricSpec(
+        fields=(MetricField('value', *TEMPERATURE_RANGE),),
+        validator=validate_temperature,
+        missing_message="Для температуры требуется value"
+    ),
+    'weight': MetricSpec(
+        fields=(MetricField('value', *WEIGHT_RANGE, low_exclusive=True),),
+        validator=validate_weight,
+        missing_message="Для веса требуется value"
+    )
+}
+
+# Коды ошибок пакетной проверки (по одному на строку)
+METRIC_OK = 0
+METRIC_UNKNOWN_TYPE = 1
+METRIC_MISSING_FIELD = 2
+METRIC_INVALID_TYPE = 3
+METRIC_OUT_OF_RANGE = 4
+METRIC_INCONSISTENT = 5
+
+_MISSING = object()
+
+
+def _field_code(field: MetricField, item: Any) -> int:
+    if item is _MISSING:
+        return METRIC_MISSING_FIELD
+    if not isinstance(item, int if field.integer else (int, float)):
+        return METRIC_INVALID_TYPE
+    below = item <= field.low if field.low_exclusive else item < field.low
+    if below or item > field.high:
+        return METRIC_OUT_OF_RANGE
+    return METRIC_OK
+
+
+def _row_code(spec: MetricSpec, value: Dict[str, Any]) -> int:
+    items = [value.get(field.name, _MISSING) for field in spec.fields]
+    codes = [_field_code(field, item) for field, item in zip(spec.fields, items)]
+    # Приоритет как у поштучной проверки: наличие полей, тип, диапазон
+    errors = [code for code in codes if code != METRIC_OK]
+    if errors:
+        return min(errors)
+    if spec.ordered and items[0] <= items[1]:
+        return METRIC_INCONSISTENT
+    return METRIC_OK
+
+
+def _group_codes_numpy(spec: MetricSpec, values: List[Dict[str, Any]]):
+    """Векторная проверка группы строк одного типа"""
+    size = len(values)
+    no_error = np.int8(100)
+    combined = np.full(size, no_error, dtype=np.int8)
+    numbers = []
+
+    for field in spec.fields:
+        column = [value.get(field.name, _MISSING) for value in values]
+        allowed = {int} if field.integer else {int, float}
+        if set(map(type, column)) <= allowed:
+            # Быстрый путь: все значения — числа допустимого типа
+            codes = np.zeros(size, dtype=np.int8)
+            numbers_column = np.fromiter(column, dtype=np.float64, count=size)
+        else:
+            codes = np.fromiter(
+                (_field_code(field, item) if type(item) not in allowed else METRIC_OK for item in column),
+                dtype=np.int8, count=size
+            )
+            codes[codes == METRIC_OUT_OF_RANGE] = METRIC_OK
+            numbers_column = np.fromiter(
+                (item if code == METRIC_OK else 0.0 for item, code in zip(column, codes.tolist())),
+                dtype=np.float64, count=size
+            )
+
+        below = numbers_column <= field.low if field.low_exclusive else numbers_column < field.low
+        codes[(codes == METRIC_OK) & (below | (numbers_column > field.high))] = METRIC_OUT_OF_RANGE
+        # Коды ошибок упорядочены по приоритету, поэтому берем минимальный
+        combined = np.minimum(combined, np.where(codes == METRIC_OK, no_error, codes))
+        numbers.append(numbers_column)
+
+    combined[combined == no_error] = METRIC_OK
+    if spec.ordered:
+        combined[(combined == METRIC_OK) & (numbers[0] <= numbers[1])] = METRIC_INCONSISTENT
+    return combined
+
+
+def validate_metrics_batch(metrics: Sequence[Tuple[str, Dict[str, Any]]]) -> List[int]:
+    """
+    Пакетная валидация метрик здоровья
 
-        return validate_pulse(value['value'])
+    Строки группируются по типу метрики, и диапазоны каждого поля проверяются
+    для всей группы сразу (векторно через NumPy, если он установлен).
+    Строки, которые validate_health_metric признает корректными, получают METRIC_OK.
 
-    elif metric_type == 'temperature':
-        if 'value' not in value:
-            return False, "Для температуры требуется value"
+    Args:
+        metrics: Последовательность пар (metric_type, value)
 
-        return validate_temperature(value['value'])
+    Returns:
+        List[int]: код ошибки для каждой строки (METRIC_OK, METRIC_UNKNOWN_TYPE, ...)
+    """
+    if np is None:
+        return [
+            _row_code(METRIC_SPECS[metric_type], value) if metric_type in METRIC_SPECS else METRIC_UNKNOWN_TYPE
+            for metric_type, value in metrics
+        ]
 
-    elif metric_type == 'weight':
-        if 'value' not in value:
-            return False, "Для веса требуется value"
+    result = np.full(len(metrics), METRIC_UNKNOWN_TYPE, dtype=np.int8)
+    groups: Dict[str, List[int]] = {}
+    for i, (metric_type, _) in enumerate(metrics):
+        groups.setdefault(metric_type, []).append(i)
 
-        return validate_weight(value['value'])
+    for metric_type, indexes in groups.items():
+        spec = METRIC_SPECS.get(metric_type)
+        if spec is None:
+            continue
+        result[indexes] = _group_codes_numpy(spec, [metrics[i][1] for i in indexes])
 
-    else:
-        return False, f"Неизвестный тип метрики: {metric_type}"
+    return result.tolist()
 
 
 def sanitize_user_input(text: str) -> str:
@@ -318,7 +470,7 @@ def sanitize_user_input(text: str) -> str:
         return ""
 
     # Удаляем потенциально опасные символы
-    sanitized = re.sub(r'[<>{}[\]$&|`]', '', text)
+    sanitized = _UNSAFE_CHARS_RE.sub('', text)
 
     # Ограничиваем длину
     return sanitized[:1000]
@@ -334,8 +486,7 @@ def validate_email(email: str) -> bool:
     Returns:
         bool: Валиден ли email
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return bool(_EMAIL_RE.match(email))
 
 
 def validate_phone(phone: str) -> bool:
@@ -348,7 +499,5 @@ def validate_phone(phone: str) -> bool:
     Returns:
         bool: Валиден ли номер телефона
     """
-    # Российские номера: +7XXXXXXXXXX, 8XXXXXXXXXX, +375XXXXXXXXX и т.д.
-    pattern = r'^(\+7|8|\+375|\+374|\+994|\+995|\+996|\+998)[0-9]{7,14}$'
-    cleaned_phone = re.sub(r'[\s\-\(\)]', '', phone)
-    return bool(re.match(pattern, cleaned_phone))
\ No newline at end of file
+    cleaned_phone = _PHONE_SEPARATORS_RE.sub('', phone)
+    return bool(_PHONE_RE.match(cleaned_phone))
\ No newline at end of file